@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
 import { BrowserRouter, Routes, Route } from 'react-router-dom';
 import { v4 as uuidv4 } from 'uuid';
 import ChatPage from './pages/ChatPage';
@@ -8,74 +8,96 @@ import PostGrid from './components/PostGrid';
 import PostModal from './components/PostModal';
 import ChatSidebar from './components/ChatSidebar';
 import { api } from './services/api';
-import type { TravelPost } from './types/travel';
+import type { TravelPost, TravelPostCard, PostInteraction } from './types/travel';
 import type { ChatMessage } from './types/chat';
 
+// Cards fetched per page; more are loaded on demand
+const PAGE_SIZE = 24;
+
 function App() {
   // State
-  const [posts, setPosts] = useState<TravelPost[]>([]);
-  const [filteredPosts, setFilteredPosts] = useState<TravelPost[]>([]);
+  const [posts, setPosts] = useState<TravelPostCard[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // Keyed by post id, so they survive refetches and paging and are merged in on render
+  const [interactions, setInteractions] = useState<Record<string, PostInteraction>>({});
+  const [dismissed, setDismissed] = useState<Set<string>>(() => new Set());
   const [activeCategory, setActiveCategory] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
+  const [debouncedQuery, setDebouncedQuery] = useState('');
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([]);
   const [isAssistantOpen, setIsAssistantOpen] = useState(false);
   const [selectedPost, setSelectedPost] = useState<TravelPost | null>(null);
   
-  // Fetch posts from API
+  // Debounce search input so we don't query the server on every keystroke
   useEffect(() => {
+    const timeout = setTimeout(() => setDebouncedQuery(searchQuery.trim()), 250);
+    return () => clearTimeout(timeout);
+  }, [searchQuery]);
+
+  const filters = useMemo(() => ({
+    category: activeCategory === 'all' ? undefined : activeCategory,
+    q: debouncedQuery || undefined
+  }), [activeCategory, debouncedQuery]);
+  // Aborted when the filters change, so a pending "load more" cannot append stale results
+  const filtersController = useRef<AbortController | null>(null);
+
+  // Fetch the first page of cards, filtered server-side by category and search query
+  useEffect(() => {
+    const controller = new AbortController();
+    filtersController.current = controller;
+
     const fetchPosts = async () => {
       try {
-        setLoading(true);
-        const data = await api.getLocations();
-        setPosts(data);
-        setFilteredPosts(data);
+        const page = await api.getLocationCards({ ...filters, limit: PAGE_SIZE }, controller.signal);
+        setPosts(page.locations);
+        setNextCursor(page.next_cursor);
+        setError(null);
       } catch (err) {
+        if (controller.signal.aborted) return;
         setError(err instanceof Error ? err.message : 'Failed to fetch locations');
       } finally {
-        setLoading(false);
+        if (!controller.signal.aborted) {
+          setLoading(false);
+        }
       }
     };
 
     fetchPosts();
-  }, []);
+    return () => controller.abort();
+  }, [filters]);
 
-  // Filter posts when category or search query changes
-  useEffect(() => {
-    const filtered = posts.filter(post => {
-      // Category filter
-      const matchesCategory = activeCategory === 'all' || 
-        post.category_type.toLowerCase().includes(activeCategory) ||
-        post.theme_highlights.some(theme => theme.toLowerCase().includes(activeCategory));
-      
-      // Search filter
-      if (!searchQuery) return matchesCategory;
-      
-      const query = searchQuery.toLowerCase();
-      return matchesCategory && (
-        post.title.toLowerCase().includes(query) ||
-        post.content_shorter_version.toLowerCase().includes(query) ||
-        post.location_area.toLowerCase().includes(query) ||
-        post.theme_highlights.some(theme => theme.toLowerCase().includes(query))
-      );
-    });
-    
-    setFilteredPosts(filtered);
-  }, [activeCategory, posts, searchQuery]);
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    const signal = filtersController.current?.signal;
+    setLoadingMore(true);
+    try {
+      const page = await api.getLocationCards({ ...filters, limit: PAGE_SIZE, cursor: nextCursor }, signal);
+      setPosts(prev => [...prev, ...page.locations]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      if (signal?.aborted) return;
+      setError(err instanceof Error ? err.message : 'Failed to fetch locations');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const visiblePosts = useMemo(
+    () => posts.filter(post => !dismissed.has(post.id)).map(post => ({ ...post, ...interactions[post.id] })),
+    [posts, dismissed, interactions]
+  );
   
   // Post interaction handlers
-  const handleLike = (id: string) => {
-    setPosts(prev => prev.map(post => 
-      post.id === id ? { ...post, liked: !post.liked } : post
-    ));
+  const toggleInteraction = (id: string, key: keyof PostInteraction) => {
+    setInteractions(prev => ({ ...prev, [id]: { ...prev[id], [key]: !prev[id]?.[key] } }));
   };
+
+  const handleLike = (id: string) => toggleInteraction(id, 'liked');
   
-  const handleSave = (id: string) => {
-    setPosts(prev => prev.map(post => 
-      post.id === id ? { ...post, saved: !post.saved } : post
-    ));
-  };
+  const handleSave = (id: string) => toggleInteraction(id, 'saved');
   
   const handleShare = (id: string) => {
     // In a real app, this would open a share dialog
@@ -83,11 +105,19 @@ function App() {
   };
   
   const handleDismiss = (id: string) => {
-    setPosts(prev => prev.filter(post => post.id !== id));
+    setDismissed(prev => new Set(prev).add(id));
   };
   
-  const handlePostClick = (post: TravelPost) => {
-    setSelectedPost(post);
+  // Cards carry only the fields the grid shows; load the full post for the modal
+  const handlePostClick = async (post: TravelPostCard) => {
+    try {
+      const fullPost = await api.getLocation(post.id);
+      if (fullPost) {
+        setSelectedPost({ ...fullPost, ...interactions[post.id] });
+      }
+    } catch (err) {
+      alert(err instanceof Error ? err.message : 'Failed to fetch location');
+    }
   };
   
   // AI Assistant handlers
@@ -184,7 +214,7 @@ function App() {
                   
                   <main className="container mx-auto px-4 pb-20 transition-all duration-300">
                     <PostGrid 
-                      posts={filteredPosts}
+                      posts={visiblePosts}
                       isAssistantOpen={isAssistantOpen}
                       searchQuery={searchQuery}
                       onLike={handleLike}
@@ -193,7 +223,7 @@ function App() {
                       onDismiss={handleDismiss}
                       onPostClick={handlePostClick}
                     >
-                      {filteredPosts.length === 0 && (
+                      {visiblePosts.length === 0 && !nextCursor && (
                         <div className="col-span-full flex flex-col items-center justify-center py-16 text-center">
                           <div className="bg-gray-100 rounded-full p-6 mb-4">
                             <span className="text-3xl">🔍</span>
@@ -204,6 +234,18 @@ function App() {
                           </p>
                         </div>
                       )}
+                      {nextCursor && (
+                        <div className="col-span-full flex justify-center">
+                          <button
+                            type="button"
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-6 py-2 rounded-full bg-white shadow-md text-gray-700 font-medium hover:shadow-lg transition-all duration-300 disabled:opacity-50"
+                          >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                          </button>
+                        </div>
+                      )}
                     </PostGrid>
                   </main>
                   
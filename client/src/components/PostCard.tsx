@@ -1,19 +1,22 @@
 import React from 'react';
 import { Heart, Bookmark, Share2, X } from 'lucide-react';
-import type { TravelPost } from '../types/travel';
+import type { TravelPostCard } from '../types/travel';
 import { iconMap } from '../utils/icons';
 import { highlightText } from '../utils/search';
 
 interface PostCardProps {
-  post: TravelPost;
+  post: TravelPostCard;
   searchQuery: string;
-  onPostClick: (post: TravelPost) => void;
+  onPostClick: (post: TravelPostCard) => void;
   onLike: (id: string) => void;
   onSave: (id: string) => void;
   onShare: (id: string) => void;
   onDismiss: (id: string) => void;
 }
 
+// Card widths at the grid breakpoints in PostGrid (1/2/3/4 columns)
+const THUMBNAIL_SIZES = '(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw';
+
 const PostCard: React.FC<PostCardProps> = ({ 
   post, 
   searchQuery, 
@@ -26,6 +29,7 @@ const PostCard: React.FC<PostCardProps> = ({
   const LocationIcon = iconMap.location;
   const PriceIcon = iconMap.price;
   const CategoryIcon = iconMap.category;
+  const thumbnail = post.image_variants?.[0];
 
   return (
     <div 
@@ -34,11 +38,28 @@ const PostCard: React.FC<PostCardProps> = ({
     >
       {/* Image container with gradient overlay */}
       <div className="relative h-48 overflow-hidden">
-        <img 
-          src={post.images[0]} 
-          alt={post.title} 
-          className="w-full h-full object-cover"
-        />
+        {thumbnail ? (
+          <picture>
+            {thumbnail.webp_srcset && (
+              <source type="image/webp" srcSet={thumbnail.webp_srcset} sizes={THUMBNAIL_SIZES} />
+            )}
+            <img 
+              src={thumbnail.src} 
+              srcSet={thumbnail.jpeg_srcset || undefined}
+              sizes={THUMBNAIL_SIZES}
+              alt={post.title} 
+              loading="lazy"
+              className="w-full h-full object-cover"
+            />
+          </picture>
+        ) : (
+          <img 
+            src={post.images[0]} 
+            alt={post.title} 
+            loading="lazy"
+            className="w-full h-full object-cover"
+          />
+        )}
         <div className="absolute top-0 left-0 w-full h-full bg-gradient-to-b from-black/30 to-transparent"></div>
         
         {/* Location tag */}
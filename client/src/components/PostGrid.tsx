@@ -1,12 +1,12 @@
 import React from 'react';
 import PostCard from './PostCard';
-import type { TravelPost } from '../types/travel';
+import type { TravelPostCard } from '../types/travel';
 
 interface PostGridProps {
-  posts: TravelPost[];
+  posts: TravelPostCard[];
   isAssistantOpen: boolean;
   searchQuery: string;
-  onPostClick: (post: TravelPost) => void;
+  onPostClick: (post: TravelPostCard) => void;
   onLike: (id: string) => void;
   onSave: (id: string) => void;
   onShare: (id: string) => void;
@@ -1,18 +1,63 @@
-import { TravelPost, LocationsResponse } from '../types/travel';
+import { TravelPost, TravelPostCard, LocationsResponse, LocationsQuery, ImageVariants } from '../types/travel';
 
 const API_BASE_URL = 'http://localhost:5000/api';
 export const API_IMAGE_BASE_URL = 'http://localhost:5000';
 
-export const api = {
-  async getLocations(): Promise<TravelPost[]> {
-    const response = await fetch(`${API_BASE_URL}/locations`);
-    if (!response.ok) {
-      throw new Error('Failed to fetch locations');
+const withBaseUrl = (url: string) => `${API_IMAGE_BASE_URL}${url}`;
+
+const prefixSrcset = (srcset: string) =>
+  srcset
+    .split(', ')
+    .filter(Boolean)
+    .map(candidate => withBaseUrl(candidate))
+    .join(', ');
+
+const prefixVariants = (variants: ImageVariants | null): ImageVariants | null =>
+  variants && {
+    src: withBaseUrl(variants.src),
+    webp_srcset: prefixSrcset(variants.webp_srcset),
+    jpeg_srcset: prefixSrcset(variants.jpeg_srcset)
+  };
+
+// Fields the grid cards show; full posts are loaded one at a time when opened
+const CARD_FIELDS = 'title,images,image_variants,location_area,category_type,theme_highlights,price_range';
+
+async function fetchLocations<T extends { images?: string[]; image_variants?: (ImageVariants | null)[] }>(
+  query: LocationsQuery,
+  signal?: AbortSignal
+): Promise<LocationsResponse<T>> {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value !== undefined && value !== '') {
+      params.set(key, String(value));
     }
-    const data = await response.json() as LocationsResponse;
-    return data.locations.map(location => ({
+  });
+  const queryString = params.toString();
+  const response = await fetch(`${API_BASE_URL}/locations${queryString ? `?${queryString}` : ''}`, { signal });
+  if (!response.ok) {
+    throw new Error('Failed to fetch locations');
+  }
+  const data = await response.json() as LocationsResponse<T>;
+  return {
+    ...data,
+    locations: data.locations.map(location => ({
       ...location,
-      images: location.images.map(image => `${API_IMAGE_BASE_URL}${image}`)
-    }));
+      images: location.images?.map(withBaseUrl),
+      image_variants: location.image_variants?.map(prefixVariants)
+    }))
+  };
+}
+
+export const api = {
+  // One page of cards, filtered on the server; pass the previous page's next_cursor to continue.
+  // Repeat requests are revalidated with ETags by the browser cache.
+  getLocationCards(query: Omit<LocationsQuery, 'fields'> = {}, signal?: AbortSignal): Promise<LocationsResponse<TravelPostCard>> {
+    return fetchLocations<TravelPostCard>({ ...query, fields: CARD_FIELDS }, signal);
+  },
+
+  // Every field of one post, e.g. for the detail modal
+  async getLocation(id: string, signal?: AbortSignal): Promise<TravelPost | null> {
+    const data = await fetchLocations<TravelPost>({ id }, signal);
+    return data.locations[0] ?? null;
   }
 };
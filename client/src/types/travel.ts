@@ -1,9 +1,17 @@
+// Resized variants of one image; srcsets list "url width" candidates
+export interface ImageVariants {
+  src: string;
+  webp_srcset: string;
+  jpeg_srcset: string;
+}
+
 export interface TravelPost {
   id: string;
   title: string;
   link: string;
   address: string;
   images: string[];
+  image_variants?: (ImageVariants | null)[];
   content: string;
   content_shorter_version: string;
   location_area: string;
@@ -18,7 +26,32 @@ export interface TravelPost {
   saved?: boolean;
 }
 
+// The subset of a post the grid cards show, requested with `fields`
+export type TravelPostCard = Pick<TravelPost,
+  'id' | 'title' | 'images' | 'image_variants' | 'location_area' | 'category_type' | 'theme_highlights' |
+  'price_range' | 'liked' | 'saved'>;
+
+// Liked/saved flags kept per post id, independent of the pages loaded
+export interface PostInteraction {
+  liked?: boolean;
+  saved?: boolean;
+}
+
 // Response type from the API
-export interface LocationsResponse {
-  locations: TravelPost[];
+export interface LocationsResponse<T = TravelPost> {
+  locations: T[];
+  next_cursor: string | null;
+  total: number;
+}
+
+// Query parameters accepted by GET /api/locations
+export interface LocationsQuery {
+  category?: string;
+  theme?: string;
+  area?: string;
+  q?: string;
+  cursor?: string;
+  limit?: number;
+  fields?: string;
+  id?: string;
 }
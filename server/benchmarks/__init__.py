@@ -0,0 +1,8 @@
+"""
+Benchmark suite for the Genieverse server.
+
+Run from the server directory, e.g.:
+    python -m benchmarks.load --rows 10000 --concurrency 1,8,32
+    python -m benchmarks.micro --rows 1000,10000,100000
+    python -m benchmarks.compare results/before.json results/after.json
+"""
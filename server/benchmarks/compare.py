@@ -0,0 +1,73 @@
+"""
+Compares two benchmark result files (from benchmarks.load or benchmarks.micro).
+
+Every numeric measurement present in both files is printed with its relative
+change. Latency-like values (ms, seconds, MB) are better when lower; rps is
+better when higher. Changes beyond --threshold are flagged.
+
+Usage:
+    python -m benchmarks.compare results/before.json results/after.json [--threshold 10]
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Any
+
+HIGHER_IS_BETTER = ('rps',)
+IGNORED = ('repeat', 'rows', 'concurrency', 'calls', 'requests', 'edited_rows')
+
+def _result_key(result: Dict[str, Any]) -> str:
+    if 'scenario' in result:
+        return f"{result['scenario']}@c{result['concurrency']}"
+    return f"rows={result['rows']}"
+
+def flatten(value: Any, prefix: str = '') -> Dict[str, float]:
+    """Flattens nested dicts into {'a.b.c': number}."""
+    flat: Dict[str, float] = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flat.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        if prefix.rsplit('.', 1)[-1] not in IGNORED:
+            flat[prefix] = float(value)
+    return flat
+
+def measurements(report: Dict[str, Any]) -> Dict[str, float]:
+    values: Dict[str, float] = {}
+    for result in report.get('results', []):
+        values.update(flatten({k: v for k, v in result.items() if k != 'statuses'}, _result_key(result)))
+    for section in ('startup', 'peak_rss_mb'):
+        if section in report:
+            values.update(flatten(report[section], section))
+    return values
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files.")
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10, help="Flag changes larger than this percentage")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+
+    old, new = measurements(before), measurements(after)
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        if old[key] == 0:
+            continue
+        change = 100 * (new[key] - old[key]) / old[key]
+        worse = -change if key.rsplit('.', 1)[-1] in HIGHER_IS_BETTER else change
+        flag = ''
+        if abs(change) >= args.threshold:
+            flag = '  REGRESSION' if worse > 0 else '  improved'
+            regressions += worse > 0
+        print(f"{key:<70} {old[key]:12.2f} -> {new[key]:12.2f}  {change:+7.1f}%{flag}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+A stand-in for the OpenAI chat completions API with configurable latency.
+
+Serves POST /v1/chat/completions (plain and streamed) so the server can be
+benchmarked without network access or API cost. Point the server at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any OPENAI_API_KEY.
+
+Usage:
+    python -m benchmarks.fake_llm --port 8100 --latency-ms 400 --jitter-ms 100 --tokens-per-second 80
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from typing import List, Dict, Any, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CLARIFYING_QUESTIONS = [
+    "Are you looking for somewhere indoors or outdoors?",
+    "Which part of Singapore would be most convenient for you?",
+    "What kind of budget do you have in mind?",
+    "Will you be going with family, friends or on your own?",
+]
+
+def last_user_message(prompt: str) -> Optional[str]:
+    """The last user message in the JSON message list embedded in a prompt, or None if there is none."""
+    for line in reversed(prompt.splitlines()):
+        if not line.startswith('['):
+            continue
+        try:
+            messages = json.loads(line)
+        except ValueError:
+            continue
+        contents = [m.get('content', '') for m in messages if isinstance(m, dict) and m.get('role') == 'user']
+        if contents:
+            return contents[-1]
+    return None
+
+def create_app(latency_ms: float, jitter_ms: float, tokens_per_second: float, seed: int = 0) -> FastAPI:
+    """Builds the fake API. Each response waits latency_ms ± jitter_ms before the first token."""
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    def first_token_delay() -> float:
+        return max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    def completion_text(body: Dict[str, Any]) -> str:
+        prompt = body['messages'][-1]['content']
+        if body.get('temperature', 1) < 0.5:
+            # Search-query prompts: echo the last user message found in the embedded conversation
+            message = last_user_message(prompt)
+            if message is not None:
+                return message[:200]
+            return prompt.strip().splitlines()[-1][:200]
+        return rng.choice(CLARIFYING_QUESTIONS)
+
+    def usage(body: Dict[str, Any], text: str) -> Dict[str, int]:
+        prompt_tokens = sum(len(m.get('content', '').split()) for m in body['messages'])
+        completion_tokens = len(text.split())
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason=None) -> str:
+        payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                   'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+        return f"data: {json.dumps(payload)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get('model', 'fake-model')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        text = completion_text(body)
+        await asyncio.sleep(first_token_delay())
+
+        if not body.get('stream'):
+            # Account for the time a real model spends generating the whole completion
+            await asyncio.sleep(len(text.split()) / tokens_per_second)
+            return JSONResponse({
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': usage(body, text),
+            })
+
+        async def events():
+            yield chunk(completion_id, model, {'role': 'assistant', 'content': ''})
+            words: List[str] = text.split(' ')
+            for i, word in enumerate(words):
+                yield chunk(completion_id, model, {'content': word if i == 0 else ' ' + word})
+                await asyncio.sleep(1 / tokens_per_second)
+            yield chunk(completion_id, model, {}, finish_reason='stop')
+            if (body.get('stream_options') or {}).get('include_usage'):
+                payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                           'model': model, 'choices': [], 'usage': usage(body, text)}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency-ms', type=float, default=400, help="Mean time to first token")
+    parser.add_argument('--jitter-ms', type=float, default=100, help="Uniform jitter around the mean")
+    parser.add_argument('--tokens-per-second', type=float, default=80, help="Generation speed after the first token")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.tokens_per_second, args.seed),
+                host=args.host, port=args.port, log_level='warning')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+End-to-end load benchmark.
+
+Starts the fake LLM server and the FastAPI app (in a temporary working
+directory with a synthetic CSV), waits for warm-up, then drives each scenario at
+each concurrency level for a fixed duration. For every run it reports
+throughput, client-side p50/p95/p99 latency, error count, the per-stage
+breakdown taken from the difference between /metrics scrapes at the start and
+end of the measured window, and the server's peak RSS. Results are printed and optionally written as JSON for
+comparison with benchmarks.compare.
+
+Usage:
+    python -m benchmarks.load --rows 10000 --concurrency 1,8,32 --duration 20 --output results/load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import httpx
+from benchmarks.synthetic_data import write_csv, AREAS, CATEGORIES, THEMES, AUDIENCES, PRICES
+from benchmarks.report import run_metadata, latency_summary, print_table, write_json
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ('conversation', 'locations')
+_STAGE_SAMPLE = re.compile(r'^genieverse_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _wait_for(url: str, timeout: float, process: subprocess.Popen) -> float:
+    """Polls `url` until it returns 200. Returns the seconds waited."""
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} while waiting for {url}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return time.perf_counter() - start_time
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} was not ready after {timeout}s")
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak resident set size of a process (Linux /proc; None elsewhere)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _stage_totals(metrics_text: str) -> Dict[str, List[float]]:
+    """Extracts {stage: [sum_seconds, count]} from a /metrics scrape."""
+    totals: Dict[str, List[float]] = {}
+    for line in metrics_text.splitlines():
+        match = _STAGE_SAMPLE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, [0.0, 0.0])[0 if kind == 'sum' else 1] = float(value)
+    return totals
+
+def stage_breakdown(before: str, after: str) -> Dict[str, Dict[str, float]]:
+    """Per-stage call count and mean duration between two /metrics scrapes."""
+    start, end = _stage_totals(before), _stage_totals(after)
+    breakdown = {}
+    for stage, (total, count) in end.items():
+        prev_total, prev_count = start.get(stage, [0.0, 0.0])
+        calls = count - prev_count
+        if calls > 0:
+            breakdown[stage] = {'calls': int(calls), 'mean_ms': 1000 * (total - prev_total) / calls}
+    return breakdown
+
+def _conversation_request(rng: random.Random) -> Dict[str, Any]:
+    first = (f"I'm looking for a {rng.choice(CATEGORIES).lower()} in {rng.choice(AREAS)} "
+             f"for {rng.choice(AUDIENCES).lower()}")
+    conversation = [{'role': 'user', 'content': first}]
+    for _ in range(rng.randint(0, 2)):
+        conversation.append({'role': 'assistant', 'content': "What kind of atmosphere would you like?"})
+        conversation.append({'role': 'user', 'content': f"Something with {rng.choice(THEMES).lower()}, "
+                                                        f"price around {rng.choice(PRICES)}"})
+    return {'method': 'POST', 'url': '/api/conversation', 'json': {'conversation': conversation}}
+
+def _locations_request(rng: random.Random) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    choice = rng.random()
+    if choice < 0.2:
+        pass  # full catalog
+    elif choice < 0.5:
+        params['category'] = rng.choice(CATEGORIES + THEMES)
+    elif choice < 0.7:
+        params['area'] = rng.choice(AREAS)
+    else:
+        params['q'] = rng.choice(THEMES + AREAS).split()[0].lower()
+    if rng.random() < 0.7:
+        params['limit'] = rng.choice([20, 50, 100])
+    return {'method': 'GET', 'url': '/api/locations', 'params': params,
+            'headers': {'Accept-Encoding': rng.choice(['br, gzip', 'gzip', 'identity'])}}
+
+REQUEST_BUILDERS = {'conversation': _conversation_request, 'locations': _locations_request}
+
+async def run_level(base_url: str, scenario: str, concurrency: int, duration: float, warmup: float,
+                    seed: int) -> Dict[str, Any]:
+    """
+    Runs `concurrency` closed-loop clients for `warmup` + `duration` seconds; only the latter is measured.
+
+    The stage breakdown compares a /metrics scrape taken once the warm-up is over with
+    one taken after the last request, so warm-up requests are not counted in it.
+    """
+    build = REQUEST_BUILDERS[scenario]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # Scrapes use their own client so they do not queue behind the workers' connections
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=60) as metrics_client:
+        loop = asyncio.get_running_loop()
+        measure_from = loop.time() + warmup
+        end = measure_from + duration
+
+        async def scrape_after_warmup() -> str:
+            await asyncio.sleep(max(0.0, measure_from - loop.time()))
+            return (await metrics_client.get('/metrics')).text
+
+        async def worker(worker_id: int) -> None:
+            rng = random.Random(seed * 1000 + worker_id)
+            while loop.time() < end:
+                spec = build(rng)
+                start_time = loop.time()
+                try:
+                    response = await client.request(**spec)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                finished = loop.time()
+                if start_time >= measure_from and finished <= end:
+                    latencies.append(finished - start_time)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        before, _ = await asyncio.gather(scrape_after_warmup(),
+                                         asyncio.gather(*(worker(i) for i in range(concurrency))))
+        after = (await metrics_client.get('/metrics')).text
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': statuses,
+        'rps': len(latencies) / duration,
+        'latency_ms': latency_summary(latencies),
+        'stages': stage_breakdown(before, after),
+    }
+
+def _start(command: List[str], cwd: str, env: Dict[str, str], log_path: str) -> Tuple[subprocess.Popen, Any]:
+    log = open(log_path, 'w')
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT), log
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load/latency benchmark against a locally started server.")
+    parser.add_argument('--rows', type=int, default=1000, help="Synthetic catalog size (e.g. 1000 to 100000)")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma-separated: conversation,locations")
+    parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=20, help="Measured seconds per level")
+    parser.add_argument('--warmup', type=float, default=3, help="Unmeasured seconds before each level")
+    parser.add_argument('--llm-latency-ms', type=float, default=400)
+    parser.add_argument('--llm-jitter-ms', type=float, default=100)
+    parser.add_argument('--llm-tokens-per-second', type=float, default=80)
+    parser.add_argument('--llm-cache', action='store_true', help="Keep the LLM response cache enabled")
+    parser.add_argument('--server-env', action='append', default=[], metavar='KEY=VALUE',
+                        help="Extra environment for the server (repeatable), e.g. RETRIEVER_BACKEND=numpy")
+    parser.add_argument('--startup-timeout', type=float, default=900, help="Seconds to wait for warm-up")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--keep-workdir', action='store_true', help="Keep the temporary data/index directory")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in REQUEST_BUILDERS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    workdir = tempfile.mkdtemp(prefix='genieverse-bench-')
+    csv_path = os.path.join(workdir, 'data', 'genieverse-locations.csv')
+    write_csv(csv_path, args.rows, args.seed)
+    os.makedirs(os.path.join(workdir, 'data', 'images'), exist_ok=True)
+
+    llm_port, server_port = _free_port(), _free_port()
+    base_url = f"http://127.0.0.1:{server_port}"
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_API_KEY': 'benchmark',
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{llm_port}/v1",
+        'CSV_PATH': csv_path,
+        'PERSIST_DIRECTORY': os.path.join(workdir, 'chroma'),
+        'INDEX_ARTIFACT_DIR': os.path.join(workdir, 'index_artifacts'),
+        'LLM_CACHE_ENABLED': 'true' if args.llm_cache else 'false',
+        'LLM_CACHE_PATH': '',
+        'PYTHONPATH': SERVER_DIR + os.pathsep + env.get('PYTHONPATH', ''),
+    })
+    for item in args.server_env:
+        key, _, value = item.partition('=')
+        env[key] = value
+
+    processes: List[Tuple[subprocess.Popen, Any]] = []
+    report: Dict[str, Any] = {
+        'meta': run_metadata('load', vars(args)),
+        'results': [],
+    }
+    try:
+        llm = _start([sys.executable, '-m', 'benchmarks.fake_llm', '--port', str(llm_port),
+                      '--latency-ms', str(args.llm_latency_ms), '--jitter-ms', str(args.llm_jitter_ms),
+                      '--tokens-per-second', str(args.llm_tokens_per_second), '--seed', str(args.seed)],
+                     SERVER_DIR, env, os.path.join(workdir, 'fake_llm.log'))
+        processes.append(llm)
+        server = _start([sys.executable, '-m', 'uvicorn', 'main:app', '--app-dir', SERVER_DIR,
+                         '--host', '127.0.0.1', '--port', str(server_port), '--log-level', 'warning'],
+                        workdir, env, os.path.join(workdir, 'server.log'))
+        processes.append(server)
+
+        _wait_for(f"http://127.0.0.1:{llm_port}/docs", 30, llm[0])
+        live_seconds = _wait_for(f"{base_url}/api/health/live", args.startup_timeout, server[0])
+        ready_seconds = live_seconds + _wait_for(f"{base_url}/api/health/ready", args.startup_timeout, server[0])
+        report['startup'] = {'live_seconds': live_seconds, 'ready_seconds': ready_seconds,
+                             'rss_mb_after_warm_up': _peak_rss_mb(server[0].pid)}
+        print(f"Server live after {live_seconds:.1f}s, ready after {ready_seconds:.1f}s ({args.rows} rows)")
+
+        for scenario in scenarios:
+            for concurrency in levels:
+                result = asyncio.run(run_level(base_url, scenario, concurrency, args.duration, args.warmup,
+                                               args.seed))
+                result.update({
+                    'scenario': scenario,
+                    'concurrency': concurrency,
+                    'peak_rss_mb': _peak_rss_mb(server[0].pid),
+                })
+                report['results'].append(result)
+                print_table([result])
+        report['peak_rss_mb'] = _peak_rss_mb(server[0].pid)
+    finally:
+        for process, log in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+        if args.keep_workdir:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        write_json(args.output, report)
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
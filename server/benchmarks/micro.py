@@ -0,0 +1,154 @@
+"""
+Microbenchmarks for the data and indexing hot paths.
+
+For each catalog size it times, on a synthetic CSV:
+  - DataLoader.load_data
+  - DataLoader.prepare_documents (cold, on a fresh loader)
+  - DataLoader.get_formatted_locations (cold, then cached)
+  - build_or_load_index: a full build into an empty collection, a no-op re-sync,
+    and an incremental sync after editing 1% of the rows
+
+`--embedding hash` replaces the sentence-transformer with a deterministic
+hashing embedder so index timings measure Chroma and sync overhead only.
+
+Usage:
+    python -m benchmarks.micro --rows 1000,10000 --repeat 5 --output results/micro.json
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Callable
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from benchmarks.synthetic_data import write_csv
+from benchmarks.report import run_metadata, write_json
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Bag-of-words feature hashing into a fixed-size, normalized vector; cheap and deterministic."""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dimension, dtype=np.float32)
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dimension] += 1
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / (norm or 1))
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "benchmark-hash"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {'dimension': self.dimension}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashEmbeddingFunction":
+        return HashEmbeddingFunction(config.get('dimension', 384))
+
+def _time(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Runs func `repeat` times; returns min/median/max in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        samples.append(1000 * (time.perf_counter() - start_time))
+    return {'min_ms': min(samples), 'median_ms': statistics.median(samples), 'max_ms': max(samples),
+            'repeat': repeat}
+
+def _time_once(func: Callable[[], Any]) -> Dict[str, float]:
+    start_time = time.perf_counter()
+    func()
+    return {'ms': 1000 * (time.perf_counter() - start_time)}
+
+def bench_size(rows: int, repeat: int, embedding: str, workdir: str, seed: int) -> Dict[str, Any]:
+    from data_loader import DataLoader
+    import embedding as embedding_module
+
+    csv_path = write_csv(os.path.join(workdir, f'locations-{rows}.csv'), rows, seed)
+    image_root = os.path.join(workdir, 'images')
+    variants_root = os.path.join(workdir, 'image_variants')
+    os.makedirs(image_root, exist_ok=True)
+
+    def fresh_loader() -> DataLoader:
+        loader = DataLoader(image_root, variants_root)
+        loader.load_data(csv_path)
+        return loader
+
+    results: Dict[str, Any] = {'rows': rows}
+    results['load_data'] = _time(fresh_loader, repeat)
+
+    loaders = [fresh_loader() for _ in range(repeat)]
+    results['prepare_documents'] = _time(lambda: loaders.pop().prepare_documents(), repeat)
+
+    loaders = [fresh_loader() for _ in range(repeat)]
+    results['get_formatted_locations_cold'] = _time(lambda: loaders.pop().get_formatted_locations(), repeat)
+    warm = fresh_loader()
+    warm.get_formatted_locations()
+    results['get_formatted_locations_cached'] = _time(warm.get_formatted_locations, repeat)
+
+    embedding_function = (HashEmbeddingFunction() if embedding == 'hash'
+                          else embedding_module.get_embedding_function())
+    documents, metadatas, ids = fresh_loader().prepare_documents()
+    persist_dir = os.path.join(workdir, f'chroma-{rows}')
+    import config
+    config.PERSIST_DIRECTORY = persist_dir
+
+    index: Dict[str, Any] = {}
+    index['full_build'] = _time_once(
+        lambda: embedding_module.build_or_load_index(documents, metadatas, ids, embedding_function))
+    index['noop_sync'] = _time(
+        lambda: embedding_module.build_or_load_index(documents, metadatas, ids, embedding_function), repeat)
+    edited = list(documents)
+    for i in range(0, len(edited), 100):
+        edited[i] = edited[i] + "\nEdited: yes"
+    index['incremental_sync_1pct'] = _time_once(
+        lambda: embedding_module.build_or_load_index(edited, metadatas, ids, embedding_function))
+    index['edited_rows'] = len(range(0, len(edited), 100))
+    results['build_or_load_index'] = index
+    shutil.rmtree(persist_dir, ignore_errors=True)
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for data loading and index sync.")
+    parser.add_argument('--rows', default='1000,10000', help="Comma-separated catalog sizes")
+    parser.add_argument('--repeat', type=int, default=5, help="Repetitions for the repeatable measurements")
+    parser.add_argument('--embedding', choices=('model', 'hash'), default='model',
+                        help="'model' uses EMBEDDING_MODEL_NAME; 'hash' isolates Chroma/sync overhead")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {'meta': run_metadata('micro', vars(args)), 'results': []}
+    workdir = tempfile.mkdtemp(prefix='genieverse-micro-')
+    try:
+        for rows in [int(r) for r in args.rows.split(',') if r.strip()]:
+            result = bench_size(rows, args.repeat, args.embedding, workdir, args.seed)
+            report['results'].append(result)
+            index = result['build_or_load_index']
+            print(f"rows={rows:<7} load_data {result['load_data']['median_ms']:8.1f}ms  "
+                  f"prepare_documents {result['prepare_documents']['median_ms']:8.1f}ms  "
+                  f"get_formatted_locations {result['get_formatted_locations_cold']['median_ms']:8.1f}ms "
+                  f"(cached {result['get_formatted_locations_cached']['median_ms']:.3f}ms)")
+            print(f"             index: full {index['full_build']['ms']:10.1f}ms  "
+                  f"no-op {index['noop_sync']['median_ms']:8.1f}ms  "
+                  f"1% edited {index['incremental_sync_1pct']['ms']:8.1f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        write_json(args.output, report)
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
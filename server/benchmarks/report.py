@@ -0,0 +1,63 @@
+"""Shared result formatting for the benchmark scripts."""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import List, Dict, Any, Optional
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *args], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_metadata(benchmark: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Identifies a run (commit, machine, arguments) so results from different commits can be compared."""
+    status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'benchmark': benchmark,
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'arguments': arguments,
+    }
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max in milliseconds."""
+    values = sorted(seconds)
+    return {
+        'p50': 1000 * percentile(values, 0.50),
+        'p95': 1000 * percentile(values, 0.95),
+        'p99': 1000 * percentile(values, 0.99),
+        'mean': 1000 * sum(values) / len(values) if values else 0.0,
+        'max': 1000 * values[-1] if values else 0.0,
+    }
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    """Prints one line per load-test result, followed by its slowest stages."""
+    for r in results:
+        latency = r['latency_ms']
+        rss = f"{r['peak_rss_mb']:.0f}MB" if r.get('peak_rss_mb') is not None else 'n/a'
+        print(f"{r['scenario']:<13} c={r['concurrency']:<4} {r['rps']:8.1f} rps  p50 {latency['p50']:8.1f}ms  "
+              f"p95 {latency['p95']:8.1f}ms  p99 {latency['p99']:8.1f}ms  errors {r['errors']:<5} rss {rss}")
+        stages = sorted(r.get('stages', {}).items(), key=lambda item: -item[1]['mean_ms'])
+        if stages:
+            print('    ' + ', '.join(f"{stage} {s['mean_ms']:.1f}ms x{s['calls']}" for stage, s in stages[:6]))
+
+def write_json(path: str, report: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,87 @@
+"""
+Generates a synthetic locations CSV with the same columns as genieverse-locations.csv.
+
+Values are drawn from fixed vocabularies with a seeded RNG, so the same
+`--rows`/`--seed` always produce the same file.
+
+Usage:
+    python -m benchmarks.synthetic_data --rows 10000 --output data/genieverse-locations.csv
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from typing import List, Dict
+
+AREAS = ['Bedok', 'Tampines', 'Jurong East', 'Orchard', 'Bugis', 'Chinatown', 'Little India', 'Sentosa',
+         'Marina Bay', 'Clarke Quay', 'Tiong Bahru', 'Katong', 'Holland Village', 'Dempsey', 'Punggol',
+         'Yishun', 'Woodlands', 'Ang Mo Kio', 'Toa Payoh', 'Bukit Timah']
+CATEGORIES = ['Cafe', 'Restaurant', 'Bar', 'Hawker Centre', 'Museum', 'Park', 'Shopping Mall', 'Attraction',
+              'Gallery', 'Spa', 'Nature Reserve', 'Beach', 'Theatre', 'Market']
+THEMES = ['Food', 'Nightlife', 'Nature', 'Heritage', 'Art', 'Shopping', 'Family Fun', 'Romantic', 'Adventure',
+          'Wellness', 'Photography', 'Local Culture', 'Rooftop Views', 'Hidden Gem']
+AUDIENCES = ['Families', 'Couples', 'Solo Travellers', 'Friends', 'Kids', 'Seniors', 'Students']
+ATTRIBUTES = ['Wheelchair Accessible', 'Pet Friendly', 'Halal', 'Vegetarian Options', 'Outdoor Seating',
+              'Air-conditioned', 'Free Wi-Fi', 'Reservations Recommended', 'Late Night']
+PRICES = ['Free', '$', '$$', '$$$', '$$$$']
+ADJECTIVES = ['cosy', 'lively', 'quiet', 'historic', 'modern', 'hidden', 'scenic', 'bustling', 'charming', 'iconic']
+NOUNS = ['corner', 'garden', 'house', 'terrace', 'lane', 'pavilion', 'loft', 'hall', 'kitchen', 'studio']
+
+COLUMNS = ['index', 'title', 'link', 'address', 'image', 'content', 'content_shorter_version', 'location_area',
+           'category_type', 'theme_highlights', 'price_range', 'audience_suitability', 'operating_hours',
+           'additional_attributes']
+
+def _sentence(rng: random.Random, area: str, category: str, themes: List[str]) -> str:
+    return (f"A {rng.choice(ADJECTIVES)} {category.lower()} in {area} known for its {rng.choice(ADJECTIVES)} "
+            f"{rng.choice(NOUNS)} and {', '.join(t.lower() for t in themes)}.")
+
+def generate_rows(rows: int, seed: int = 42) -> List[Dict[str, str]]:
+    """Returns `rows` synthetic location records."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        area = rng.choice(AREAS)
+        category = rng.choice(CATEGORIES)
+        themes = rng.sample(THEMES, rng.randint(1, 4))
+        title = f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()} {category} {i}"
+        content = ' '.join(_sentence(rng, area, category, themes) for _ in range(rng.randint(3, 8)))
+        records.append({
+            'index': str(i),
+            'title': title,
+            'link': f"https://example.com/locations/{i}",
+            'address': f"{rng.randint(1, 999)} {area} Road, Singapore {rng.randint(100000, 829999)}",
+            'image': f"https://example.com/images/{i}.jpg",
+            'content': content,
+            'content_shorter_version': _sentence(rng, area, category, themes),
+            'location_area': area,
+            'category_type': category,
+            'theme_highlights': ','.join(themes),
+            'price_range': rng.choice(PRICES),
+            'audience_suitability': ','.join(rng.sample(AUDIENCES, rng.randint(1, 3))),
+            'operating_hours': rng.choice(['9am - 6pm', '10am - 10pm', '24 hours', '5pm - 2am', '']),
+            'additional_attributes': ','.join(rng.sample(ATTRIBUTES, rng.randint(0, 3))),
+        })
+    return records
+
+def write_csv(path: str, rows: int, seed: int = 42) -> str:
+    """Writes a synthetic CSV to `path` (creating parent directories) and returns the path."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(generate_rows(rows, seed))
+    return path
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic genieverse-locations CSV.")
+    parser.add_argument('--rows', type=int, default=1000, help="Number of locations")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    parser.add_argument('--output', default='data/genieverse-locations.csv', help="CSV path to write")
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
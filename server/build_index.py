@@ -0,0 +1,60 @@
+"""
+Builds the search index ahead of time.
+
+Embeds the location CSV with the configured EMBEDDING_MODEL_NAME, writes a versioned,
+memory-mappable embedding artifact to INDEX_ARTIFACT_DIR and syncs the Chroma collection
+from it. The server opens that artifact at startup instead of embedding the catalog.
+
+Usage:
+    python build_index.py [--csv PATH] [--output DIR] [--dtype float32|float16] [--skip-chroma]
+"""
+import argparse
+import logging
+import sys
+import numpy as np
+from config import CSV_PATH, EMBEDDING_MODEL_NAME, EMBED_BATCH_SIZE, INDEX_ARTIFACT_DIR, INDEX_ARTIFACT_DTYPE
+from data_loader import DataLoader
+from embedding import get_embedding_function, build_or_load_index, compute_content_hash, embed_documents
+from index_artifact import load_artifact, write_artifact
+
+def build_index(csv_path: str, output_dir: str, dtype: str, skip_chroma: bool = False) -> bool:
+    """Builds the embedding artifact (reusing vectors from the previous one) and syncs Chroma."""
+    loader = DataLoader()
+    if loader.load_data(csv_path) is None:
+        return False
+    documents, metadatas, ids = loader.prepare_documents()
+    content_hashes = [compute_content_hash(doc, meta) for doc, meta in zip(documents, metadatas)]
+
+    embedding_function = get_embedding_function()
+
+    # Only embed rows that are new or changed since the previous artifact
+    previous = load_artifact(output_dir, EMBEDDING_MODEL_NAME)
+    vectors = [previous.vector_for(id_, h) if previous else None for id_, h in zip(ids, content_hashes)]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    logging.info(f"Reusing {len(ids) - len(missing)} vectors; embedding {len(missing)} documents.")
+    if missing:
+        fresh = embed_documents([documents[i] for i in missing], embedding_function, EMBED_BATCH_SIZE)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    embeddings = np.vstack([np.asarray(v, dtype=np.float32) for v in vectors]) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    write_artifact(output_dir, ids, content_hashes, embeddings, EMBEDDING_MODEL_NAME, dtype)
+
+    if not skip_chroma:
+        artifact = load_artifact(output_dir, EMBEDDING_MODEL_NAME)
+        if build_or_load_index(documents, metadatas, ids, embedding_function, precomputed=artifact) is None:
+            return False
+    return True
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the location search index and embedding artifact.")
+    parser.add_argument('--csv', default=CSV_PATH, help="Location CSV to index (default: CSV_PATH)")
+    parser.add_argument('--output', default=INDEX_ARTIFACT_DIR, help="Artifact directory (default: INDEX_ARTIFACT_DIR)")
+    parser.add_argument('--dtype', default=INDEX_ARTIFACT_DTYPE, choices=['float32', 'float16'],
+                        help="Storage dtype of the embedding matrix")
+    parser.add_argument('--skip-chroma', action='store_true', help="Only write the artifact; do not sync Chroma")
+    args = parser.parse_args()
+    return 0 if build_index(args.csv, args.output, args.dtype, args.skip_chroma) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
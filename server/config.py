@@ -7,14 +7,79 @@ import openai
 load_dotenv()
 
 # File and Directory Configuration
-CSV_PATH = os.getenv('CSV_PATH', 'genieverse-locations.csv')
+CSV_PATH = os.getenv('CSV_PATH', 'data/genieverse-locations.csv')
 PERSIST_DIRECTORY = os.getenv('PERSIST_DIRECTORY', './chroma_db_locations')
 COLLECTION_NAME = os.getenv('COLLECTION_NAME', 'genieverse_locations')
+INDEX_ARTIFACT_DIR = os.getenv('INDEX_ARTIFACT_DIR', './index_artifacts')
+INDEX_ARTIFACT_DTYPE = os.getenv('INDEX_ARTIFACT_DTYPE', 'float32')
+IMAGE_SOURCE_DIR = os.getenv('IMAGE_SOURCE_DIR', 'data/images')
+IMAGE_VARIANTS_DIR = os.getenv('IMAGE_VARIANTS_DIR', 'data/image_variants')
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(',') if w.strip()]
 
 # Model Configuration
 EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
 GENERATION_MODEL_NAME = os.getenv('GENERATION_MODEL_NAME', 'gpt-4o-mini')
 TOP_K_RETRIEVAL = int(os.getenv('TOP_K_RETRIEVAL', '5'))
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '512'))
+RETRIEVER_BACKEND = os.getenv('RETRIEVER_BACKEND', 'chroma')  # 'chroma' or 'numpy'
+HYBRID_RETRIEVAL = os.getenv('HYBRID_RETRIEVAL', 'true').lower() == 'true'  # fuse BM25 with vector search
+RRF_K = int(os.getenv('RRF_K', '60'))
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv('HYBRID_CANDIDATE_MULTIPLIER', '4'))
+
+# Serving Mode Configuration
+# 'standalone': each server process loads the model and index itself.
+# 'shared': workers map the bundle written by index_server.py and embed queries through its socket.
+SERVING_MODE = os.getenv('SERVING_MODE', 'standalone')
+SERVING_BUNDLE_DIR = os.getenv('SERVING_BUNDLE_DIR', './serving_bundle')
+INDEX_SERVER_SOCKET = os.getenv('INDEX_SERVER_SOCKET', '/tmp/genieverse-index.sock')
+INDEX_SERVER_TIMEOUT = float(os.getenv('INDEX_SERVER_TIMEOUT', '5'))
+INDEX_SERVER_WAIT_SECONDS = float(os.getenv('INDEX_SERVER_WAIT_SECONDS', '600'))  # how long workers wait for the first bundle
+
+# Query Embedding Queue Configuration
+EMBEDDING_QUEUE_ENABLED = os.getenv('EMBEDDING_QUEUE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_QUEUE_MAX_BATCH = int(os.getenv('EMBEDDING_QUEUE_MAX_BATCH', '32'))
+EMBEDDING_QUEUE_MAX_WAIT_MS = float(os.getenv('EMBEDDING_QUEUE_MAX_WAIT_MS', '5'))  # wait for more queries after the first
+EMBEDDING_QUEUE_TIMEOUT = float(os.getenv('EMBEDDING_QUEUE_TIMEOUT', '2'))  # per request; 0 waits indefinitely
+
+# Batch Conversation Configuration
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '8'))  # LLM calls in flight per batch
+BATCH_MAX_CONVERSATIONS = int(os.getenv('BATCH_MAX_CONVERSATIONS', '1000'))
+
+# Catalog Reload Configuration
+CSV_RELOAD_INTERVAL = float(os.getenv('CSV_RELOAD_INTERVAL', '0'))  # seconds between CSV change checks; 0 disables
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')  # bearer token for /api/admin/*; empty disables the admin endpoints
+
+# Local Query Builder Configuration
+LOCAL_QUERY_ENABLED = os.getenv('LOCAL_QUERY_ENABLED', 'true').lower() == 'true'  # skip the LLM for explicit first messages
+LOCAL_QUERY_MIN_CONFIDENCE = float(os.getenv('LOCAL_QUERY_MIN_CONFIDENCE', '0.75'))  # share of words matched by gazetteers
+LOCAL_QUERY_MAX_WORDS = int(os.getenv('LOCAL_QUERY_MAX_WORDS', '20'))
+
+# Conversation Session Configuration
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '3600'))  # idle time before a session expires
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', '')  # SQLite file shared by all workers; empty: in memory (shared mode: in SERVING_BUNDLE_DIR)
+PROMPT_RECENT_MESSAGES = int(os.getenv('PROMPT_RECENT_MESSAGES', '6'))  # messages included verbatim in LLM prompts
+
+# Locations API Configuration
+LOCATIONS_MAX_PAGE_SIZE = int(os.getenv('LOCATIONS_MAX_PAGE_SIZE', '500'))
+LOCATIONS_PAGE_CACHE_SIZE = int(os.getenv('LOCATIONS_PAGE_CACHE_SIZE', '256'))  # serialized pages kept in memory
+
+# Latency Configuration (seconds)
+LLM_QUERY_TIMEOUT = float(os.getenv('LLM_QUERY_TIMEOUT', '4'))
+LLM_CLARIFY_TIMEOUT = float(os.getenv('LLM_CLARIFY_TIMEOUT', '6'))
+RETRIEVAL_TIMEOUT = float(os.getenv('RETRIEVAL_TIMEOUT', '2'))
+RETRIEVAL_WORKERS = int(os.getenv('RETRIEVAL_WORKERS', '8'))  # a timed-out retrieval holds its thread until done
+PIPELINE_LATENCY_BUDGET = float(os.getenv('PIPELINE_LATENCY_BUDGET', '8'))
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '2'))  # requests slower than this log their stage breakdown
+
+# LLM Response Cache Configuration
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1024'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', '86400'))
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '')  # SQLite file; empty keeps the cache in memory only
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv('LLM_CACHE_DISK_MAX_ENTRIES', '100000'))
+# Clarifying questions are sampled at temperature 0.7, so they bypass the cache unless enabled
+LLM_CACHE_CLARIFYING_QUESTIONS = os.getenv('LLM_CACHE_CLARIFYING_QUESTIONS', 'false').lower() == 'true'
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,8 +89,8 @@ try:
     openai.api_key = os.getenv("OPENAI_API_KEY")
     if not openai.api_key:
         raise ValueError("OPENAI_API_KEY not found in environment variables.")
-    openai_client = openai.OpenAI()
+    async_openai_client = openai.AsyncOpenAI()
 except ValueError as e:
     logging.error(f"OpenAI API Key Error: {e}")
     logging.warning("LLM-based query preprocessing and clarification will not work without an API key.")
-    openai_client = None
+    async_openai_client = None
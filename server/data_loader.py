@@ -2,12 +2,64 @@ import pandas as pd
 import logging
 import os
 from typing import Optional, List, Dict, Tuple, Any
+from image_derivatives import ImageVariantIndex
+from metrics import traced
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+LIST_FIELDS = ('theme_highlights', 'audience_suitability', 'additional_attributes')
+
+class ImageManifest:
+    """
+    Maps zero-padded location IDs to their image URLs.
+
+    All images are collected in a single os.scandir walk. The result is cached and
+    only rebuilt when the mtime of the images directory or one of its location
+    subdirectories changes.
+    """
+
+    def __init__(self, image_root: str = 'data/images'):
+        self.image_root = image_root
+        self._signature: Optional[Tuple] = None
+        self._images: Dict[str, List[str]] = {}
+
+    def _current_signature(self) -> Tuple:
+        try:
+            root_mtime = os.stat(self.image_root).st_mtime_ns
+            with os.scandir(self.image_root) as entries:
+                subdirs = tuple(sorted((e.name, e.stat().st_mtime_ns) for e in entries if e.is_dir()))
+            return root_mtime, subdirs
+        except FileNotFoundError:
+            return ()
+
+    def refresh(self) -> bool:
+        """Rebuilds the manifest if the image directories changed. Returns True if it was rebuilt."""
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+
+        images: Dict[str, List[str]] = {}
+        for location_id, _ in (signature[1] if signature else ()):
+            with os.scandir(os.path.join(self.image_root, location_id)) as files:
+                names = sorted(f.name for f in files if f.is_file() and f.name.lower().endswith(IMAGE_EXTENSIONS))
+            if names:
+                images[location_id] = [f"/images/{location_id}/{name}" for name in names]
+        self._images = images
+        self._signature = signature
+        logging.info(f"Indexed images for {len(images)} locations under {self.image_root}")
+        return True
+
+    def images_for(self, location_id: str) -> List[str]:
+        return self._images.get(location_id, [])
 
 class DataLoader:
-    def __init__(self):
+    def __init__(self, image_root: str = 'data/images', variants_root: str = 'data/image_variants'):
         self.df: Optional[pd.DataFrame] = None
         self.locations_cache: Optional[List[Dict[str, Any]]] = None
+        self.image_manifest = ImageManifest(image_root)
+        self.image_variants = ImageVariantIndex(variants_root)
+        self._columns: Optional[Dict[str, List[Any]]] = None
 
+    @traced('load_data')
     def load_data(self, csv_path: str) -> Optional[pd.DataFrame]:
         """Loads data from the CSV file."""
         if self.df is not None:
@@ -35,82 +87,79 @@ class DataLoader:
             logging.error(f"Error loading CSV: {e}")
             return None
 
+    def _text_column(self, column: str, default: str = '') -> List[str]:
+        """Returns a column as strings, or `default` for every row if the column is missing."""
+        if column in self.df.columns:
+            return [str(value) for value in self.df[column].tolist()]
+        return [default] * len(self.df)
+
+    def _prepared_columns(self) -> Dict[str, List[Any]]:
+        """
+        Reads each DataFrame column once into a list of strings and splits the list fields.
+
+        The outputs are then built by zipping these lists, instead of a per-row iterrows().
+        """
+        if self._columns is not None:
+            return self._columns
+
+        columns: Dict[str, List[Any]] = {}
+        for column in ('index', 'title', 'link', 'address', 'image', 'content', 'content_shorter_version',
+                       'location_area', 'category_type', 'price_range', 'operating_hours') + LIST_FIELDS:
+            columns[column] = self._text_column(column)
+        columns['operating_hours_or_na'] = self._text_column('operating_hours', 'N/A')
+        for column in LIST_FIELDS:
+            columns[f'{column}_list'] = [value.split(',') if value else [] for value in columns[column]]
+        self._columns = columns
+        return columns
+
+    @traced('get_formatted_locations')
     def get_formatted_locations(self) -> List[Dict[str, Any]]:
-        """Returns formatted locations with images."""
-        if self.locations_cache is not None:
+        """Returns formatted locations with images and their resized variants."""
+        images_changed = self.image_manifest.refresh()
+        variants_changed = self.image_variants.refresh()
+        if self.locations_cache is not None and not images_changed and not variants_changed:
             return self.locations_cache
 
         if self.df is None:
             return []
 
-        locations = []
-        for _, row in self.df.iterrows():
-            # Get the list of images for this location
-            location_id = str(row['index']).zfill(6)
-            image_dir = f"data/images/{location_id}"
-            images = []
-            if os.path.exists(image_dir):
-                images = [f"/images/{location_id}/{f}" for f in os.listdir(image_dir) if f.endswith(('.png', '.jpg', '.jpeg'))]
-            
-            # Convert string lists to actual lists
-            theme_highlights = row['theme_highlights'].split(',') if row['theme_highlights'] else []
-            audience_suitability = row['audience_suitability'].split(',') if row['audience_suitability'] else []
-            additional_attributes = row['additional_attributes'].split(',') if row['additional_attributes'] else []
-            
-            location = {
-                "id": str(row['index']),
-                "title": str(row['title']),
-                "link": str(row['link']) if 'link' in row else "",
-                "address": str(row['address']) if 'address' in row else "",
-                "images": images,
-                "content": str(row['content']) if 'content' in row else "",
-                "content_shorter_version": str(row['content_shorter_version']),
-                "location_area": str(row['location_area']),
-                "category_type": str(row['category_type']),
-                "theme_highlights": theme_highlights,
-                "price_range": str(row['price_range']),
-                "audience_suitability": audience_suitability,
-                "operating_hours": str(row['operating_hours']) if 'operating_hours' in row else "",
-                "additional_attributes": additional_attributes
-            }
-            locations.append(location)
+        c = self._prepared_columns()
+        ids = c['index']
+        images = [self.image_manifest.images_for(id_.zfill(6)) for id_ in ids]
+        # One entry per image: {'src', 'webp_srcset', 'jpeg_srcset'}, or None if no variants were built
+        image_variants = [[self.image_variants.srcset_for(url) for url in urls] for urls in images]
+        keys = ('id', 'title', 'link', 'address', 'images', 'image_variants', 'content', 'content_shorter_version',
+                'location_area', 'category_type', 'theme_highlights', 'price_range', 'audience_suitability',
+                'operating_hours', 'additional_attributes')
+        values = (ids, c['title'], c['link'], c['address'], images, image_variants, c['content'],
+                  c['content_shorter_version'], c['location_area'], c['category_type'], c['theme_highlights_list'],
+                  c['price_range'], c['audience_suitability_list'], c['operating_hours'],
+                  c['additional_attributes_list'])
+        locations = [dict(zip(keys, row)) for row in zip(*values)]
 
         self.locations_cache = locations
         return locations
 
+    @traced('prepare_documents')
     def prepare_documents(self) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
         """Prepares documents for embedding and stores metadata."""
         if self.df is None:
             return [], [], []
 
-        documents = []
-        metadatas = []
-        ids = []
-        for _, row in self.df.iterrows():
-            content_to_embed = f"Title: {row['title']}\n" \
-                            f"Area: {row['location_area']}\n" \
-                            f"Category: {row['category_type']}\n" \
-                            f"Themes: {row['theme_highlights']}\n" \
-                            f"Audience: {row['audience_suitability']}\n" \
-                            f"Price: {row['price_range']}\n" \
-                            f"Summary: {row['content_shorter_version']}\n" \
-                            f"Attributes: {row['additional_attributes']}"
-            documents.append(content_to_embed)
-            metadata = {
-                'index': str(row['index']),
-                'title': str(row['title']),
-                'link': str(row.get('link', '')),
-                'image': str(row.get('image', '')),
-                'address': str(row.get('address', '')),
-                'location_area': str(row['location_area']),
-                'category_type': str(row['category_type']),
-                'price_range': str(row['price_range']),
-                'operating_hours': str(row.get('operating_hours', 'N/A')),
-            }
-            metadatas.append(metadata)
-            ids.append(str(row['index']))
+        c = self._prepared_columns()
+        documents = [
+            f"Title: {title}\nArea: {area}\nCategory: {category}\nThemes: {themes}\nAudience: {audience}\n"
+            f"Price: {price}\nSummary: {summary}\nAttributes: {attributes}"
+            for title, area, category, themes, audience, price, summary, attributes in zip(
+                c['title'], c['location_area'], c['category_type'], c['theme_highlights'],
+                c['audience_suitability'], c['price_range'], c['content_shorter_version'],
+                c['additional_attributes'])
+        ]
+        keys = ('index', 'title', 'link', 'image', 'address', 'location_area', 'category_type', 'price_range',
+                'operating_hours')
+        values = (c['index'], c['title'], c['link'], c['image'], c['address'], c['location_area'],
+                  c['category_type'], c['price_range'], c['operating_hours_or_na'])
+        metadatas = [dict(zip(keys, row)) for row in zip(*values)]
+        ids = list(c['index'])
         logging.info(f"Prepared {len(documents)} documents for embedding.")
         return documents, metadatas, ids
-
-# Create a singleton instance
-data_loader = DataLoader()
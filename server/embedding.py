@@ -1,9 +1,17 @@
 import chromadb
 from chromadb.utils import embedding_functions
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from config import COLLECTION_NAME
 
+if TYPE_CHECKING:
+    from index_artifact import EmbeddingArtifact
+
 def get_embedding_function() -> embedding_functions.SentenceTransformerEmbeddingFunction:
     """Initializes and returns the Sentence Transformer embedding function."""
     from config import EMBEDDING_MODEL_NAME
@@ -12,49 +20,175 @@ def get_embedding_function() -> embedding_functions.SentenceTransformerEmbedding
     logging.info("Embedding model loaded.")
     return ef
 
-def build_or_load_index(documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str], 
-                       embedding_function: embedding_functions.SentenceTransformerEmbeddingFunction) -> Optional[chromadb.Collection]:
-    """Builds a new ChromaDB index or loads an existing one."""
-    from config import PERSIST_DIRECTORY, COLLECTION_NAME
-    
+def compute_content_hash(document: str, metadata: Dict[str, Any]) -> str:
+    """Hashes a prepared document and its metadata so edited rows can be detected."""
+    payload = document + "\n" + json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _get_existing_hashes(collection: chromadb.Collection, page_size: int = 10000) -> Dict[str, Optional[str]]:
+    """Reads the stored content hash of every indexed ID, one page at a time."""
+    existing_hashes: Dict[str, Optional[str]] = {}
+    offset = 0
+    while True:
+        page = collection.get(include=['metadatas'], limit=page_size, offset=offset)
+        for id_, meta in zip(page['ids'], page['metadatas']):
+            existing_hashes[id_] = (meta or {}).get('content_hash')
+        if len(page['ids']) < page_size:
+            return existing_hashes
+        offset += page_size
+
+def embed_documents(documents: List[str], embedding_function: embedding_functions.SentenceTransformerEmbeddingFunction,
+                    batch_size: int) -> np.ndarray:
+    """Embeds documents in large batches with progress logging and returns a float32 matrix."""
+    total = len(documents)
+    start_time = time.time()
+    batches = []
+    for i in range(0, total, batch_size):
+        batches.append(np.asarray(embedding_function(documents[i:i+batch_size]), dtype=np.float32))
+        done = min(i + batch_size, total)
+        logging.info(f"Embedded {done}/{total} documents ({done / max(time.time() - start_time, 1e-9):.0f} docs/s)")
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(batches)
+
+def _upsert_in_batches(collection: chromadb.Collection, documents: List[str], metadatas: List[Dict[str, Any]],
+                       ids: List[str], embedding_function: embedding_functions.SentenceTransformerEmbeddingFunction,
+                       batch_size: int, write_batch_size: int) -> None:
+    """
+    Embeds documents in large batches and upserts them with precomputed embeddings.
+
+    Writes to Chroma happen on a background thread so the next batch is embedded
+    while the previous one is being stored.
+    """
+    total = len(ids)
+    start_time = time.time()
+    pending_writes = []
+
+    def write(batch_docs, batch_metas, batch_ids, batch_embeddings):
+        for j in range(0, len(batch_ids), write_batch_size):
+            collection.upsert(
+                documents=batch_docs[j:j+write_batch_size],
+                metadatas=batch_metas[j:j+write_batch_size],
+                ids=batch_ids[j:j+write_batch_size],
+                embeddings=batch_embeddings[j:j+write_batch_size]
+            )
+
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        for i in range(0, total, batch_size):
+            batch_docs = documents[i:i+batch_size]
+            batch_embeddings = [list(map(float, e)) for e in embedding_function(batch_docs)]
+            pending_writes.append(writer.submit(write, batch_docs, metadatas[i:i+batch_size], ids[i:i+batch_size],
+                                               batch_embeddings))
+            done = min(i + batch_size, total)
+            rate = done / max(time.time() - start_time, 1e-9)
+            logging.info(f"Embedded {done}/{total} documents ({rate:.0f} docs/s)")
+        for future in pending_writes:
+            future.result()
+    logging.info(f"Upserted {total} documents in {time.time() - start_time:.1f}s")
+
+def _copy_from_collection(collection: chromadb.Collection, source: chromadb.Collection, documents: List[str],
+                          metadatas: List[Dict[str, Any]], ids: List[str], rows: List[int],
+                          batch_size: int) -> List[int]:
+    """Upserts `rows` with the vectors `source` stores for the same content; returns the rows it could not copy."""
+    missing = []
+    for j in range(0, len(rows), batch_size):
+        batch = rows[j:j+batch_size]
+        stored = source.get(ids=[ids[i] for i in batch], include=['embeddings', 'metadatas'])
+        by_id = {id_: ((meta or {}).get('content_hash'), vector)
+                 for id_, meta, vector in zip(stored['ids'], stored['metadatas'], stored['embeddings'])}
+        reusable = []
+        for i in batch:
+            content_hash, _ = by_id.get(ids[i], (None, None))
+            (reusable if content_hash == metadatas[i]['content_hash'] else missing).append(i)
+        if reusable:
+            collection.upsert(
+                documents=[documents[i] for i in reusable],
+                metadatas=[metadatas[i] for i in reusable],
+                ids=[ids[i] for i in reusable],
+                embeddings=[np.asarray(by_id[ids[i]][1], dtype=np.float32).tolist() for i in reusable]
+            )
+    return missing
+
+def build_or_load_index(documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str],
+                       embedding_function: embedding_functions.SentenceTransformerEmbeddingFunction,
+                       precomputed: Optional["EmbeddingArtifact"] = None, collection_name: Optional[str] = None,
+                       source: Optional[chromadb.Collection] = None) -> Optional[chromadb.Collection]:
+    """
+    Builds a new ChromaDB index or incrementally syncs an existing one.
+
+    A content hash of each prepared document is stored in its metadata. Only rows whose
+    hash changed (or that are new) are upserted, and IDs that are no longer in the data
+    are deleted. Rows found in a `precomputed` embedding artifact, or in another
+    `source` collection, with a matching hash reuse their vectors instead of being
+    embedded again. `collection_name` defaults to COLLECTION_NAME.
+    """
+    from config import PERSIST_DIRECTORY, EMBED_BATCH_SIZE
+    collection_name = collection_name or COLLECTION_NAME
+
     client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
-    logging.info(f"Getting or creating Chroma collection: {COLLECTION_NAME}")
+    logging.info(f"Getting or creating Chroma collection: {collection_name}")
     try:
         collection = client.get_or_create_collection(
-            name=COLLECTION_NAME,
+            name=collection_name,
             embedding_function=embedding_function,
             metadata={"hnsw:space": "cosine"}
         )
-        
-        # Check for population
-        if collection.count() < len(documents):
-            logging.warning(f"Collection '{COLLECTION_NAME}' exists but seems incomplete. Re-populating...")
-            existing_ids = set(collection.get(include=[])['ids'])
-            needs_adding_docs, needs_adding_metas, needs_adding_ids = [], [], []
-            
-            for doc, meta, id_ in zip(documents, metadatas, ids):
-                if id_ not in existing_ids:
-                    needs_adding_docs.append(doc)
-                    needs_adding_metas.append(meta)
-                    needs_adding_ids.append(id_)
-
-            if needs_adding_ids:
-                logging.info(f"Adding {len(needs_adding_ids)} new documents to the collection...")
-                batch_size = 100
-                for i in range(0, len(needs_adding_ids), batch_size):
-                    batch_docs = needs_adding_docs[i:i+batch_size]
-                    batch_metas = needs_adding_metas[i:i+batch_size]
-                    batch_ids = needs_adding_ids[i:i+batch_size]
-                    try:
-                        collection.add(documents=batch_docs, metadatas=batch_metas, ids=batch_ids)
-                        logging.info(f"Added batch {i//batch_size + 1}/{(len(needs_adding_ids) + batch_size - 1)//batch_size}")
-                    except Exception as add_e:
-                        logging.error(f"Error adding batch {i//batch_size + 1} to collection: {add_e}")
-                logging.info("Finished adding documents.")
-            else:
-                logging.info("No new documents to add.")
-        else:
-            logging.info(f"Collection '{COLLECTION_NAME}' is up-to-date with {collection.count()} items.")
+        write_batch_size = client.get_max_batch_size()
+
+        hashed_metadatas = [
+            {**meta, 'content_hash': compute_content_hash(doc, meta)}
+            for doc, meta in zip(documents, metadatas)
+        ]
+        existing_hashes = _get_existing_hashes(collection)
+
+        changed = [i for i, (id_, meta) in enumerate(zip(ids, hashed_metadatas))
+                   if existing_hashes.get(id_) != meta['content_hash']]
+        current_ids = set(ids)
+        removed_ids = [id_ for id_ in existing_hashes if id_ not in current_ids]
+
+        if not changed and not removed_ids:
+            logging.info(f"Collection '{collection_name}' is up-to-date with {collection.count()} items.")
+
+        if removed_ids:
+            logging.info(f"Deleting {len(removed_ids)} documents that are no longer in the data...")
+            for i in range(0, len(removed_ids), write_batch_size):
+                collection.delete(ids=removed_ids[i:i+write_batch_size])
+
+        if changed and precomputed is not None:
+            reusable = []
+            needs_embedding = []
+            for i in changed:
+                vector = precomputed.vector_for(ids[i], hashed_metadatas[i]['content_hash'])
+                (needs_embedding if vector is None else reusable).append(i)
+            if reusable:
+                logging.info(f"Upserting {len(reusable)} documents with vectors from artifact {precomputed.version}...")
+                for j in range(0, len(reusable), write_batch_size):
+                    batch = reusable[j:j+write_batch_size]
+                    collection.upsert(
+                        documents=[documents[i] for i in batch],
+                        metadatas=[hashed_metadatas[i] for i in batch],
+                        ids=[ids[i] for i in batch],
+                        embeddings=[precomputed.vector_for(ids[i], hashed_metadatas[i]['content_hash']).astype(np.float32).tolist()
+                                    for i in batch]
+                    )
+            changed = needs_embedding
+
+        if changed and source is not None:
+            logging.info(f"Copying vectors of up to {len(changed)} documents from collection '{source.name}'...")
+            changed = _copy_from_collection(collection, source, documents, hashed_metadatas, ids, changed,
+                                            write_batch_size)
+
+        if changed:
+            logging.info(f"Embedding and upserting {len(changed)} new or changed documents...")
+            _upsert_in_batches(
+                collection,
+                [documents[i] for i in changed],
+                [hashed_metadatas[i] for i in changed],
+                [ids[i] for i in changed],
+                embedding_function,
+                EMBED_BATCH_SIZE,
+                write_batch_size
+            )
 
         return collection
 
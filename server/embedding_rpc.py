@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import numpy as np
+from typing import List, Dict, Any, Callable, Optional
+
+# Every message is a 4-byte big-endian length followed by that many bytes
+_LENGTH = struct.Struct('>I')
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def _recv_frame(sock: socket.socket) -> Optional[bytes]:
+    header = _recv_exactly(sock, _LENGTH.size)
+    if header is None:
+        return None
+    return _recv_exactly(sock, _LENGTH.unpack(header)[0])
+
+def _send_frames(sock: socket.socket, *frames: bytes) -> None:
+    sock.sendall(b''.join(_LENGTH.pack(len(frame)) + frame for frame in frames))
+
+class EmbeddingSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves query embeddings over a Unix domain socket.
+
+    Request: one frame of JSON {"texts": [...]}. Response: a JSON header frame
+    {"shape": [n, dim]} followed by a frame of n*dim float32 values, or a single
+    {"error": str} frame. Connections are persistent; each is handled on its own
+    thread, so concurrent requests from all workers meet in `embed` (normally an
+    EmbeddingService, which batches them into shared forward passes).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, embed: Callable[[List[str]], Any]):
+        self.embed = embed
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        while True:
+            frame = _recv_frame(self.request)
+            if frame is None:
+                return
+            try:
+                texts = json.loads(frame)['texts']
+                vectors = np.ascontiguousarray(self.server.embed(texts) if texts else np.zeros((0, 0)),
+                                               dtype=np.float32)
+                _send_frames(self.request, json.dumps({'shape': list(vectors.shape)}).encode('utf-8'),
+                             vectors.tobytes())
+            except Exception as e:
+                logging.error(f"Error embedding {len(frame)}-byte request: {e}")
+                _send_frames(self.request, json.dumps({'error': str(e)}).encode('utf-8'))
+
+class RemoteEmbeddingFunction:
+    """
+    Embeds texts through an EmbeddingSocketServer; a drop-in for the local embedding function.
+
+    Each calling thread keeps its own connection. A call that fails on a broken
+    connection reconnects and retries once.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'texts': 0, 'errors': 0, 'reconnects': 0}
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        sock = self._connection()
+        _send_frames(sock, json.dumps({'texts': texts}).encode('utf-8'))
+        header = _recv_frame(sock)
+        if header is None:
+            raise ConnectionError("Index server closed the connection")
+        header = json.loads(header)
+        if 'error' in header:
+            raise RuntimeError(f"Index server failed to embed: {header['error']}")
+        body = _recv_frame(sock)
+        if body is None:
+            raise ConnectionError("Index server closed the connection")
+        return np.frombuffer(body, dtype=np.float32).reshape(header['shape'])
+
+    def __call__(self, input: List[str]) -> np.ndarray:
+        texts = list(input)
+        try:
+            try:
+                vectors = self._request(texts)
+            except ConnectionError:
+                # The index server may have restarted; retry once on a fresh connection
+                self._close()
+                with self._lock:
+                    self.counters['reconnects'] += 1
+                vectors = self._request(texts)
+        except Exception:
+            self._close()
+            with self._lock:
+                self.counters['errors'] += 1
+            raise
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters['texts'] += len(texts)
+        return vectors
+
+    def ping(self) -> bool:
+        """True if the index server answers."""
+        try:
+            self([])
+            return True
+        except Exception as e:
+            logging.warning(f"Index server at {self.socket_path} is not reachable: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,148 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import numpy as np
+
+class EmbeddingService:
+    """
+    Micro-batching front end for the query embedding model.
+
+    Callers on any thread submit texts and block on futures. A dedicated worker
+    thread drains the queue, waiting up to `max_wait_ms` after the first pending
+    item (or until `max_batch_size` items are collected), runs the whole batch
+    through the model in one call and resolves every caller's future. Callers
+    wait at most `timeout` seconds; requests they gave up on are skipped.
+    """
+
+    def __init__(self, embedding_function: Callable[[List[str]], Any], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, timeout: Optional[float] = None):
+        self.embedding_function = embedding_function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._model_seconds = 0.0
+        self._batch_sizes: Dict[int, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Starts the worker thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+            self._thread.start()
+            logging.info(f"Embedding service started (max batch {self.max_batch_size}, "
+                         f"max wait {self.max_wait * 1000:.1f}ms).")
+
+    def stop(self) -> None:
+        """Stops the worker after the queued requests are served."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def submit(self, text: str) -> "Future[np.ndarray]":
+        """Queues one text and returns a future for its embedding."""
+        future: "Future[np.ndarray]" = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Embeds texts through the shared batches, blocking until all are done. Returns a float32 matrix.
+
+        Waits at most `timeout` seconds (default: the service's) for all of them; on
+        expiry the unfinished requests are cancelled and TimeoutError is raised.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        futures = [self.submit(text) for text in texts]
+        try:
+            return np.asarray([future.result(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+                               for future in futures], dtype=np.float32)
+        except FutureTimeoutError:
+            for future in futures:
+                future.cancel()
+            with self._stats_lock:
+                self._timeouts += 1
+            raise TimeoutError(f"Embedding {len(texts)} queries took longer than {timeout}s")
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.embed(texts)
+
+    def _collect(self, first: Tuple[str, Future]) -> Tuple[List[Tuple[str, Future]], bool]:
+        """Gathers a batch starting from `first`. Returns the batch and whether a stop was requested."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+            # Callers that timed out and cancelled their future no longer need a vector
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: List[Tuple[str, Future]]) -> None:
+        # Identical concurrent queries are embedded once
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        start_time = time.perf_counter()
+        try:
+            vectors = np.asarray(self.embedding_function(unique_texts), dtype=np.float32)
+        except Exception as e:
+            logging.error(f"Error embedding batch of {len(unique_texts)} queries: {e}")
+            with self._stats_lock:
+                self._errors += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start_time
+
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future in batch:
+            future.set_result(by_text[text])
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._model_seconds += elapsed
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and batch-size counters."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "timeouts": self._timeouts,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "avg_model_ms": 1000 * self._model_seconds / self._batches if self._batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "max_batch_limit": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
@@ -0,0 +1,150 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Price words users type, mapped to the price tiers they imply
+PRICE_SYNONYMS = {
+    'free': ['free'],
+    'cheap': ['free', 'low'], 'budget': ['free', 'low'], 'affordable': ['free', 'low'],
+    'inexpensive': ['free', 'low'],
+    'moderate': ['mid'], 'mid-range': ['mid'], 'midrange': ['mid'], 'reasonable': ['low', 'mid'],
+    'expensive': ['high'], 'luxury': ['high'], 'upscale': ['high'], 'splurge': ['high'], 'pricey': ['high'],
+    'fine dining': ['high'],
+}
+
+# Words users type for who is going, mapped to fragments of audience_suitability values
+AUDIENCE_SYNONYMS = {
+    'kids': ['famil', 'kid', 'child'], 'children': ['famil', 'kid', 'child'], 'family': ['famil'],
+    'toddler': ['famil', 'kid', 'child'], 'partner': ['couple'], 'date': ['couple'], 'romantic': ['couple'],
+    'girlfriend': ['couple'], 'boyfriend': ['couple'], 'wife': ['couple'], 'husband': ['couple'],
+    'solo': ['solo'], 'alone': ['solo'], 'myself': ['solo'], 'friends': ['friend', 'group'],
+    'group': ['group', 'friend'], 'elderly': ['senior', 'elder'], 'grandparents': ['senior', 'elder'],
+    'students': ['student'],
+}
+
+def price_tier(value: str) -> Optional[str]:
+    """Classifies a price_range value such as '$$' or 'Free' into free/low/mid/high."""
+    lowered = value.lower()
+    if _PRICE_FREE.search(lowered):
+        return 'free'
+    dollars = value.count('$')
+    if dollars:
+        return 'low' if dollars == 1 else 'mid' if dollars == 2 else 'high'
+    if any(word in lowered for word in ('budget', 'cheap', 'low')):
+        return 'low'
+    if any(word in lowered for word in ('moderate', 'mid', 'medium')):
+        return 'mid'
+    if any(word in lowered for word in ('expensive', 'luxury', 'high', 'premium')):
+        return 'high'
+    return None
+
+def _phrase_pattern(phrase: str) -> "re.Pattern[str]":
+    """Matches a phrase as whole words, allowing a plural 's' ('cafe' also matches 'cafes')."""
+    return re.compile(r'(?<![a-z0-9])' + re.escape(phrase.lower()) + r's?(?![a-z0-9])')
+
+def _price_pattern(word: str) -> "re.Pattern[str]":
+    """Like _phrase_pattern, but a hyphen also joins words, so 'free' does not match 'gluten-free'."""
+    return re.compile(r'(?<![a-z0-9-])' + re.escape(word.lower()) + r's?(?![a-z0-9-])')
+
+_PRICE_FREE = _price_pattern('free')
+
+class FacetIndex:
+    """
+    Gazetteers of the distinct values of categorical CSV columns.
+
+    Used to spot structured constraints (area, category, price) in a free-text
+    search query so they can be pushed down to retrieval as metadata filters, and
+    themes and audiences for conversation summaries and local query building.
+    """
+
+    FIELDS = ('location_area', 'category_type')
+
+    def __init__(self, values: Dict[str, List[str]]):
+        self.values = values
+        self._patterns = {
+            field: [(value, _phrase_pattern(value)) for value in values.get(field, [])]
+            for field in self.FIELDS
+        }
+        self._price_patterns = [(_price_pattern(word), tiers) for word, tiers in PRICE_SYNONYMS.items()]
+        self._audience_patterns = [(value, _phrase_pattern(value)) for value in values.get('audience', [])]
+        self._audience_synonyms = [(_phrase_pattern(word), fragments) for word, fragments in AUDIENCE_SYNONYMS.items()]
+        self._theme_patterns = [(value, _phrase_pattern(value)) for value in values.get('theme', [])]
+        self._price_values_by_tier: Dict[str, List[str]] = {}
+        for value in values.get('price_range', []):
+            tier = price_tier(value)
+            if tier:
+                self._price_values_by_tier.setdefault(tier, []).append(value)
+
+    @classmethod
+    def from_dataframe(cls, df: "pd.DataFrame") -> "FacetIndex":
+        """Collects the distinct non-empty values of each facet column."""
+        values = {}
+        for field in cls.FIELDS + ('price_range',):
+            if field in df.columns:
+                column = df[field].dropna().astype(str).str.strip()
+                values[field] = sorted(v for v in column.unique() if v)
+        # Comma-separated lists per location
+        for name, column in (('audience', 'audience_suitability'), ('theme', 'theme_highlights')):
+            if column in df.columns:
+                items = {item.strip() for v in df[column].dropna().astype(str) for item in v.split(',')}
+                values[name] = sorted(item for item in items if item)
+        return cls(values)
+
+    def extract_filters(self, query: str) -> Dict[str, List[str]]:
+        """Returns the facet values mentioned in a query, e.g. {'location_area': ['Bedok']}."""
+        lowered = query.lower()
+        filters: Dict[str, List[str]] = {}
+        for field, patterns in self._patterns.items():
+            matches = [value for value, pattern in patterns if pattern.search(lowered)]
+            # Prefer the most specific phrase when one value contains another
+            matches = [m for m in matches if not any(m != other and m.lower() in other.lower() for other in matches)]
+            if matches:
+                filters[field] = matches
+
+        tiers: List[str] = []
+        for pattern, word_tiers in self._price_patterns:
+            if pattern.search(lowered):
+                tiers.extend(t for t in word_tiers if t not in tiers)
+        prices = [value for tier in tiers for value in self._price_values_by_tier.get(tier, [])]
+        if prices:
+            filters['price_range'] = prices
+        return filters
+
+    def extract_audience(self, query: str) -> List[str]:
+        """
+        Returns the audience values a query refers to, e.g. ['Families'] for 'with my kids'.
+
+        Audience is not stored in the index metadata, so it is used for conversation
+        summaries rather than as a retrieval filter.
+        """
+        lowered = query.lower()
+        matches = [value for value, pattern in self._audience_patterns if pattern.search(lowered)]
+        for pattern, fragments in self._audience_synonyms:
+            if pattern.search(lowered):
+                matches.extend(value for value in self.values.get('audience', [])
+                               if value not in matches and any(f in value.lower() for f in fragments))
+        return matches
+
+    def extract_themes(self, query: str) -> List[str]:
+        """Returns the theme_highlights values mentioned in a query, e.g. ['Nightlife']."""
+        lowered = query.lower()
+        return [value for value, pattern in self._theme_patterns if pattern.search(lowered)]
+
+    def matched_spans(self, query: str) -> List[Tuple[int, int]]:
+        """Character spans of a query covered by any gazetteer phrase or price/audience word."""
+        lowered = query.lower()
+        patterns = [pattern for field_patterns in self._patterns.values() for _, pattern in field_patterns]
+        patterns += [pattern for pattern, _ in self._price_patterns]
+        patterns += [pattern for _, pattern in self._audience_patterns + self._theme_patterns]
+        patterns += [pattern for pattern, _ in self._audience_synonyms]
+        return [match.span() for pattern in patterns for match in pattern.finditer(lowered)]
+
+    @staticmethod
+    def to_where(filters: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+        """Converts extracted filters into a Chroma-style `where` clause."""
+        clauses = [{field: {'$in': values}} for field, values in filters.items() if values]
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
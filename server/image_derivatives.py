@@ -0,0 +1,212 @@
+"""
+Builds resized WebP/JPEG derivatives of the location images.
+
+Every image under the source directory (data/images/<location_id>/<file>) gets one
+variant per configured width and format, named with a content hash of the source so
+the server can serve them with immutable cache headers. A manifest records what was
+built; re-running only processes new or changed images and removes stale variants.
+
+Usage:
+    python image_derivatives.py [--source DIR] [--output DIR] [--widths 320,640,1280] [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from config import IMAGE_SOURCE_DIR, IMAGE_VARIANTS_DIR, IMAGE_VARIANT_WIDTHS
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+VARIANT_FORMATS = (('webp', 'WEBP', 'webp'), ('jpeg', 'JPEG', 'jpg'))  # (name, Pillow format, file extension)
+VARIANTS_URL_PREFIX = '/image-variants'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:10]
+
+def build_variants(source_path: str, relative_path: str, output_dir: str, widths: List[int]) -> Dict[str, Any]:
+    """Resizes one source image to every width and format. Returns its manifest entry."""
+    from PIL import Image, ImageOps
+
+    stat = os.stat(source_path)
+    content_hash = _file_hash(source_path)
+    location_id, file_name = os.path.split(relative_path)
+    stem = os.path.splitext(file_name)[0]
+    os.makedirs(os.path.join(output_dir, location_id), exist_ok=True)
+
+    variants = []
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        source_width, source_height = image.size
+        # Never upscale; the largest variant is capped at the source width
+        target_widths = sorted({min(w, source_width) for w in widths})
+        for width in target_widths:
+            height = max(1, round(source_height * width / source_width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != source_width else image.copy()
+            for name, pil_format, extension in VARIANT_FORMATS:
+                variant_name = f"{stem}-{content_hash}-{width}w.{extension}"
+                variant_path = os.path.join(output_dir, location_id, variant_name)
+                if not os.path.exists(variant_path):
+                    frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                    tmp_path = f"{variant_path}.tmp"
+                    frame.save(tmp_path, format=pil_format, quality=80, optimize=True)
+                    os.replace(tmp_path, variant_path)
+                variants.append({
+                    'width': width,
+                    'format': name,
+                    'url': f"{VARIANTS_URL_PREFIX}/{location_id}/{variant_name}",
+                })
+
+    return {
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'hash': content_hash,
+        'width': source_width,
+        'height': source_height,
+        'variants': variants,
+    }
+
+def _load_manifest(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {'version': MANIFEST_VERSION, 'widths': [], 'images': {}}
+
+def _write_manifest(output_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def _remove_variants(output_dir: str, entry: Dict[str, Any], keep: set) -> None:
+    for variant in entry.get('variants', []):
+        if variant['url'] in keep:
+            continue
+        path = os.path.join(output_dir, variant['url'][len(VARIANTS_URL_PREFIX) + 1:])
+        if os.path.exists(path):
+            os.remove(path)
+
+def build_all(source_dir: str, output_dir: str, widths: List[int], workers: Optional[int] = None) -> Dict[str, Any]:
+    """Incrementally builds derivatives for every source image and rewrites the manifest."""
+    start_time = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    previous: Dict[str, Any] = manifest['images'] if manifest.get('widths') == widths else {}
+
+    sources: Dict[str, str] = {}
+    with os.scandir(source_dir) as location_dirs:
+        for location_dir in location_dirs:
+            if not location_dir.is_dir():
+                continue
+            with os.scandir(location_dir.path) as files:
+                for f in files:
+                    if f.is_file() and f.name.lower().endswith(IMAGE_EXTENSIONS):
+                        sources[f"{location_dir.name}/{f.name}"] = f.path
+
+    images: Dict[str, Any] = {}
+    pending: List[Tuple[str, str]] = []
+    for relative_path, source_path in sorted(sources.items()):
+        entry = previous.get(relative_path)
+        stat = os.stat(source_path)
+        if entry and entry['source_size'] == stat.st_size and entry['source_mtime_ns'] == stat.st_mtime_ns:
+            images[relative_path] = entry
+        else:
+            pending.append((relative_path, source_path))
+
+    logging.info(f"{len(images)} images up to date; building variants for {len(pending)}.")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {relative_path: pool.submit(build_variants, source_path, relative_path, output_dir, widths)
+                   for relative_path, source_path in pending}
+        for done, (relative_path, future) in enumerate(futures.items(), start=1):
+            try:
+                images[relative_path] = future.result()
+            except Exception as e:
+                logging.error(f"Error building variants for {relative_path}: {e}")
+            if done % 100 == 0 or done == len(futures):
+                logging.info(f"Built variants for {done}/{len(futures)} images")
+
+    # Drop variants whose source was removed or replaced, or whose width is no longer configured
+    current_urls = {variant['url'] for entry in images.values() for variant in entry['variants']}
+    for entry in manifest['images'].values():
+        _remove_variants(output_dir, entry, keep=current_urls)
+
+    manifest = {'version': MANIFEST_VERSION, 'widths': widths, 'images': images}
+    _write_manifest(output_dir, manifest)
+    logging.info(f"Image variant manifest written for {len(images)} images in {time.time() - start_time:.1f}s")
+    return manifest
+
+class ImageVariantIndex:
+    """
+    Read side of the derivative manifest, used when formatting locations.
+
+    The manifest is reloaded whenever its mtime changes.
+    """
+
+    def __init__(self, variants_dir: str = IMAGE_VARIANTS_DIR):
+        self.variants_dir = variants_dir
+        self._mtime: Optional[int] = None
+        self._images: Dict[str, Any] = {}
+
+    def refresh(self) -> bool:
+        """Reloads the manifest if it changed on disk. Returns True if it was reloaded."""
+        path = os.path.join(self.variants_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self._images = _load_manifest(self.variants_dir)['images'] if mtime is not None else {}
+        self._mtime = mtime
+        return True
+
+    def srcset_for(self, image_url: str) -> Optional[Dict[str, str]]:
+        """
+        Returns {'src', 'webp_srcset', 'jpeg_srcset'} for an original image URL such as
+        '/images/000001/a.jpg', or None if no derivatives were built for it.
+        """
+        entry = self._images.get(image_url[len('/images/'):])
+        if not entry or not entry['variants']:
+            return None
+        by_format: Dict[str, List[Dict[str, Any]]] = {}
+        for variant in entry['variants']:
+            by_format.setdefault(variant['format'], []).append(variant)
+        jpeg = sorted(by_format.get('jpeg', []), key=lambda v: v['width'])
+        webp = sorted(by_format.get('webp', []), key=lambda v: v['width'])
+        fallback = jpeg or webp
+        return {
+            # Mid-sized variant as the default src for browsers without srcset support
+            'src': fallback[len(fallback) // 2]['url'],
+            'webp_srcset': ', '.join(f"{v['url']} {v['width']}w" for v in webp),
+            'jpeg_srcset': ', '.join(f"{v['url']} {v['width']}w" for v in jpeg),
+        }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build resized WebP/JPEG variants of location images.")
+    parser.add_argument('--source', default=IMAGE_SOURCE_DIR, help="Original images directory")
+    parser.add_argument('--output', default=IMAGE_VARIANTS_DIR, help="Variants output directory")
+    parser.add_argument('--widths', default=','.join(map(str, IMAGE_VARIANT_WIDTHS)),
+                        help="Comma-separated variant widths in pixels")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel worker processes (default: CPU count)")
+    args = parser.parse_args()
+    widths = sorted({int(w) for w in args.widths.split(',') if w.strip()})
+    build_all(args.source, args.output, widths, args.workers)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
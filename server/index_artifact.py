@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+ARTIFACT_FORMAT_VERSION = 1
+CURRENT_POINTER = "CURRENT"
+
+def compute_data_hash(ids: List[str], content_hashes: List[str]) -> str:
+    """Hashes the (id, content hash) pairs of a prepared dataset, independent of row order."""
+    digest = hashlib.sha256()
+    for id_, content_hash in sorted(zip(ids, content_hashes)):
+        digest.update(f"{id_}\t{content_hash}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+class EmbeddingArtifact:
+    """
+    A prebuilt, read-only embedding matrix on disk.
+
+    Layout of a version directory:
+        embeddings.npy      L2-normalized (n, dim) float32/float16 matrix, memory-mapped on load
+        ids.json            row order of the matrix
+        content_hashes.json content hash of each row's prepared document
+        manifest.json       format version, model name, data hash, dtype, shape, creation time
+    """
+
+    def __init__(self, path: str, manifest: Dict[str, Any], ids: List[str], content_hashes: List[str],
+                 embeddings: np.ndarray):
+        self.path = path
+        self.manifest = manifest
+        self.ids = ids
+        self.content_hashes = content_hashes
+        self.embeddings = embeddings
+        self._row_by_id = {id_: row for row, id_ in enumerate(ids)}
+
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+
+    def vector_for(self, id_: str, content_hash: str) -> Optional[np.ndarray]:
+        """Returns the stored vector for an ID, or None if it is missing or was built from different content."""
+        row = self._row_by_id.get(id_)
+        if row is None or self.content_hashes[row] != content_hash:
+            return None
+        return self.embeddings[row]
+
+def write_artifact(output_dir: str, ids: List[str], content_hashes: List[str], embeddings: np.ndarray,
+                   model_name: str, dtype: str = 'float32') -> str:
+    """
+    Writes a new artifact version and points CURRENT at it.
+
+    The version directory is written under a temporary name and renamed into place,
+    so readers never observe a partially written artifact.
+    """
+    if dtype not in ('float32', 'float16'):
+        raise ValueError(f"Unsupported artifact dtype: {dtype}")
+
+    data_hash = compute_data_hash(ids, content_hashes)
+    version = f"{data_hash[:16]}-{dtype}"
+    version_dir = os.path.join(output_dir, version)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not os.path.exists(version_dir):
+        tmp_dir = f"{version_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.where(norms == 0, 1, norms)).astype(dtype)
+        np.save(os.path.join(tmp_dir, 'embeddings.npy'), matrix)
+        with open(os.path.join(tmp_dir, 'ids.json'), 'w') as f:
+            json.dump(ids, f)
+        with open(os.path.join(tmp_dir, 'content_hashes.json'), 'w') as f:
+            json.dump(content_hashes, f)
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'version': version,
+            'model_name': model_name,
+            'data_hash': data_hash,
+            'dtype': dtype,
+            'count': int(matrix.shape[0]),
+            'dimension': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            'normalized': True,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_dir, version_dir)
+        logging.info(f"Wrote embedding artifact {version} ({manifest['count']} x {manifest['dimension']}, {dtype})")
+    else:
+        logging.info(f"Embedding artifact {version} already exists.")
+
+    pointer_tmp = os.path.join(output_dir, f"{CURRENT_POINTER}.tmp-{os.getpid()}")
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(output_dir, CURRENT_POINTER))
+    return version_dir
+
+def load_artifact(artifact_dir: str, model_name: Optional[str] = None) -> Optional[EmbeddingArtifact]:
+    """
+    Opens the CURRENT artifact version with the embedding matrix memory-mapped.
+
+    Returns None if there is no artifact, it was written by an incompatible format
+    version, or it was built with a different embedding model.
+    """
+    pointer_path = os.path.join(artifact_dir, CURRENT_POINTER)
+    if not os.path.exists(pointer_path):
+        return None
+
+    try:
+        with open(pointer_path) as f:
+            version = f.read().strip()
+        version_dir = os.path.join(artifact_dir, version)
+        with open(os.path.join(version_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            logging.warning(f"Ignoring embedding artifact {version}: unsupported format version.")
+            return None
+        if model_name and manifest.get('model_name') != model_name:
+            logging.warning(f"Ignoring embedding artifact {version}: built with {manifest.get('model_name')}, "
+                            f"expected {model_name}.")
+            return None
+        with open(os.path.join(version_dir, 'ids.json')) as f:
+            ids = json.load(f)
+        with open(os.path.join(version_dir, 'content_hashes.json')) as f:
+            content_hashes = json.load(f)
+        embeddings = np.load(os.path.join(version_dir, 'embeddings.npy'), mmap_mode='r')
+        logging.info(f"Opened embedding artifact {version} ({len(ids)} vectors)")
+        return EmbeddingArtifact(version_dir, manifest, ids, content_hashes, embeddings)
+    except Exception as e:
+        logging.error(f"Error loading embedding artifact from {artifact_dir}: {e}")
+        return None
@@ -0,0 +1,84 @@
+"""
+Index server for multi-worker deployments (SERVING_MODE=shared).
+
+Loads the location CSV, the embedding model and the search index once, writes a
+serving bundle (memory-mappable embedding matrix, BM25 postings, catalog filter
+indexes, per-row metadata and the precompressed /api/locations payload) to
+SERVING_BUNDLE_DIR, and embeds queries
+for the workers over a Unix socket at INDEX_SERVER_SOCKET. Workers map the bundle
+read-only, so the model, the matrix and the payloads exist once per host however
+many workers run.
+
+With CSV_RELOAD_INTERVAL > 0 it watches the CSV, re-embeds only changed rows and
+writes a new bundle version; workers pick it up on their own reload checks.
+
+Usage:
+    python index_server.py [--csv PATH] [--bundle-dir DIR] [--socket PATH]
+    SERVING_MODE=shared uvicorn main:app --workers 4
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+from config import (CSV_PATH, EMBEDDING_MODEL_NAME, SERVING_BUNDLE_DIR, INDEX_SERVER_SOCKET, CSV_RELOAD_INTERVAL)
+from embedding_rpc import EmbeddingSocketServer
+from resources import ServerResources
+from lexical import BM25Index
+from retrievers import HybridRetriever, embedding_matrix
+from serving_bundle import write_bundle
+
+def publish_bundle(resources: ServerResources, bundle_dir: str) -> str:
+    """Writes the current snapshot of `resources` as a new serving bundle version."""
+    snapshot = resources.snapshot
+    matrix = embedding_matrix(snapshot.retriever, resources.collection, snapshot.ids)
+    lexical = (snapshot.retriever.lexical if isinstance(snapshot.retriever, HybridRetriever)
+               else BM25Index(snapshot.documents))
+    return write_bundle(bundle_dir, snapshot.ids, snapshot.content_hashes, snapshot.metadatas,
+                        snapshot.facets.values, matrix, snapshot.version, snapshot.locations,
+                        snapshot.catalog.full_payload, lexical, snapshot.catalog.indexes, EMBEDDING_MODEL_NAME)
+
+def watch_csv(resources: ServerResources, bundle_dir: str, interval: float, stop: threading.Event) -> None:
+    """Republishes the bundle whenever a reload picks up a changed CSV."""
+    while not stop.wait(interval):
+        if resources.csv_changed() and resources.reload().get('status') == 'reloaded' and resources.ready:
+            publish_bundle(resources, bundle_dir)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve query embeddings and a shared index bundle to workers.")
+    parser.add_argument('--csv', default=CSV_PATH, help="Location CSV to index (default: CSV_PATH)")
+    parser.add_argument('--bundle-dir', default=SERVING_BUNDLE_DIR, help="Bundle directory (default: SERVING_BUNDLE_DIR)")
+    parser.add_argument('--socket', default=INDEX_SERVER_SOCKET, help="Unix socket path (default: INDEX_SERVER_SOCKET)")
+    args = parser.parse_args()
+
+    resources = ServerResources(serving_mode='standalone')
+    resources.load_catalog(args.csv)
+    if not resources.warm_up():
+        logging.error(f"Index server failed to start: {resources.error}")
+        return 1
+    publish_bundle(resources, args.bundle_dir)
+
+    server = EmbeddingSocketServer(args.socket, resources.query_embedder or resources.embedding_function)
+    stop = threading.Event()
+    if CSV_RELOAD_INTERVAL > 0:
+        threading.Thread(target=watch_csv, args=(resources, args.bundle_dir, CSV_RELOAD_INTERVAL, stop),
+                         name='csv-watcher', daemon=True).start()
+
+    # serve_forever returns once shutdown() is called from another thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logging.info(f"Index server listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        resources.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
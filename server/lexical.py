@@ -0,0 +1,91 @@
+import logging
+import re
+import numpy as np
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases text and splits it into alphanumeric tokens."""
+    return _TOKEN.findall(text.lower())
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+
+    The BM25 weight of every (term, document) posting is precomputed at build time,
+    so scoring a query is a handful of vectorized scatter-adds. Postings are kept as
+    flat arrays (term i's documents and weights are `docs[offsets[i]:offsets[i + 1]]`),
+    so a prebuilt index can be memory-mapped instead of rebuilt; see `from_postings`.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        size = len(documents)
+        term_freqs: Dict[str, Dict[int, int]] = defaultdict(dict)
+        lengths = np.zeros(size, dtype=np.float32)
+        for doc_idx, document in enumerate(documents):
+            tokens = tokenize(document)
+            lengths[doc_idx] = len(tokens)
+            for token in tokens:
+                postings = term_freqs[token]
+                postings[doc_idx] = postings.get(doc_idx, 0) + 1
+
+        avg_length = float(lengths.mean()) if size else 0.0
+        offsets = np.zeros(len(term_freqs) + 1, dtype=np.int64)
+        all_docs: List[np.ndarray] = []
+        all_weights: List[np.ndarray] = []
+        for i, postings in enumerate(term_freqs.values()):
+            docs = np.fromiter(postings.keys(), dtype=np.int32, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            idf = np.log(1 + (size - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1 - b + b * lengths[docs] / (avg_length or 1))
+            all_docs.append(docs)
+            all_weights.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+            offsets[i + 1] = offsets[i] + len(docs)
+        self._set_postings(size, list(term_freqs), offsets,
+                           np.concatenate(all_docs) if all_docs else np.zeros(0, dtype=np.int32),
+                           np.concatenate(all_weights) if all_weights else np.zeros(0, dtype=np.float32))
+        logging.info(f"Built BM25 index over {self.size} documents ({len(self._terms)} terms).")
+
+    @classmethod
+    def from_postings(cls, size: int, terms: List[str], offsets: np.ndarray, docs: np.ndarray,
+                      weights: np.ndarray) -> "BM25Index":
+        """Wraps precomputed postings (see `postings`), e.g. memory-mapped from a serving bundle, without copying them."""
+        index = cls.__new__(cls)
+        index._set_postings(size, terms, offsets, docs, weights)
+        return index
+
+    def _set_postings(self, size: int, terms: List[str], offsets: np.ndarray, docs: np.ndarray,
+                      weights: np.ndarray) -> None:
+        self.size = size
+        self._terms = {term: i for i, term in enumerate(terms)}
+        self._offsets = offsets
+        self._docs = docs
+        self._weights = weights
+
+    def postings(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """The index as (terms, offsets, docs, weights) arrays, for persisting it."""
+        return list(self._terms), self._offsets, self._docs, self._weights
+
+    def scores(self, query: str) -> np.ndarray:
+        """Returns the BM25 score of every document for a query."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self._terms.get(term)
+            if i is not None:
+                start, end = self._offsets[i], self._offsets[i + 1]
+                scores[self._docs[start:end]] += self._weights[start:end]
+        return scores
+
+    def top_k(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[int]:
+        """Returns the indices of the k best-scoring documents that match at least one query term."""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        matching = int(np.count_nonzero(scores))
+        k = min(k, matching)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
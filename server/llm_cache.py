@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict, Tuple, Any
+from config import (LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_PATH,
+                    LLM_CACHE_DISK_MAX_ENTRIES)
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_conversation(conversation_history: List[Dict[str, str]]) -> str:
+    """Returns a canonical form of the conversation so trivially different phrasings share a key."""
+    normalized = [
+        [msg.get('role', ''), _WHITESPACE.sub(' ', msg.get('content', '')).strip().lower().rstrip('.!?')]
+        for msg in conversation_history
+    ]
+    return json.dumps(normalized, separators=(',', ':'), ensure_ascii=False)
+
+def make_cache_key(conversation_history: List[Dict[str, str]], model: str, prompt_version: str) -> str:
+    """Hashes the normalized conversation together with the model name and prompt version."""
+    payload = f"{model}\n{prompt_version}\n{normalize_conversation(conversation_history)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """
+    Two-tier cache for LLM completions.
+
+    An in-memory LRU tier answers hot keys; an optional SQLite tier survives restarts.
+    Both tiers expire entries after `ttl_seconds` and evict the oldest entries once
+    they exceed their size limit. Async callers use `aget`/`aset`, which keep SQLite
+    I/O off the event loop.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, db_path: Optional[str] = None,
+                 disk_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_created_at ON llm_cache (created_at)")
+                self._db.commit()
+                logging.info(f"Opened on-disk LLM cache at {db_path}")
+            except sqlite3.Error as e:
+                logging.error(f"Error opening on-disk LLM cache at {db_path}: {e}")
+                self._db = None
+
+    def _is_expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for a key, or None on a miss."""
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like get, for async callers: a lookup that reaches the SQLite tier runs on a worker thread."""
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self._db is None:
+            return self._get_disk(key)  # only counts the miss
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if not self._is_expired(created_at):
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return value
+            del self._memory[key]
+            self.counters['expirations'] += 1
+            return None
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        """Looks a key up in the SQLite tier, counting a miss if it is not there either."""
+        with self._lock:
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        value, created_at = row
+                        if not self._is_expired(created_at):
+                            self._put_memory(key, value, created_at)
+                            self.counters['disk_hits'] += 1
+                            return value
+                        self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._db.commit()
+                        self.counters['expirations'] += 1
+                except sqlite3.Error as e:
+                    logging.error(f"Error reading on-disk LLM cache: {e}")
+
+            self.counters['misses'] += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a value in both tiers."""
+        created_at = time.time()
+        with self._lock:
+            self._put_memory(key, value, created_at)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                                     (key, value, created_at))
+                    self._disk_writes += 1
+                    # Prune the disk tier periodically rather than on every write
+                    if self._disk_writes % 100 == 0:
+                        self._prune_disk()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.error(f"Error writing on-disk LLM cache: {e}")
+
+    async def aset(self, key: str, value: str) -> None:
+        """Like set, for async callers: the SQLite write runs on a worker thread."""
+        if self._db is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def _put_memory(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _prune_disk(self) -> None:
+        self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key NOT IN (SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT ?)",
+            (self.disk_max_entries,)
+        )
+
+    def clear(self) -> None:
+        """Drops every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and current tier sizes."""
+        with self._lock:
+            lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            stats: Dict[str, Any] = dict(self.counters)
+            stats['hit_rate'] = (lookups - self.counters['misses']) / lookups if lookups else 0.0
+            stats['memory_entries'] = len(self._memory)
+            if self._db is not None:
+                try:
+                    stats['disk_entries'] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                except sqlite3.Error:
+                    stats['disk_entries'] = None
+            return stats
+
+# Create a singleton instance (None when caching is disabled)
+llm_cache = LLMCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_PATH or None,
+                     LLM_CACHE_DISK_MAX_ENTRIES) if LLM_CACHE_ENABLED else None
@@ -0,0 +1,292 @@
+import base64
+import gzip
+import hashlib
+import json
+import mmap
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Union, Sequence
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+LOCATION_FIELDS = ('id', 'title', 'link', 'address', 'images', 'image_variants', 'content', 'content_shorter_version',
+                   'location_area', 'category_type', 'theme_highlights', 'price_range', 'audience_suitability',
+                   'operating_hours', 'additional_attributes')
+
+# Payload bodies are bytes, or memoryviews of a memory-mapped file
+Bytes = Union[bytes, memoryview]
+# Search text is bytes, or a memory-mapped file (both support find)
+SearchText = Union[bytes, mmap.mmap]
+
+# Every page body starts with its location list
+_PAGE_PREFIX = b'{"locations":['
+
+# Separate locations and the fields of a location in the `q` search text
+_ROW_SEPARATOR = '\n'
+_FIELD_SEPARATOR = '\x1f'
+
+def _compact_json(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def _search_key(text: str) -> str:
+    """Lowercases text for `q` search, replacing separators so neither fields nor queries can contain them."""
+    return text.lower().replace(_ROW_SEPARATOR, ' ').replace(_FIELD_SEPARATOR, ' ')
+
+class InvalidQueryError(ValueError):
+    """Raised for malformed or stale query parameters (mapped to HTTP 400)."""
+
+class EncodedPayload:
+    """A response body serialized once, with its compressed variants and ETag."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self.gzip = gzip.compress(body, compresslevel=6)
+        self.br = brotli.compress(body, quality=5) if brotli else None
+
+    @classmethod
+    def precomputed(cls, body: Bytes, etag: str, gzip_body: Bytes, br_body: Optional[Bytes]) -> "EncodedPayload":
+        """Wraps already encoded bodies, e.g. memory-mapped from a serving bundle, without copying them."""
+        payload = cls.__new__(cls)
+        payload.body, payload.etag, payload.gzip, payload.br = body, etag, gzip_body, br_body
+        return payload
+
+    def encoded(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """Returns the smallest representation the client accepts and its Content-Encoding."""
+        accepted = {part.split(';')[0].strip().lower() for part in accept_encoding.split(',')
+                    if not part.strip().endswith(('q=0', 'q=0.0'))}
+        if self.br is not None and 'br' in accepted:
+            return self.br, 'br'
+        if 'gzip' in accepted:
+            return self.gzip, 'gzip'
+        return self.body, None
+
+def location_bounds(locations: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Byte offsets of each location's JSON in the full page body of `locations`.
+
+    Location i spans bounds[i]:bounds[i + 1] - 1 (the -1 drops the separating
+    comma or the closing bracket), as laid out by LocationCatalog's page encoding.
+    """
+    bounds = np.zeros(len(locations) + 1, dtype=np.int64)
+    bounds[0] = len(_PAGE_PREFIX)
+    for i, location in enumerate(locations):
+        bounds[i + 1] = bounds[i] + len(_compact_json(location)) + 1
+    return bounds
+
+class MappedLocations(Sequence):
+    """
+    Read-only location list over a serialized full page, e.g. memory-mapped from a serving bundle.
+
+    Rows are parsed on access, so a process holding the catalog never parses the
+    whole list; `raw` returns a row's JSON for splicing into page bodies as is.
+    """
+
+    def __init__(self, body: Bytes, bounds: np.ndarray):
+        self.body = body
+        self.bounds = bounds
+
+    def __len__(self) -> int:
+        return len(self.bounds) - 1
+
+    def raw(self, row: int) -> bytes:
+        return bytes(self.body[int(self.bounds[row]):int(self.bounds[row + 1]) - 1])
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return json.loads(self.raw(row))
+
+class CatalogIndexes:
+    """
+    The filter indexes of a LocationCatalog.
+
+    `groups` maps 'id', 'category', 'theme' and 'area' to the rows carrying each
+    distinct lowercase value. `search_text` holds the lowercase UTF-8 search fields of
+    every location for `q` substring search, newline-separated per location and split by
+    a unit separator within one, so a match never spans two fields. `search_offsets` is
+    the byte offset of each location's text. Built once per catalog, or mapped from a
+    serving bundle.
+    """
+
+    GROUPS = ('id', 'category', 'theme', 'area')
+
+    def __init__(self, groups: Dict[str, Dict[str, np.ndarray]], search_text: SearchText, search_offsets: np.ndarray):
+        self.groups = groups
+        self.search_text = search_text
+        self.search_offsets = search_offsets
+
+    @classmethod
+    def build(cls, locations: Sequence[Dict[str, Any]]) -> "CatalogIndexes":
+        """Derives the indexes from formatted locations."""
+        values_of = {
+            'id': lambda loc: [loc['id']],
+            'category': lambda loc: [loc['category_type']],
+            'theme': lambda loc: loc['theme_highlights'],
+            'area': lambda loc: [loc['location_area']],
+        }
+        groups = {name: cls._group_rows(locations, values_of[name]) for name in cls.GROUPS}
+        search_fields = lambda loc: [loc['title'], loc['content_shorter_version'], loc['location_area']] + \
+            loc['theme_highlights']
+        blobs = [_FIELD_SEPARATOR.join(_search_key(field) for field in search_fields(loc)).encode('utf-8')
+                 for loc in locations]
+        offsets = np.cumsum([0] + [len(blob) + 1 for blob in blobs[:-1]]).astype(np.int64)
+        return cls(groups, _ROW_SEPARATOR.encode('utf-8').join(blobs), offsets)
+
+    @staticmethod
+    def _group_rows(locations: Sequence[Dict[str, Any]], values_of) -> Dict[str, np.ndarray]:
+        groups: Dict[str, List[int]] = {}
+        for row, loc in enumerate(locations):
+            for value in values_of(loc):
+                key = value.strip().lower()
+                if key:
+                    groups.setdefault(key, []).append(row)
+        return {key: np.array(rows, dtype=np.int64) for key, rows in groups.items()}
+
+class LocationCatalog:
+    """
+    Precomputed filter indexes and serialized pages over the formatted locations.
+
+    Filters follow the client's semantics: `category` is a case-insensitive substring
+    of the category or any theme, `theme` and `area` match exactly (case-insensitive)
+    and `q` is a substring of the title, summary, area or one of the themes.
+    `location_id` selects a single location. Results keep catalog order and are paged
+    with an opaque cursor. Each distinct page is serialized and compressed once, then
+    served from an LRU cache.
+    """
+
+    def __init__(self, locations: Sequence[Dict[str, Any]], page_cache_size: int = 256, version: Optional[str] = None,
+                 full_payload: Optional[EncodedPayload] = None, indexes: Optional[CatalogIndexes] = None):
+        self.locations = locations
+        self.size = len(locations)
+        self.version = version or hashlib.sha1(json.dumps(locations, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        self._page_cache_size = page_cache_size
+        self._pages: "OrderedDict[Tuple, EncodedPayload]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Distinct ids/categories/themes/areas mapped to the rows that carry them, and the `q` search text
+        self.indexes = indexes or CatalogIndexes.build(locations)
+        self._id_rows = self.indexes.groups['id']
+        self._category_rows = self.indexes.groups['category']
+        self._theme_rows = self.indexes.groups['theme']
+        self._area_rows = self.indexes.groups['area']
+        self._search_text = self.indexes.search_text
+        self._search_offsets = self.indexes.search_offsets
+
+        self._full = full_payload or self._encode_page(list(range(self.size)), None, None)
+
+    @property
+    def full_payload(self) -> EncodedPayload:
+        """The serialized page of every location, served when no filters or paging are given."""
+        return self._full
+
+    def _rows_mask(self, groups: Dict[str, np.ndarray], keys) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        for key in keys:
+            mask[groups[key]] = True
+        return mask
+
+    def _search_mask(self, query: str) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        needle = query.encode('utf-8')
+        position = self._search_text.find(needle)
+        while position != -1:
+            row = int(np.searchsorted(self._search_offsets, position, side='right')) - 1
+            mask[row] = True
+            # Skip to the next location; one hit per row is enough
+            next_start = int(self._search_offsets[row + 1]) if row + 1 < self.size else len(self._search_text)
+            position = self._search_text.find(needle, next_start)
+        return mask
+
+    def filter_rows(self, category: Optional[str] = None, theme: Optional[str] = None, area: Optional[str] = None,
+                    q: Optional[str] = None, location_id: Optional[str] = None) -> np.ndarray:
+        """Returns the catalog rows matching every given filter, in catalog order."""
+        mask = np.ones(self.size, dtype=bool)
+        if location_id:
+            mask &= self._rows_mask(self._id_rows, [k for k in [location_id.strip().lower()] if k in self._id_rows])
+        if category:
+            category = category.strip().lower()
+            mask &= (self._rows_mask(self._category_rows, [k for k in self._category_rows if category in k]) |
+                     self._rows_mask(self._theme_rows, [k for k in self._theme_rows if category in k]))
+        if theme:
+            mask &= self._rows_mask(self._theme_rows, [k for k in [theme.strip().lower()] if k in self._theme_rows])
+        if area:
+            mask &= self._rows_mask(self._area_rows, [k for k in [area.strip().lower()] if k in self._area_rows])
+        if q and q.strip():
+            mask &= self._search_mask(_search_key(q.strip()))
+        return np.flatnonzero(mask)
+
+    def _encode_cursor(self, row: int) -> str:
+        return base64.urlsafe_b64encode(f"{self.version}:{row}".encode('utf-8')).decode('ascii').rstrip('=')
+
+    def _decode_cursor(self, cursor: str) -> int:
+        try:
+            version, row = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8').split(':')
+            row = int(row)
+        except Exception:
+            raise InvalidQueryError("Invalid cursor")
+        if version != self.version:
+            raise InvalidQueryError("Cursor is from an older version of the catalog; restart pagination")
+        return row
+
+    def _encode_page(self, rows: List[int], next_row: Optional[int], fields: Optional[Tuple[str, ...]],
+                     total: Optional[int] = None) -> EncodedPayload:
+        page = {
+            'next_cursor': self._encode_cursor(next_row) if next_row is not None else None,
+            'total': len(rows) if total is None else total,
+        }
+        if not fields and isinstance(self.locations, MappedLocations):
+            # Splice the rows' JSON out of the mapped full page instead of parsing and re-serializing them
+            items = b','.join(self.locations.raw(row) for row in rows)
+            return EncodedPayload(_PAGE_PREFIX + items + b'],' + _compact_json(page)[1:])
+        items = [self.locations[row] for row in rows]
+        if fields:
+            items = [{field: location[field] for field in fields} for location in items]
+        return EncodedPayload(_compact_json({'locations': items, **page}))
+
+    def page(self, category: Optional[str] = None, theme: Optional[str] = None, area: Optional[str] = None,
+             q: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None,
+             fields: Optional[str] = None, location_id: Optional[str] = None) -> EncodedPayload:
+        """Returns the serialized page for a query, building and caching it on first request."""
+        field_list = None
+        if fields:
+            requested = [f.strip() for f in fields.split(',') if f.strip()]
+            unknown = [f for f in requested if f not in LOCATION_FIELDS]
+            if unknown:
+                raise InvalidQueryError(f"Unknown fields: {', '.join(unknown)}")
+            field_list = tuple(['id'] + [f for f in requested if f != 'id'])
+
+        if not any((category, theme, area, q, cursor, limit, field_list, location_id)):
+            return self._full
+
+        key = (category, theme, area, q, cursor, limit, field_list, location_id)
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached is not None:
+                self._pages.move_to_end(key)
+                return cached
+
+        rows = self.filter_rows(category, theme, area, q, location_id)
+        total = len(rows)
+        if cursor:
+            after = self._decode_cursor(cursor)
+            rows = rows[np.searchsorted(rows, after, side='right'):]
+        next_row = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_row = int(rows[-1])
+        payload = self._encode_page(rows.tolist(), next_row, field_list, total)
+
+        with self._lock:
+            self._pages[key] = payload
+            while len(self._pages) > self._page_cache_size:
+                self._pages.popitem(last=False)
+        return payload
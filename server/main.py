@@ -1,24 +1,72 @@
-import pandas as pd
-import chromadb
-from sentence_transformers import SentenceTransformer
-import os
-from dotenv import load_dotenv
 import json
 import time
 import logging
-from chromadb.utils import embedding_functions
-from typing import List
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import re
+import uuid
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from rag import rag_pipeline_clarify
-from data_loader import data_loader
-from embedding import build_or_load_index
+from rag import rag_pipeline_clarify, rag_pipeline_clarify_stream, rag_pipeline_clarify_batch
+from resources import resources
+from llm_cache import llm_cache
+from location_catalog import InvalidQueryError
+from sessions import session_store
+from metrics import metrics, start_request, request_id_var, install_request_id_logging
+from config import (CSV_PATH, LOCATIONS_MAX_PAGE_SIZE, IMAGE_SOURCE_DIR, IMAGE_VARIANTS_DIR,
+                    BATCH_MAX_CONVERSATIONS, SLOW_REQUEST_SECONDS, CSV_RELOAD_INTERVAL, ADMIN_TOKEN,
+                    SESSION_TTL_SECONDS)
+
+# Every log line carries the ID of the request that produced it
+install_request_id_logging()
+if llm_cache is not None:
+    metrics.add_gauge_source("genieverse_llm_cache", llm_cache.stats,
+                             counters=('memory_hits', 'disk_hits', 'misses', 'evictions', 'expirations'))
+metrics.add_gauge_source("genieverse_embedding",
+                         lambda: resources.embedding_service.stats() if resources.embedding_service else None,
+                         counters=('batches', 'items', 'errors', 'timeouts'))
+metrics.add_gauge_source("genieverse_sessions", session_store.stats, counters=('evictions', 'expirations'))
+metrics.add_gauge_source("genieverse_index_client",
+                         lambda: resources.remote_embedder.stats() if resources.remote_embedder else None,
+                         counters=('requests', 'texts', 'errors', 'reconnects'))
 
 # --- FastAPI Setup ---
 
-app = FastAPI()
+async def watch_csv(interval: float) -> None:
+    """Reloads the catalog in the background whenever the CSV (in shared mode, the bundle) changes."""
+    while True:
+        await asyncio.sleep(interval)
+        if resources.csv_changed():
+            logging.info("Location CSV changed on disk; reloading catalog.")
+            await asyncio.to_thread(resources.reload)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load data on startup and warm up the model and index in the background."""
+    if not resources.shared:
+        try:
+            resources.load_catalog(CSV_PATH)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load location data during startup: {e}")
+        logging.info("Successfully loaded location data during startup")
+
+    # Warm-up runs off the event loop so /api/health/ready can report progress; in shared
+    # mode it waits for the index server's bundle instead of loading the model
+    warm_up_task = asyncio.create_task(asyncio.to_thread(resources.warm_up))
+    watcher_task = asyncio.create_task(watch_csv(CSV_RELOAD_INTERVAL)) if CSV_RELOAD_INTERVAL > 0 else None
+    yield
+    if watcher_task is not None:
+        watcher_task.cancel()
+    if not warm_up_task.done():
+        logging.warning("Shutting down before warm-up finished.")
+    resources.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,8 +77,59 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+def _finish_request(request: Request, status_code: int, start_time: float, timings: dict) -> None:
+    """Records the request metrics and logs the stage breakdown of slow requests."""
+    elapsed = time.perf_counter() - start_time
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.request_duration.observe(elapsed, request.method, route, str(status_code))
+    metrics.requests.inc(request.method, route, str(status_code))
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        metrics.slow_requests.inc(route)
+        breakdown = ', '.join(f"{stage}={seconds * 1000:.0f}ms"
+                              for stage, seconds in sorted(timings.items(), key=lambda item: -item[1]))
+        logging.warning(f"Slow request {request.method} {request.url.path} -> {status_code} took {elapsed:.3f}s "
+                        f"[{breakdown or 'no stages recorded'}]")
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Assigns a request ID (honouring an incoming X-Request-ID) and times the request until its body is sent."""
+    incoming_id = request.headers.get("x-request-id", "")
+    request_id = incoming_id if _REQUEST_ID.match(incoming_id) else uuid.uuid4().hex
+    timings = start_request(request_id)
+    start_time = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        _finish_request(request, 500, start_time, timings)
+        raise
+    response.headers["X-Request-ID"] = request_id
+
+    # Streaming responses keep running pipeline stages after the headers go out
+    body_iterator = response.body_iterator
+    async def traced_body():
+        request_id_var.set(request_id)
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            _finish_request(request, response.status_code, start_time, timings)
+    response.body_iterator = traced_body()
+    return response
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names are content-hashed, so they can be cached forever."""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 # Mount the images directory
-app.mount("/images", StaticFiles(directory="data/images"), name="images")
+app.mount("/images", StaticFiles(directory=IMAGE_SOURCE_DIR), name="images")
+# Resized variants built by image_derivatives.py
+app.mount("/image-variants", ImmutableStaticFiles(directory=IMAGE_VARIANTS_DIR, check_dir=False), name="image-variants")
 
 class ConversationMessage(BaseModel):
     role: str
@@ -38,14 +137,74 @@ class ConversationMessage(BaseModel):
 
 class ConversationRequest(BaseModel):
     conversation: List[ConversationMessage]
+    # With a session, `conversation` holds only the messages that are new since the last turn
+    session_id: Optional[str] = None
+
+class BatchConversationRequest(BaseModel):
+    conversations: List[List[ConversationMessage]]
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize data on startup."""
-    df = data_loader.load_data('data/genieverse-locations.csv')
-    if df is None:
-        raise RuntimeError("Failed to load location data during startup")
-    logging.info("Successfully loaded location data during startup")
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving HTTP."""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """
+    Readiness probe for the load balancer.
+
+    Returns 200 once the embedding model and search index are loaded, 503 while
+    warm-up is still running or if it failed.
+    """
+    status = resources.status()
+    return JSONResponse(status_code=200 if resources.ready else 503, content=status)
+
+def _session_turn(session_id: Optional[str], conversation: List[dict], facets) -> Tuple[List[dict], Optional[dict]]:
+    """
+    Folds a turn's new messages into its session.
+
+    Returns the messages and criteria summary to prompt with: the session's recent
+    messages and summary, or the request's conversation and None without a session.
+    """
+    if session_id is None:
+        return conversation, None
+    try:
+        session = session_store.append(session_id, conversation, facets)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session.recent_messages, session.summary
+
+@app.post("/api/sessions", status_code=201)
+async def create_session():
+    """
+    Start a conversation session.
+
+    Send the returned session_id with each /api/conversation request, together with
+    only the messages that are new since the previous turn. The server keeps a summary
+    of the user's criteria and the latest messages, so requests stay small however
+    long the conversation gets.
+    """
+    session = session_store.create()
+    return {"session_id": session.session_id, "ttl_seconds": SESSION_TTL_SECONDS}
+
+@app.get("/api/sessions/{session_id}")
+async def get_session(session_id: str):
+    """The criteria summary and recent messages of a session."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session.to_dict()
+
+@app.delete("/api/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    """End a session."""
+    session_store.delete(session_id)
+    return Response(status_code=204)
+
+@app.get("/api/stats/sessions")
+async def session_stats():
+    """Active session count and eviction/expiry counters."""
+    return session_store.stats()
 
 @app.post("/api/conversation")
 async def process_conversation(request: ConversationRequest):
@@ -55,7 +214,8 @@ async def process_conversation(request: ConversationRequest):
     Returns:
     {
         "locations": [{"id": str, "score": float, "title": str, ...}],
-        "clarifying_question": str
+        "clarifying_question": str,
+        "session_id": str  // only when the request used a session
     }
     """
     try:
@@ -68,23 +228,28 @@ async def process_conversation(request: ConversationRequest):
                 "clarifying_question": "Could you tell me what kind of place you're looking for in Singapore?"
             }
             
-        # Use the already loaded data
-        df = data_loader.df
-        if df is None:
+        # Use one snapshot for the whole request, even if a reload swaps in a new one meanwhile
+        snapshot = resources.snapshot
+        if snapshot is None:
             raise HTTPException(status_code=500, detail="Location data not available")
-            
-        ef = get_embedding_function()
-        documents, metadatas, ids = data_loader.prepare_documents()
-        collection = build_or_load_index(documents, metadatas, ids, ef)
-        
-        if collection is None:
-            raise HTTPException(status_code=500, detail="Failed to initialize search index")
-            
+
+        # Reuse the model and collection loaded once at startup
+        if snapshot.retriever is None:
+            raise HTTPException(status_code=503, detail="Search index is warming up")
+
+        conversation, summary = _session_turn(request.session_id, conversation, snapshot.facets)
+
         # Process conversation through RAG pipeline
-        result = rag_pipeline_clarify(conversation, collection)
+        result = await rag_pipeline_clarify(conversation, snapshot.retriever, snapshot.facets,
+                                            resources.query_embedder, summary)
+        if request.session_id is not None:
+            session_store.record_reply(request.session_id, result['clarifying_question'])
+            result['session_id'] = request.session_id
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error processing conversation: {e}")
         raise HTTPException(
@@ -92,11 +257,171 @@ async def process_conversation(request: ConversationRequest):
             detail="Internal server error"
         )
 
+@app.post("/api/conversation/batch")
+async def process_conversation_batch(request: BatchConversationRequest):
+    """
+    Process many conversations in one call (for offline re-scoring and evaluation jobs).
+
+    Returns:
+    {
+        "results": [
+            {"retrieved_locations": [...], "clarifying_question": str}  // or {"error": str}
+        ]
+    }
+    Results are in request order; a failure in one conversation does not fail the others.
+    """
+    if len(request.conversations) > BATCH_MAX_CONVERSATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_CONVERSATIONS} conversations per batch")
+    snapshot = resources.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=500, detail="Location data not available")
+    if snapshot.retriever is None:
+        raise HTTPException(status_code=503, detail="Search index is warming up")
+
+    conversations = [[{"role": msg.role, "content": msg.content} for msg in conversation]
+                     for conversation in request.conversations]
+    try:
+        results = await rag_pipeline_clarify_batch(conversations, snapshot.retriever,
+                                                   resources.embedding_function, snapshot.facets)
+        return {"results": results}
+    except Exception as e:
+        logging.error(f"Error processing conversation batch: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.get("/api/stats/llm-cache")
+async def llm_cache_stats():
+    """Hit/miss counters and sizes of the LLM response cache."""
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_cache.stats()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms, token usage, error counters and cache/queue stats in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/stats/embedding")
+async def embedding_stats():
+    """Queue depth and batch-size counters of the query embedding service."""
+    if resources.embedding_service is None:
+        return {"enabled": False}
+    return {"enabled": True, **resources.embedding_service.stats()}
+
+def _require_admin(authorization: Optional[str]) -> None:
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, and then require it as a bearer token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(authorization or "", f"Bearer {ADMIN_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+_reload_task: Optional[asyncio.Task] = None
+
+@app.post("/api/admin/reload", status_code=202)
+async def reload_catalog(force: bool = False, authorization: Optional[str] = Header(None)):
+    """
+    Reload the location CSV in the background.
+
+    The new catalog and index are built off the event loop (only new or changed
+    rows are re-embedded) and swapped in atomically once complete; requests keep
+    using the current catalog until then. Poll GET /api/admin/reload for the outcome.
+    `force` reloads even if the CSV's mtime and size are unchanged.
+    """
+    global _reload_task
+    _require_admin(authorization)
+    if _reload_task is not None and not _reload_task.done():
+        return {"status": "reloading"}
+    _reload_task = asyncio.create_task(asyncio.to_thread(resources.reload, None, force))
+    return {"status": "reloading"}
+
+@app.get("/api/admin/reload")
+async def reload_status(authorization: Optional[str] = Header(None)):
+    """Current catalog version and the outcome of the last reload."""
+    _require_admin(authorization)
+    snapshot = resources.snapshot
+    return {
+        "reloading": _reload_task is not None and not _reload_task.done(),
+        "catalog_version": snapshot.version if snapshot else None,
+        "csv_path": snapshot.csv_path if snapshot else None,
+        "last_reload": resources.last_reload,
+    }
+
+def _sse_event(event: str, data) -> str:
+    """Formats a single server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/conversation/stream")
+async def stream_conversation(request: ConversationRequest):
+    """
+    Streaming variant of /api/conversation using server-sent events.
+
+    Events, in order:
+        retrieved_locations: [{"id": str, "score": float, "title": str}]  (as soon as retrieval finishes)
+        token: str                                                         (one per clarifying-question token)
+        clarifying_question: str                                           (the full question)
+        done: {} or {"session_id": str}
+    An `error` event is sent instead if the pipeline fails part-way.
+    """
+    conversation = [{"role": msg.role, "content": msg.content} for msg in request.conversation]
+
+    snapshot = resources.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=500, detail="Location data not available")
+    if conversation and snapshot.retriever is None:
+        raise HTTPException(status_code=503, detail="Search index is warming up")
+    summary = None
+    if conversation:
+        conversation, summary = _session_turn(request.session_id, conversation, snapshot.facets)
+    done = {"session_id": request.session_id} if request.session_id is not None else {}
+
+    async def event_stream():
+        if not conversation:
+            yield _sse_event("retrieved_locations", [])
+            yield _sse_event("clarifying_question", "Could you tell me what kind of place you're looking for in Singapore?")
+            yield _sse_event("done", done)
+            return
+        try:
+            async for event, data in rag_pipeline_clarify_stream(conversation, snapshot.retriever, snapshot.facets,
+                                                                  resources.query_embedder, summary):
+                if event == "clarifying_question" and request.session_id is not None:
+                    session_store.record_reply(request.session_id, data)
+                yield _sse_event(event, data)
+            yield _sse_event("done", done)
+        except Exception as e:
+            logging.error(f"Error streaming conversation: {e}")
+            yield _sse_event("error", {"detail": "Internal server error"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/locations")
-async def get_locations():
+async def get_locations(
+    request: Request,
+    category: Optional[str] = None,
+    theme: Optional[str] = None,
+    area: Optional[str] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LOCATIONS_MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    id: Optional[str] = None
+):
     """
-    Get all locations from the dataset.
-    
+    Get locations from the dataset, optionally filtered and paginated.
+
+    Query parameters:
+        category: substring of the category or any theme (case-insensitive)
+        theme: exact theme; area: exact location area (case-insensitive)
+        q: free-text substring of title, summary, area or themes
+        cursor, limit: pagination; pass the previous page's next_cursor to continue
+        fields: comma-separated subset of location fields ("id" is always included)
+        id: a single location, e.g. to load the fields a list page left out
+
+    Pages are served precompressed (br/gzip) with an ETag; a matching
+    If-None-Match returns 304.
+
     Returns:
     {
         "locations": [{
@@ -105,6 +430,7 @@ async def get_locations():
             link: string;
             address: string;
             images: string[];
+            image_variants: ({src: string; webp_srcset: string; jpeg_srcset: string} | null)[];
             content: string;
             content_shorter_version: string;
             location_area: string;
@@ -114,21 +440,34 @@ async def get_locations():
             audience_suitability: string[];
             operating_hours: string;
             additional_attributes: string[];
-        }]
+        }],
+        "next_cursor": string | null,
+        "total": number
     }
     """
+    snapshot = resources.snapshot
+    catalog = snapshot.catalog if snapshot else None
+    if catalog is None or catalog.size == 0:
+        raise HTTPException(status_code=500, detail="Location data not available")
+
     try:
-        # Use the cached formatted locations
-        locations = data_loader.get_formatted_locations()
-        if not locations:
-            raise HTTPException(status_code=500, detail="Location data not available")
-            
-        return {"locations": locations}
-        
+        payload = catalog.page(category, theme, area, q, cursor, limit, fields, id)
+    except InvalidQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Error getting locations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    headers = {"ETag": payload.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or payload.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = payload.encoded(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
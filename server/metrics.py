@@ -0,0 +1,234 @@
+"""
+In-process tracing and Prometheus-style metrics.
+
+Pipeline stages are timed with the `traced` decorator (or the `span` context
+manager). Every span feeds a latency histogram and, when it runs inside an HTTP
+request, that request's stage breakdown, which the slow-request log reports.
+The request ID lives in a context variable, so it follows the request into
+`asyncio.to_thread` workers and is stamped on every log line by RequestIdFilter.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple, Iterator, List, Callable
+
+# Seconds; spans range from sub-millisecond formatting to multi-second LLM calls and startup loads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+request_id_var: "contextvars.ContextVar[str]" = contextvars.ContextVar('request_id', default='-')
+_stage_timings: "contextvars.ContextVar[Optional[Dict[str, float]]]" = contextvars.ContextVar('stage_timings',
+                                                                                                default=None)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} "
+                                 f"{_format_value(cumulative)}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {_format_value(series[-1])}")
+        return lines
+
+class MetricsRegistry:
+    """The process-wide set of metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.stage_duration = Histogram('genieverse_stage_duration_seconds',
+                                        'Duration of pipeline and loading stages.', ('stage',))
+        self.stage_errors = Counter('genieverse_stage_errors_total',
+                                    'Stage failures and timeouts, including ones recovered by a fallback.',
+                                    ('stage', 'reason'))
+        self.llm_tokens = Counter('genieverse_llm_tokens_total', 'Tokens reported by the LLM API.',
+                                  ('stage', 'type'))
+        self.request_duration = Histogram('genieverse_http_request_duration_seconds',
+                                          'HTTP request latency until the response body is fully sent.',
+                                          ('method', 'route', 'status'))
+        self.requests = Counter('genieverse_http_requests_total', 'HTTP requests served.',
+                                ('method', 'route', 'status'))
+        self.slow_requests = Counter('genieverse_http_slow_requests_total',
+                                     'HTTP requests slower than SLOW_REQUEST_SECONDS.', ('route',))
+        self.search_query_source = Counter('genieverse_search_query_source_total',
+                                           'Search queries built locally vs. by the LLM, with the reason for escalating.',
+                                           ('source', 'reason'))
+        self._metrics = [self.request_duration, self.requests, self.slow_requests, self.stage_duration,
+                         self.stage_errors, self.llm_tokens, self.search_query_source]
+        self._gauge_sources: List[Tuple[str, Callable[[], Optional[Dict[str, Any]]], Tuple[str, ...]]] = []
+
+    def add_gauge_source(self, prefix: str, source: Callable[[], Optional[Dict[str, Any]]],
+                         counters: Tuple[str, ...] = ()) -> None:
+        """
+        Exposes the numeric fields of a stats dictionary (e.g. LLMCache.stats) as gauges named `prefix_field`.
+
+        Fields listed in `counters` only ever grow, so they are exposed as counters
+        named `prefix_field_total` instead, which rate() and increase() expect.
+        """
+        self._gauge_sources.append((prefix, source, counters))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, source, counters in self._gauge_sources:
+            try:
+                stats = source() or {}
+            except Exception as e:
+                logging.error(f"Error collecting {prefix} stats: {e}")
+                continue
+            for field, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if field in counters:
+                    lines.append(f"# TYPE {prefix}_{field}_total counter")
+                    lines.append(f"{prefix}_{field}_total {_format_value(value)}")
+                else:
+                    lines.append(f"# TYPE {prefix}_{field} gauge")
+                    lines.append(f"{prefix}_{field} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+def record_error(stage: str, reason: str) -> None:
+    """Counts a stage failure ('timeout' or 'exception'), whether or not a fallback covered it."""
+    metrics.stage_errors.inc(stage, reason)
+
+def record_token_usage(stage: str, usage: Any) -> None:
+    """Counts prompt and completion tokens from an OpenAI `usage` object, if the response has one."""
+    if usage is None:
+        return
+    for token_type in ('prompt', 'completion'):
+        tokens = getattr(usage, f'{token_type}_tokens', None)
+        if tokens:
+            metrics.llm_tokens.inc(stage, token_type, amount=tokens)
+
+def record_search_query_source(source: str, reason: str) -> None:
+    """Counts whether a search query was built 'local'ly or by the 'llm', and why ('confident', 'multi_turn', ...)."""
+    metrics.search_query_source.inc(source, reason)
+
+def _record_span(stage: str, elapsed: float) -> None:
+    metrics.stage_duration.observe(elapsed, stage)
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Times a block as one stage; an exception escaping the block is counted as a stage error."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_error(stage, 'exception')
+        raise
+    finally:
+        _record_span(stage, time.perf_counter() - start_time)
+
+def traced(stage: str):
+    """Decorator timing every call of a function, coroutine function or async generator as a stage."""
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                with span(stage):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return async_gen_wrapper
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_request(request_id: str) -> Dict[str, float]:
+    """Binds a request ID and an empty stage breakdown to the current context. Returns the breakdown."""
+    timings: Dict[str, float] = {}
+    request_id_var.set(request_id)
+    _stage_timings.set(timings)
+    return timings
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request ID (or '-') to every log record as `request_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+def install_request_id_logging(log_format: str = '%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s') -> None:
+    """Attaches RequestIdFilter to the root handlers and adds the request ID to their format."""
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, RequestIdFilter) for f in handler.filters):
+            handler.addFilter(RequestIdFilter())
+        handler.setFormatter(logging.Formatter(log_format))
@@ -0,0 +1,95 @@
+import re
+from typing import List, Dict
+from facets import FacetIndex, PRICE_SYNONYMS
+from metrics import traced
+from config import LOCAL_QUERY_MIN_CONFIDENCE, LOCAL_QUERY_MAX_WORDS
+
+# Words that carry no search intent of their own ("I'm looking for a ... please")
+FILLER_WORDS = {
+    'a', 'an', 'the', 'i', "i'm", 'im', 'me', 'my', 'we', "we're", 'us', 'our', 'you', 'can', 'could', 'would',
+    'please', 'pls', 'want', 'wanna', 'like', "i'd", 'need', 'looking', 'look', 'search', 'searching', 'find',
+    'show', 'recommend', 'suggest', 'some', 'any', 'good', 'nice', 'great', 'best', 'place', 'places', 'spot',
+    'spots', 'somewhere', 'something', 'to', 'go', 'visit', 'in', 'at', 'near', 'around', 'for', 'with', 'and',
+    'or', 'of', 'on', 'that', 'is', 'are', 'be', 'there', 'here', 'singapore', 'sg', 'hi', 'hello', 'hey',
+    'thanks', 'thank', 'bit', 'also', 'maybe', 'where', 'what', 'which', 'area', 'get', 'have', 'take',
+}
+
+# Words that change the meaning of the phrases around them; these need the LLM
+AMBIGUOUS_WORDS = {
+    'not', 'no', 'never', "don't", 'dont', "doesn't", "isn't", 'without', 'except', 'avoid', 'instead',
+    'but', 'unless', 'other', 'than', 'besides', 'either', 'neither', 'nor', 'rather',
+}
+
+PRICE_WORDS = {word for phrase in PRICE_SYNONYMS for word in phrase.split()}
+
+_WORD = re.compile(r"[a-z0-9$][a-z0-9'$-]*")
+
+class LocalQuery:
+    """A search query built from one user message without calling the LLM."""
+
+    def __init__(self, query: str, filters: Dict[str, List[str]], themes: List[str], audience: List[str],
+                 confidence: float, reason: str):
+        self.query = query
+        self.filters = filters
+        self.themes = themes
+        self.audience = audience
+        self.confidence = confidence
+        # 'confident', or why the LLM is needed: 'multi_turn', 'too_long', 'ambiguous', 'no_facets', 'low_confidence'
+        self.reason = reason
+
+    @property
+    def confident(self) -> bool:
+        return self.reason == 'confident'
+
+def _user_messages(conversation_history: List[Dict[str, str]]) -> List[str]:
+    return [m.get('content', '') for m in conversation_history if m.get('role') == 'user']
+
+@traced('build_local_query')
+def build_local_query(conversation_history: List[Dict[str, str]], facets: FacetIndex,
+                      min_confidence: float = LOCAL_QUERY_MIN_CONFIDENCE,
+                      max_words: int = LOCAL_QUERY_MAX_WORDS) -> LocalQuery:
+    """
+    Tries to build the search query for a conversation from the facet gazetteers alone.
+
+    Only a conversation with a single user message is eligible; later turns need
+    the LLM to resolve references to earlier ones. Confidence is the share of the
+    message's meaningful words covered by a known area, category, theme, price or
+    audience term. Messages with negations or contrasts ("not too pricey", "anything
+    but a mall") or more than `max_words` words are always escalated.
+    """
+    user_messages = _user_messages(conversation_history)
+    if len(user_messages) != 1:
+        return LocalQuery('', {}, [], [], 0.0, 'multi_turn')
+    message = user_messages[0]
+    lowered = message.lower()
+    words = [(m.group(), m.span()) for m in _WORD.finditer(lowered)]
+    if len(words) > max_words:
+        return LocalQuery('', {}, [], [], 0.0, 'too_long')
+    if any(word in AMBIGUOUS_WORDS for word, _ in words):
+        return LocalQuery('', {}, [], [], 0.0, 'ambiguous')
+
+    filters = facets.extract_filters(message)
+    themes = facets.extract_themes(message)
+    audience = facets.extract_audience(message)
+    spans = facets.matched_spans(message)
+    # A word counts as understood if any gazetteer match overlaps it
+    covered = [any(start < end_ and start_ < end for start_, end_ in spans) for _, (start, end) in words]
+    meaningful = [(word, hit) for (word, _), hit in zip(words, covered) if hit or word not in FILLER_WORDS]
+    if not filters.get('location_area') and not filters.get('category_type') and not themes:
+        return LocalQuery('', filters, themes, audience, 0.0, 'no_facets')
+    confidence = sum(hit for _, hit in meaningful) / len(meaningful) if meaningful else 0.0
+
+    parts: List[str] = []
+    price_words = [word for word, hit in meaningful if hit and word in PRICE_WORDS]
+    parts.extend(price_words)
+    parts.append(' or '.join(filters.get('category_type', [])) or 'places')
+    if filters.get('location_area'):
+        parts.append('in ' + ' or '.join(filters['location_area']))
+    if themes:
+        parts.append('with ' + ', '.join(themes))
+    if audience:
+        parts.append('for ' + ', '.join(audience))
+    # Unrecognized words are kept verbatim so the embedding still sees them
+    parts.extend(word for word, hit in meaningful if not hit)
+    reason = 'confident' if confidence >= min_confidence else 'low_confidence'
+    return LocalQuery(' '.join(parts), filters, themes, audience, confidence, reason)
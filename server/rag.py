@@ -1,64 +1,186 @@
 import json
+import asyncio
+import contextvars
+import functools
 import logging
-from typing import List, Dict, Any, Optional
-import chromadb
-from config import openai_client, GENERATION_MODEL_NAME, TOP_K_RETRIEVAL
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Callable
+from config import (async_openai_client, GENERATION_MODEL_NAME, TOP_K_RETRIEVAL, LLM_QUERY_TIMEOUT,
+                    LLM_CLARIFY_TIMEOUT, RETRIEVAL_TIMEOUT, PIPELINE_LATENCY_BUDGET, LLM_CACHE_CLARIFYING_QUESTIONS,
+                    BATCH_LLM_CONCURRENCY, PROMPT_RECENT_MESSAGES, LOCAL_QUERY_ENABLED, RETRIEVAL_WORKERS)
+from llm_cache import llm_cache, make_cache_key
+from retrievers import Retriever
+from facets import FacetIndex
+from query_builder import build_local_query
+from metrics import traced, span, record_error, record_token_usage, record_search_query_source
+from openai import AsyncOpenAI
 
-def generate_search_query(conversation_history: List[Dict[str, str]], llm_client: Optional[OpenAI]) -> str:
-    """Uses LLM to generate a concise search query from conversation history."""
+DEFAULT_CLARIFYING_QUESTION = "Could you please provide more details about what you're looking for?"
+
+# Bump these whenever a prompt changes so stale cached completions are not reused
+SEARCH_QUERY_PROMPT_VERSION = "search-query-v2"
+CLARIFYING_QUESTION_PROMPT_VERSION = "clarifying-question-v2"
+
+Summary = Dict[str, List[str]]
+
+# A retrieval that outlives RETRIEVAL_TIMEOUT cannot be interrupted and keeps its thread until it finishes.
+# Running retrievals on their own bounded pool caps how many such threads can pile up, and keeps them from
+# starving the default executor used for everything else.
+_retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix='retrieval')
+
+def _run_retrieval(func: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+    """Like asyncio.to_thread, but on the bounded retrieval pool. Cancelling it drops the call if not yet started."""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_retrieval_executor, functools.partial(context.run, func, *args))
+
+def _empty_results() -> Dict[str, List[Any]]:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+def _prompt_messages(conversation_history: List[Dict[str, str]], summary: Optional[Summary]) -> List[Dict[str, str]]:
+    """The messages a prompt includes: all of them without a summary, otherwise only the most recent ones."""
+    if summary is None:
+        return conversation_history
+    return conversation_history[-PROMPT_RECENT_MESSAGES:]
+
+def _conversation_context(conversation_history: List[Dict[str, str]], summary: Optional[Summary]) -> str:
+    """
+    Renders the conversation for an LLM prompt as compact JSON.
+
+    With a criteria summary (see sessions.update_summary) only the summary and the
+    last PROMPT_RECENT_MESSAGES messages are included, so prompt size stays flat
+    however long the conversation gets.
+    """
+    messages = [{'role': m.get('role', ''), 'content': m.get('content', '')}
+                for m in _prompt_messages(conversation_history, summary)]
+    if summary is None:
+        return f"Conversation History:\n{_compact_json(messages)}"
+    return (f"Known User Criteria:\n{_compact_json(summary) if summary else 'none yet'}\n\n"
+            f"Most Recent Messages:\n{_compact_json(messages)}")
+
+def _prompt_cache_key(conversation_history: List[Dict[str, str]], summary: Optional[Summary],
+                      prompt_version: str) -> str:
+    """Cache key over exactly what the prompt contains."""
+    messages = _prompt_messages(conversation_history, summary)
+    if summary:
+        messages = [{'role': 'criteria', 'content': json.dumps(summary, sort_keys=True)}] + messages
+    return make_cache_key(messages, GENERATION_MODEL_NAME, prompt_version)
+
+@traced('generate_search_query')
+async def generate_search_query(conversation_history: List[Dict[str, str]], llm_client: Optional[AsyncOpenAI],
+                                summary: Optional[Summary] = None) -> str:
+    """
+    Uses LLM to generate a concise search query from the criteria summary and recent conversation.
+
+    Never raises: if the LLM is unavailable, fails or times out, the last user message is the query.
+    """
     if not llm_client:
         logging.warning("LLM client not available for query generation. Using last user message.")
         return conversation_history[-1]['content'] if conversation_history else ""
 
+    cache_key = _prompt_cache_key(conversation_history, summary, SEARCH_QUERY_PROMPT_VERSION)
+    if llm_cache:
+        cached_query = await llm_cache.aget(cache_key)
+        if cached_query is not None:
+            logging.info(f"Using cached search query: {cached_query}")
+            return cached_query
+
     prompt = f"""
 Analyze the following conversation history between a User and an Assistant about finding locations in Singapore.
 Extract the key criteria mentioned by the user (e.g., location type, area, atmosphere, price, audience, specific interests).
 Generate a concise and focused search query summarizing the user's current request for retrieving relevant locations from a database.
+Criteria from the most recent messages take precedence over the known criteria.
 
-Conversation History:
-{json.dumps(conversation_history, indent=2)}
+{_conversation_context(conversation_history, summary)}
 
 Concise Search Query:
 """
     try:
-        response = llm_client.chat.completions.create(
-            model=GENERATION_MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are an AI assistant analyzing conversations to generate search queries for a location database."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2, max_tokens=100
+        response = await asyncio.wait_for(
+            llm_client.chat.completions.create(
+                model=GENERATION_MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": "You are an AI assistant analyzing conversations to generate search queries for a location database."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2, max_tokens=100
+            ),
+            timeout=LLM_QUERY_TIMEOUT
         )
+        record_token_usage('generate_search_query', getattr(response, 'usage', None))
         search_query = response.choices[0].message.content.strip()
         logging.info(f"Generated search query: {search_query}")
+        if llm_cache:
+            await llm_cache.aset(cache_key, search_query)
         return search_query
+    except asyncio.TimeoutError:
+        record_error('generate_search_query', 'timeout')
+        logging.warning(f"Search query generation timed out after {LLM_QUERY_TIMEOUT}s. Using last user message as query.")
+        return conversation_history[-1]['content'] if conversation_history else ""
     except Exception as e:
+        record_error('generate_search_query', 'exception')
         logging.error(f"Error generating search query with LLM: {e}")
         logging.warning("Falling back to using last user message as query.")
         return conversation_history[-1]['content'] if conversation_history else ""
 
-def retrieve_locations(query: str, collection: chromadb.Collection, n_results: int = 5) -> Dict[str, List[Any]]:
-    """Retrieves relevant documents and their distances from the ChromaDB collection."""
-    if not collection:
-        logging.error("Collection is not available for retrieval.")
-        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+def try_local_search_query(conversation_history: List[Dict[str, str]],
+                           facets: Optional[FacetIndex]) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Returns (search query, where filter) built without the LLM, or None if the LLM is needed.
+
+    Every call is counted by source and reason in the search query source metric.
+    """
+    if not LOCAL_QUERY_ENABLED or facets is None:
+        record_search_query_source('llm', 'disabled')
+        return None
+    local = build_local_query(conversation_history, facets)
+    if not local.confident:
+        record_search_query_source('llm', local.reason)
+        return None
+    record_search_query_source('local', local.reason)
+    logging.info(f"Built search query locally (confidence {local.confidence:.2f}): {local.query}")
+    return local.query, FacetIndex.to_where(local.filters)
+
+@traced('retrieve_locations')
+def retrieve_locations(query: str, retriever: Retriever, n_results: int = 5,
+                       where: Optional[Dict[str, Any]] = None,
+                       query_embedder: Optional[Callable[[List[str]], Any]] = None) -> Dict[str, List[Any]]:
+    """
+    Retrieves relevant documents and their distances through the configured retriever backend.
+
+    With a `query_embedder` (normally the shared EmbeddingService) the query is embedded
+    up front and the retriever searches with the precomputed vector. If a metadata
+    filter leaves no results, retrieval is retried without it.
+    """
+    if not retriever:
+        logging.error("Retriever is not available for retrieval.")
+        return _empty_results()
 
-    logging.info(f"Retrieving top {n_results} locations for query: '{query}'")
+    logging.info(f"Retrieving top {n_results} locations for query: '{query}'" + (f" where {where}" if where else ""))
     try:
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            include=['metadatas', 'distances']
-        )
+        query_embeddings = None
+        if query_embedder:
+            with span('embed_query'):
+                query_embeddings = query_embedder([query])
+        with span('vector_search'):
+            results = retriever.query(query_texts=[query], query_embeddings=query_embeddings, n_results=n_results,
+                                      where=where)
+            if where and not results.get('ids', [[]])[0]:
+                logging.info("No locations matched the extracted filters. Retrying without them.")
+                results = retriever.query(query_texts=[query], query_embeddings=query_embeddings,
+                                          n_results=n_results)
         results.setdefault('ids', [[]])
         results.setdefault('metadatas', [[]])
         results.setdefault('distances', [[]])
         return results
     except Exception as e:
+        record_error('retrieve_locations', 'exception')
         logging.error(f"Error during retrieval: {e}")
-        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        return _empty_results()
 
+@traced('format_retrieved_locations')
 def format_retrieved_locations_for_response(results: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
     """Formats retrieved locations into a list of dicts with id and score."""
     formatted_results = []
@@ -70,58 +192,361 @@ def format_retrieved_locations_for_response(results: Dict[str, List[Any]]) -> Li
         })
     return formatted_results
 
-def generate_clarifying_question(conversation_history: List[Dict[str, str]], llm_client: Optional[OpenAI]) -> str:
-    """Generates a question to clarify user needs based on the conversation."""
-    if not llm_client:
-        return "Could you please provide more details about what you're looking for?"
-
+def _clarifying_question_messages(conversation_history: List[Dict[str, str]],
+                                  summary: Optional[Summary] = None) -> List[Dict[str, str]]:
+    """Builds the chat messages used to ask the LLM for a clarifying question."""
     prompt = f"""
 Based on the following conversation history between a User and an Assistant about finding locations in Singapore,
 generate a single, focused clarifying question that would help better understand the user's preferences or requirements.
 
-Conversation History:
-{json.dumps(conversation_history, indent=2)}
+{_conversation_context(conversation_history, summary)}
 
 Generate a natural-sounding clarifying question that would help narrow down the search or better understand the user's needs.
 The question should be specific and relevant to what has been discussed.
 """
+    return [
+        {"role": "system", "content": "You are an AI assistant helping users find locations in Singapore."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _clarifying_question_cache_key(conversation_history: List[Dict[str, str]],
+                                   summary: Optional[Summary] = None) -> Optional[str]:
+    """Returns the cache key for a clarifying question, or None when the cache is bypassed."""
+    if not llm_cache or not LLM_CACHE_CLARIFYING_QUESTIONS:
+        return None
+    return _prompt_cache_key(conversation_history, summary, CLARIFYING_QUESTION_PROMPT_VERSION)
+
+@traced('generate_clarifying_question')
+async def generate_clarifying_question(conversation_history: List[Dict[str, str]], llm_client: Optional[AsyncOpenAI],
+                                       summary: Optional[Summary] = None) -> str:
+    """Generates a question to clarify user needs based on the conversation."""
+    if not llm_client:
+        return DEFAULT_CLARIFYING_QUESTION
+
+    cache_key = _clarifying_question_cache_key(conversation_history, summary)
+    if cache_key:
+        cached_question = await llm_cache.aget(cache_key)
+        if cached_question is not None:
+            return cached_question
+
     try:
-        response = llm_client.chat.completions.create(
-            model=GENERATION_MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are an AI assistant helping users find locations in Singapore."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=100
+        response = await asyncio.wait_for(
+            llm_client.chat.completions.create(
+                model=GENERATION_MODEL_NAME,
+                messages=_clarifying_question_messages(conversation_history, summary),
+                temperature=0.7,
+                max_tokens=100
+            ),
+            timeout=LLM_CLARIFY_TIMEOUT
         )
-        return response.choices[0].message.content.strip()
+        record_token_usage('generate_clarifying_question', getattr(response, 'usage', None))
+        clarifying_question = response.choices[0].message.content.strip()
+        if cache_key:
+            await llm_cache.aset(cache_key, clarifying_question)
+        return clarifying_question
+    except asyncio.TimeoutError:
+        record_error('generate_clarifying_question', 'timeout')
+        logging.warning(f"Clarifying question generation timed out after {LLM_CLARIFY_TIMEOUT}s.")
+        return DEFAULT_CLARIFYING_QUESTION
     except Exception as e:
+        record_error('generate_clarifying_question', 'exception')
         logging.error(f"Error generating clarifying question with LLM: {e}")
-        return "Could you please provide more details about what you're looking for?"
+        return DEFAULT_CLARIFYING_QUESTION
+
+@traced('stream_clarifying_question')
+async def stream_clarifying_question(conversation_history: List[Dict[str, str]], llm_client: Optional[AsyncOpenAI],
+                                     summary: Optional[Summary] = None) -> AsyncIterator[str]:
+    """
+    Streams a clarifying question token by token.
+
+    Yields the canned question if the LLM is unavailable or fails before producing
+    any tokens; a failure mid-stream simply ends the stream.
+    """
+    if not llm_client:
+        yield DEFAULT_CLARIFYING_QUESTION
+        return
+
+    cache_key = _clarifying_question_cache_key(conversation_history, summary)
+    if cache_key:
+        cached_question = await llm_cache.aget(cache_key)
+        if cached_question is not None:
+            yield cached_question
+            return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_CLARIFY_TIMEOUT
+    question_parts = []
+    try:
+        stream = await asyncio.wait_for(
+            llm_client.chat.completions.create(
+                model=GENERATION_MODEL_NAME,
+                messages=_clarifying_question_messages(conversation_history, summary),
+                temperature=0.7,
+                max_tokens=100,
+                stream=True,
+                stream_options={"include_usage": True}
+            ),
+            timeout=LLM_CLARIFY_TIMEOUT
+        )
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            # With include_usage, the final chunk carries token usage and no choices
+            record_token_usage('stream_clarifying_question', getattr(chunk, 'usage', None))
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                question_parts.append(token)
+                yield token
+        if cache_key and question_parts:
+            await llm_cache.aset(cache_key, ''.join(question_parts).strip())
+    except asyncio.TimeoutError:
+        record_error('stream_clarifying_question', 'timeout')
+        logging.warning(f"Clarifying question stream timed out after {LLM_CLARIFY_TIMEOUT}s.")
+    except Exception as e:
+        record_error('stream_clarifying_question', 'exception')
+        logging.error(f"Error streaming clarifying question with LLM: {e}")
+
+    if not question_parts:
+        yield DEFAULT_CLARIFYING_QUESTION
+
+async def search_locations(conversation_history: List[Dict[str, str]], retriever: Retriever,
+                           facets: Optional[FacetIndex] = None,
+                           query_embedder: Optional[Callable[[List[str]], Any]] = None,
+                           summary: Optional[Summary] = None) -> List[Dict[str, Any]]:
+    """
+    Generates a search query and retrieves matching locations, each stage under its own timeout.
 
-def rag_pipeline_clarify(conversation_history: List[Dict[str, str]], collection: chromadb.Collection) -> Dict[str, Any]:
+    Explicit first messages are turned into a query locally, skipping the LLM round
+    trip. Area, category and price constraints found in the query are pushed down to
+    the retriever as metadata filters.
+    """
+    local = try_local_search_query(conversation_history, facets)
+    if local is not None:
+        search_query, where = local
+    else:
+        search_query = await generate_search_query(conversation_history, async_openai_client, summary)
+        where = FacetIndex.to_where(facets.extract_filters(search_query)) if facets else None
+
+    # Retrieval (query embedding + search) is synchronous, so keep it off the event loop
+    try:
+        retrieval_results = await asyncio.wait_for(
+            _run_retrieval(retrieve_locations, search_query, retriever, TOP_K_RETRIEVAL, where, query_embedder),
+            timeout=RETRIEVAL_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        record_error('retrieve_locations', 'timeout')
+        logging.warning(f"Retrieval timed out after {RETRIEVAL_TIMEOUT}s.")
+        retrieval_results = _empty_results()
+
+    return format_retrieved_locations_for_response(retrieval_results)
+
+def _task_result(task: "asyncio.Task", fallback: Any) -> Any:
+    """Returns a finished task's result, or the fallback if it was cancelled or failed."""
+    if not task.done() or task.cancelled():
+        return fallback
+    if task.exception() is not None:
+        logging.error(f"Pipeline stage failed: {task.exception()}")
+        return fallback
+    return task.result()
+
+async def rag_pipeline_clarify(conversation_history: List[Dict[str, str]], retriever: Retriever,
+                               facets: Optional[FacetIndex] = None,
+                               query_embedder: Optional[Callable[[List[str]], Any]] = None,
+                               summary: Optional[Summary] = None) -> Dict[str, Any]:
     """
     Runs the RAG pipeline to retrieve locations and generate a clarifying question.
 
+    The clarifying question depends only on the conversation, so it is generated
+    concurrently with query generation and retrieval. Stages still running when
+    PIPELINE_LATENCY_BUDGET runs out are cancelled and replaced by canned responses.
+
+    With a session's running criteria `summary`, prompts are built from it and the
+    last few messages; without one (stateless requests) from the whole conversation.
+
     Returns:
         A dictionary containing:
         - 'retrieved_locations': List of dicts [{'id': str, 'score': float, 'title': str}]
         - 'clarifying_question': str
     """
-    # Generate search query from conversation
-    search_query = generate_search_query(conversation_history, openai_client)
-    
-    # Retrieve relevant locations
-    retrieval_results = retrieve_locations(search_query, collection, TOP_K_RETRIEVAL)
-    
-    # Format locations for response
-    formatted_locations = format_retrieved_locations_for_response(retrieval_results)
-    
-    # Generate clarifying question
-    clarifying_question = generate_clarifying_question(conversation_history, openai_client)
-    
+    search_task = asyncio.create_task(search_locations(conversation_history, retriever, facets, query_embedder,
+                                                       summary))
+    clarify_task = asyncio.create_task(generate_clarifying_question(conversation_history, async_openai_client,
+                                                                    summary))
+
+    _, pending = await asyncio.wait({search_task, clarify_task}, timeout=PIPELINE_LATENCY_BUDGET)
+    if pending:
+        record_error('pipeline', 'timeout')
+        logging.warning(f"Latency budget of {PIPELINE_LATENCY_BUDGET}s exceeded. Falling back for {len(pending)} stage(s).")
+        for task in pending:
+            task.cancel()
+
     return {
-        'retrieved_locations': formatted_locations,
-        'clarifying_question': clarifying_question
+        'retrieved_locations': _task_result(search_task, []),
+        'clarifying_question': _task_result(clarify_task, DEFAULT_CLARIFYING_QUESTION)
     }
+
+async def rag_pipeline_clarify_stream(conversation_history: List[Dict[str, str]],
+                                      retriever: Retriever,
+                                      facets: Optional[FacetIndex] = None,
+                                      query_embedder: Optional[Callable[[List[str]], Any]] = None,
+                                      summary: Optional[Summary] = None
+                                      ) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming variant of rag_pipeline_clarify.
+
+    Yields ('retrieved_locations', list) as soon as retrieval finishes, then one
+    ('token', str) per clarifying-question token and finally ('clarifying_question', str)
+    with the full text. The question is generated concurrently with retrieval and
+    buffered until the locations have been sent.
+    """
+    tokens: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    async def produce_question() -> None:
+        try:
+            async for token in stream_clarifying_question(conversation_history, async_openai_client, summary):
+                await tokens.put(token)
+        finally:
+            await tokens.put(None)
+
+    question_task = asyncio.create_task(produce_question())
+    try:
+        try:
+            locations = await asyncio.wait_for(search_locations(conversation_history, retriever, facets,
+                                                                query_embedder, summary),
+                                               timeout=PIPELINE_LATENCY_BUDGET)
+        except asyncio.TimeoutError:
+            record_error('pipeline', 'timeout')
+            logging.warning(f"Latency budget of {PIPELINE_LATENCY_BUDGET}s exceeded during retrieval.")
+            locations = []
+        yield 'retrieved_locations', locations
+
+        question_parts = []
+        while (token := await tokens.get()) is not None:
+            question_parts.append(token)
+            yield 'token', token
+        yield 'clarifying_question', ''.join(question_parts).strip()
+    finally:
+        question_task.cancel()
+
+def _retrieve_batch(queries: List[str], vectors: Any, wheres: List[Optional[Dict[str, Any]]], retriever: Retriever,
+                    n_results: int) -> List[Any]:
+    """
+    Retrieves locations for many queries with one multi-query call per distinct filter.
+
+    Returns one formatted location list per query, or the exception raised for its group.
+    Queries whose filter leaves no results are retried together without filters.
+    """
+    results: List[Any] = [None] * len(queries)
+    groups: Dict[str, List[int]] = {}
+    for i, where in enumerate(wheres):
+        groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+
+    unfiltered_retry: List[int] = []
+    for indices in groups.values():
+        where = wheres[indices[0]]
+        try:
+            batch = retriever.query(query_texts=[queries[i] for i in indices],
+                                    query_embeddings=[vectors[i] for i in indices],
+                                    n_results=n_results, where=where)
+        except Exception as e:
+            logging.error(f"Error during batch retrieval: {e}")
+            for i in indices:
+                results[i] = e
+            continue
+        for position, i in enumerate(indices):
+            if where and not batch['ids'][position]:
+                unfiltered_retry.append(i)
+            else:
+                results[i] = format_retrieved_locations_for_response(
+                    {'metadatas': [batch['metadatas'][position]], 'distances': [batch['distances'][position]]})
+
+    if unfiltered_retry:
+        try:
+            batch = retriever.query(query_texts=[queries[i] for i in unfiltered_retry],
+                                    query_embeddings=[vectors[i] for i in unfiltered_retry], n_results=n_results)
+            for position, i in enumerate(unfiltered_retry):
+                results[i] = format_retrieved_locations_for_response(
+                    {'metadatas': [batch['metadatas'][position]], 'distances': [batch['distances'][position]]})
+        except Exception as e:
+            logging.error(f"Error during batch retrieval: {e}")
+            for i in unfiltered_retry:
+                results[i] = e
+    return results
+
+async def rag_pipeline_clarify_batch(conversations: List[List[Dict[str, str]]], retriever: Retriever,
+                                     embedding_function: Callable[[List[str]], Any],
+                                     facets: Optional[FacetIndex] = None,
+                                     concurrency: int = BATCH_LLM_CONCURRENCY) -> List[Dict[str, Any]]:
+    """
+    Runs the RAG pipeline over many conversations at once, for offline jobs.
+
+    Search queries and clarifying questions are generated with at most `concurrency`
+    LLM calls in flight; explicit first messages get their search query locally.
+    All queries are then embedded in one model forward pass and retrieved with one
+    multi-query call. Failures are isolated per conversation.
+
+    Returns one item per conversation, in order: either the same dictionary as
+    rag_pipeline_clarify or {'error': str}.
+
+    Example (outside the server):
+        resources.load_catalog(CSV_PATH)
+        resources.warm_up()
+        snapshot = resources.snapshot
+        results = asyncio.run(rag_pipeline_clarify_batch(conversations, snapshot.retriever,
+                                                         resources.embedding_function, snapshot.facets))
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    valid = [i for i, conversation in enumerate(conversations) if conversation]
+    local_queries = {i: try_local_search_query(conversations[i], facets) for i in valid}
+    needs_llm = [i for i in valid if local_queries[i] is None]
+    llm_query_results, question_results = await asyncio.gather(
+        # generate_search_query falls back to the last user message rather than raising
+        asyncio.gather(*(bounded(generate_search_query(conversations[i], async_openai_client)) for i in needs_llm)),
+        asyncio.gather(*(bounded(generate_clarifying_question(conversations[i], async_openai_client))
+                         for i in valid), return_exceptions=True)
+    )
+
+    errors: Dict[int, str] = {i: "No conversation provided" for i in range(len(conversations)) if not conversations[i]}
+    queries: Dict[int, str] = {i: local[0] for i, local in local_queries.items() if local is not None}
+    queries.update(zip(needs_llm, llm_query_results))
+
+    locations: Dict[int, Any] = {}
+    order = list(queries)
+    if order:
+        query_texts = [queries[i] for i in order]
+        wheres = [local_queries[i][1] if local_queries.get(i) is not None
+                  else FacetIndex.to_where(facets.extract_filters(queries[i])) if facets else None for i in order]
+        try:
+            # One forward pass for every query in the batch
+            vectors = await asyncio.to_thread(embedding_function, query_texts)
+            retrieved = await asyncio.to_thread(_retrieve_batch, query_texts, vectors, wheres, retriever,
+                                                TOP_K_RETRIEVAL)
+            locations = dict(zip(order, retrieved))
+        except Exception as e:
+            logging.error(f"Error embedding batch queries: {e}")
+            locations = {i: e for i in order}
+
+    results: List[Dict[str, Any]] = []
+    question_by_index = dict(zip(valid, question_results))
+    for i in range(len(conversations)):
+        if i in errors:
+            results.append({'error': errors[i]})
+        elif isinstance(locations.get(i), BaseException):
+            results.append({'error': f"Retrieval failed: {locations[i]}"})
+        else:
+            question = question_by_index[i]
+            results.append({
+                'retrieved_locations': locations[i],
+                'clarifying_question': DEFAULT_CLARIFYING_QUESTION if isinstance(question, BaseException) else question
+            })
+    return results
@@ -0,0 +1,344 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, Callable, Sequence, TYPE_CHECKING
+from embedding_service import EmbeddingService
+from embedding_rpc import RemoteEmbeddingFunction
+from retrievers import Retriever, NumpyRetriever, HybridRetriever
+from lexical import BM25Index
+from facets import FacetIndex
+from location_catalog import LocationCatalog
+from serving_bundle import ServingBundle, load_bundle, current_version
+from metrics import span
+from config import (EMBEDDING_MODEL_NAME, INDEX_ARTIFACT_DIR, RETRIEVER_BACKEND, HYBRID_RETRIEVAL, RRF_K,
+                    HYBRID_CANDIDATE_MULTIPLIER, EMBEDDING_QUEUE_ENABLED, EMBEDDING_QUEUE_MAX_BATCH,
+                    EMBEDDING_QUEUE_MAX_WAIT_MS, EMBEDDING_QUEUE_TIMEOUT, IMAGE_SOURCE_DIR, IMAGE_VARIANTS_DIR,
+                    LOCATIONS_PAGE_CACHE_SIZE, CSV_PATH, SERVING_MODE, SERVING_BUNDLE_DIR, INDEX_SERVER_SOCKET,
+                    INDEX_SERVER_TIMEOUT, INDEX_SERVER_WAIT_SECONDS, COLLECTION_NAME)
+
+# pandas, chromadb and the embedding model are imported where they are first used, so a
+# worker in shared serving mode, which never needs them, starts without loading them
+if TYPE_CHECKING:
+    import chromadb
+    import pandas as pd
+    from data_loader import DataLoader
+    from index_artifact import EmbeddingArtifact
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _standby_collection_name(active: str) -> str:
+    """The collection a Chroma-backend reload syncs while `active` keeps serving."""
+    return f"{COLLECTION_NAME}-standby" if active == COLLECTION_NAME else COLLECTION_NAME
+
+class CatalogSnapshot:
+    """
+    Everything derived from one version of the location CSV.
+
+    A snapshot is built completely before it is published and is never modified
+    afterwards, so a request that reads `resources.snapshot` once sees one
+    consistent catalog even if a reload swaps in a newer snapshot meanwhile.
+    `retriever` is None until the embedding model and index are ready.
+    Snapshots opened from a serving bundle have no `loader` and carry `bundle_version`.
+    """
+
+    def __init__(self, csv_path: str, csv_signature: Optional[Tuple[int, int]], loader: Optional["DataLoader"],
+                 locations: Sequence[Dict[str, Any]], documents: List[str], metadatas: List[Dict[str, Any]],
+                 ids: List[str], catalog: LocationCatalog, facets: FacetIndex,
+                 content_hashes: Optional[List[str]] = None, retriever: Optional[Retriever] = None,
+                 bundle_version: Optional[str] = None):
+        self.csv_path = csv_path
+        self.csv_signature = csv_signature
+        self.loader = loader
+        self.locations = locations
+        self.documents = documents
+        self.metadatas = metadatas
+        self.ids = ids
+        self.catalog = catalog
+        self.facets = facets
+        self.content_hashes = content_hashes
+        self.retriever = retriever
+        self.bundle_version = bundle_version
+        self.loaded_at = time.time()
+
+    @property
+    def df(self) -> Optional["pd.DataFrame"]:
+        return self.loader.df if self.loader is not None else None
+
+    @property
+    def version(self) -> str:
+        return self.catalog.version
+
+    def with_retriever(self, content_hashes: List[str], retriever: Retriever) -> "CatalogSnapshot":
+        """Returns a copy of this snapshot with a search index attached."""
+        return CatalogSnapshot(self.csv_path, self.csv_signature, self.loader, self.locations, self.documents,
+                               self.metadatas, self.ids, self.catalog, self.facets, content_hashes, retriever)
+
+class ServerResources:
+    """
+    Process-wide handles shared by every request: the embedding model and query
+    embedding service, the Chroma collection and the current catalog snapshot.
+
+    In shared serving mode (SERVING_MODE=shared) the process loads none of these
+    itself: snapshots are opened from the bundle written by index_server.py, with
+    the embedding matrix and location payloads memory-mapped, and queries are
+    embedded by the index server over its Unix socket.
+    """
+
+    def __init__(self, serving_mode: str = SERVING_MODE):
+        self.serving_mode = serving_mode
+        self.embedding_function: Optional[Callable[[List[str]], Any]] = None
+        self.embedding_service: Optional[EmbeddingService] = None
+        self.remote_embedder: Optional[RemoteEmbeddingFunction] = None
+        self.artifact: Optional["EmbeddingArtifact"] = None
+        self.collection: Optional["chromadb.Collection"] = None
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.error: Optional[str] = None
+        self.last_reload: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        snapshot = self.snapshot
+        return snapshot is not None and snapshot.retriever is not None
+
+    @property
+    def shared(self) -> bool:
+        return self.serving_mode == 'shared'
+
+    @property
+    def query_embedder(self) -> Optional[Callable[[List[str]], Any]]:
+        """Embeds queries ahead of retrieval: the local batching service, or the index server in shared mode."""
+        return self.embedding_service or self.remote_embedder
+
+    def _build_catalog(self, csv_path: str) -> CatalogSnapshot:
+        """Loads a CSV into a fresh DataLoader and derives everything except the search index."""
+        from data_loader import DataLoader
+        signature = _file_signature(csv_path)
+        loader = DataLoader(IMAGE_SOURCE_DIR, IMAGE_VARIANTS_DIR)
+        if loader.load_data(csv_path) is None:
+            raise RuntimeError(f"Failed to load location data from {csv_path}")
+        locations = loader.get_formatted_locations()
+        documents, metadatas, ids = loader.prepare_documents()
+        catalog = LocationCatalog(locations, LOCATIONS_PAGE_CACHE_SIZE)
+        return CatalogSnapshot(csv_path, signature, loader, locations, documents, metadatas, ids, catalog,
+                               FacetIndex.from_dataframe(loader.df))
+
+    def _index_snapshot(self, snapshot: CatalogSnapshot, previous: Optional[CatalogSnapshot]) -> CatalogSnapshot:
+        """
+        Upserts the snapshot's new or changed rows into Chroma and builds its retriever.
+
+        The NumPy backend never queries Chroma, so when the prebuilt artifact covers
+        exactly the snapshot's rows the sync is skipped and the matrix comes straight
+        from the artifact. A later reload that changes rows syncs Chroma then, reusing
+        the artifact's vectors for unchanged rows.
+
+        The Chroma backend queries the collection itself, so a reload never writes to
+        the one the current snapshot searches. It syncs the other collection of a
+        pair (COLLECTION_NAME and COLLECTION_NAME-standby), copying vectors of rows
+        that changed since from the current one, and the new snapshot searches that.
+        A collection is written again only two reloads after it was swapped out.
+        """
+        from embedding import build_or_load_index, compute_content_hash
+        from index_artifact import load_artifact
+        from retrievers import build_retriever
+        # A prebuilt artifact (see build_index.py) lets the index sync without embedding the catalog
+        self.artifact = load_artifact(INDEX_ARTIFACT_DIR, EMBEDDING_MODEL_NAME)
+        content_hashes = [compute_content_hash(doc, meta) for doc, meta in zip(snapshot.documents, snapshot.metadatas)]
+        collection = self.collection
+        if RETRIEVER_BACKEND == 'numpy' and self.artifact is not None and self.artifact.ids == snapshot.ids \
+                and self.artifact.content_hashes == content_hashes:
+            logging.info(f"Artifact {self.artifact.version} matches the catalog; skipping the Chroma sync")
+        else:
+            name, source = None, None
+            if RETRIEVER_BACKEND == 'chroma' and previous is not None and self.collection is not None:
+                name, source = _standby_collection_name(self.collection.name), self.collection
+            with span('sync_index'):
+                collection = build_or_load_index(snapshot.documents, snapshot.metadatas, snapshot.ids,
+                                                 self.embedding_function, precomputed=self.artifact,
+                                                 collection_name=name, source=source)
+            if collection is None:
+                raise RuntimeError("Failed to initialize search index")
+            self.collection = collection
+        with span('build_retriever'):
+            retriever = build_retriever(RETRIEVER_BACKEND, collection, snapshot.metadatas, snapshot.ids,
+                                        self.embedding_function, content_hashes, self.artifact,
+                                        previous=previous.retriever if previous else None)
+            if HYBRID_RETRIEVAL:
+                retriever = HybridRetriever(retriever, BM25Index(snapshot.documents), snapshot.ids,
+                                            snapshot.metadatas, RRF_K, HYBRID_CANDIDATE_MULTIPLIER)
+        return snapshot.with_retriever(content_hashes, retriever)
+
+    def _open_bundle(self, bundle: ServingBundle) -> CatalogSnapshot:
+        """Builds a searchable snapshot over a serving bundle without copying its matrix or full payload."""
+        with span('open_bundle'):
+            locations = bundle.load_locations()
+            catalog = LocationCatalog(locations, LOCATIONS_PAGE_CACHE_SIZE, bundle.manifest['catalog_version'],
+                                      bundle.full_payload, bundle.catalog_indexes)
+            retriever: Retriever = NumpyRetriever(bundle.ids, bundle.embeddings, bundle.metadatas,
+                                                  self.remote_embedder, normalized=True,
+                                                  content_hashes=bundle.content_hashes)
+            if HYBRID_RETRIEVAL:
+                retriever = HybridRetriever(retriever, bundle.lexical, bundle.ids, bundle.metadatas,
+                                            RRF_K, HYBRID_CANDIDATE_MULTIPLIER)
+        # The bundle carries the prebuilt lexical index instead of the documents
+        return CatalogSnapshot(bundle.path, None, None, locations, [], bundle.metadatas, bundle.ids,
+                               catalog, FacetIndex(bundle.facet_values), bundle.content_hashes, retriever,
+                               bundle_version=bundle.version)
+
+    def _attach_index_server(self) -> None:
+        """Waits for the index server's first bundle and socket, then serves from them."""
+        self.remote_embedder = RemoteEmbeddingFunction(INDEX_SERVER_SOCKET, INDEX_SERVER_TIMEOUT)
+        self.embedding_function = self.remote_embedder
+        deadline = time.time() + INDEX_SERVER_WAIT_SECONDS
+        bundle = None
+        while True:
+            bundle = load_bundle(SERVING_BUNDLE_DIR, EMBEDDING_MODEL_NAME)
+            if bundle is not None and self.remote_embedder.ping():
+                break
+            if time.time() > deadline:
+                raise RuntimeError(f"No serving bundle in {SERVING_BUNDLE_DIR} or index server at "
+                                   f"{INDEX_SERVER_SOCKET} after {INDEX_SERVER_WAIT_SECONDS}s")
+            time.sleep(0.5)
+        self.snapshot = self._open_bundle(bundle)
+        logging.info(f"Serving catalog {self.snapshot.version} from bundle {bundle.version}")
+
+    def load_catalog(self, csv_path: str) -> CatalogSnapshot:
+        """Loads the CSV and publishes a snapshot without a search index, so locations can be served during warm-up."""
+        snapshot = self._build_catalog(csv_path)
+        self.snapshot = snapshot
+        logging.info(f"Loaded catalog {snapshot.version} with {len(snapshot.ids)} locations from {csv_path}")
+        return snapshot
+
+    def warm_up(self) -> bool:
+        """Loads the embedding model and builds the index for the current snapshot once."""
+        with self._lock:
+            if self.ready:
+                return True
+            try:
+                if self.shared:
+                    self._attach_index_server()
+                    self.error = None
+                    return self.ready
+                from embedding import get_embedding_function
+                with span('load_embedding_model'):
+                    self.embedding_function = get_embedding_function()
+                snapshot = self._index_snapshot(self.snapshot, None)
+                if EMBEDDING_QUEUE_ENABLED:
+                    self.embedding_service = EmbeddingService(self.embedding_function, EMBEDDING_QUEUE_MAX_BATCH,
+                                                              EMBEDDING_QUEUE_MAX_WAIT_MS, EMBEDDING_QUEUE_TIMEOUT)
+                    self.embedding_service.start()
+                self.snapshot = snapshot
+                self.error = None
+                logging.info("Server resources are warmed up and ready.")
+            except Exception as e:
+                self.error = str(e)
+                logging.error(f"Error warming up server resources: {e}")
+            return self.ready
+
+    def csv_changed(self) -> bool:
+        """True if the current snapshot's CSV (in shared mode, the bundle) changed since it was loaded."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return False
+        if self.shared:
+            return current_version(SERVING_BUNDLE_DIR) not in (None, snapshot.bundle_version)
+        return _file_signature(snapshot.csv_path) != snapshot.csv_signature
+
+    def _reload_bundle(self, force: bool) -> Dict[str, Any]:
+        """Swaps in the index server's latest bundle, if it is newer than the current one."""
+        previous = self.snapshot
+        if not force and previous is not None and current_version(SERVING_BUNDLE_DIR) == previous.bundle_version:
+            return {"status": "unchanged", "version": previous.version}
+        bundle = load_bundle(SERVING_BUNDLE_DIR, EMBEDDING_MODEL_NAME)
+        if bundle is None:
+            raise RuntimeError(f"No usable serving bundle in {SERVING_BUNDLE_DIR}")
+        snapshot = self._open_bundle(bundle)
+        self.snapshot = snapshot
+        return {
+            "status": "reloaded",
+            "version": snapshot.version,
+            "previous_version": previous.version if previous else None,
+            "bundle_version": bundle.version,
+            "locations": len(snapshot.ids),
+            "indexed": True,
+        }
+
+    def reload(self, csv_path: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Rebuilds the snapshot from the CSV and swaps it in once it is complete.
+
+        Only new or changed rows are re-embedded and upserted. Requests keep using
+        the previous snapshot until the swap. Returns the outcome, also kept in
+        `last_reload`. A reload that finds another reload or warm-up running returns
+        status 'busy' without waiting.
+        """
+        if not self._lock.acquire(blocking=False):
+            return {"status": "busy"}
+        start_time = time.time()
+        previous = self.snapshot
+        path = csv_path or (previous.csv_path if previous else CSV_PATH)
+        try:
+            if self.shared:
+                # The index server owns the CSV; workers pick up the bundles it writes
+                path = SERVING_BUNDLE_DIR
+                result = self._reload_bundle(force)
+                logging.info(f"Reloaded serving bundle: {result}")
+            elif not force and previous is not None and path == previous.csv_path \
+                    and _file_signature(path) == previous.csv_signature:
+                result = {"status": "unchanged", "version": previous.version}
+            else:
+                with span('reload_catalog'):
+                    snapshot = self._build_catalog(path)
+                    if self.embedding_function is not None:
+                        snapshot = self._index_snapshot(snapshot, previous)
+                # Publishing is a single reference assignment; in-flight requests keep their snapshot
+                self.snapshot = snapshot
+                changed = None
+                if previous is not None and previous.content_hashes and snapshot.content_hashes:
+                    changed = len(set(zip(snapshot.ids, snapshot.content_hashes)) -
+                                  set(zip(previous.ids, previous.content_hashes)))
+                result = {
+                    "status": "reloaded",
+                    "version": snapshot.version,
+                    "previous_version": previous.version if previous else None,
+                    "locations": len(snapshot.ids),
+                    "changed_or_new": changed,
+                    "removed": len(set(previous.ids) - set(snapshot.ids)) if previous else 0,
+                    "indexed": snapshot.retriever is not None,
+                }
+                logging.info(f"Reloaded catalog from {path}: {result}")
+        except Exception as e:
+            logging.error(f"Error reloading catalog from {path}; keeping the current snapshot: {e}")
+            result = {"status": "failed", "error": str(e)}
+        finally:
+            self._lock.release()
+        result.update({"csv_path": path, "duration_seconds": round(time.time() - start_time, 3),
+                       "finished_at": time.time()})
+        self.last_reload = result
+        return result
+
+    def shutdown(self) -> None:
+        """Stops background workers."""
+        if self.embedding_service is not None:
+            self.embedding_service.stop()
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the readiness state for health checks."""
+        if self.ready:
+            status = {"status": "ready", "catalog_version": self.snapshot.version}
+            if self.snapshot.bundle_version:
+                status["bundle_version"] = self.snapshot.bundle_version
+            return status
+        if self.error:
+            return {"status": "failed", "error": self.error}
+        return {"status": "warming_up"}
+
+# Create a singleton instance
+resources = ServerResources()
@@ -0,0 +1,274 @@
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, TYPE_CHECKING
+from lexical import BM25Index
+
+if TYPE_CHECKING:
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+class Retriever:
+    """
+    Interface for location retrieval backends.
+
+    `query` takes either query texts or precomputed query embeddings and returns
+    results in the shape of Chroma's `collection.query`: one inner list per query
+    under 'ids', 'metadatas' and 'distances' (cosine distance, lower is closer).
+    `where` is a Chroma-style metadata filter.
+    """
+
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+              n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        raise NotImplementedError
+
+class MetadataColumns:
+    """Columnar view of per-row metadata for evaluating Chroma-style `where` filters as boolean masks."""
+
+    def __init__(self, metadatas: List[Dict[str, Any]]):
+        self.metadatas = metadatas
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def column(self, field: str) -> np.ndarray:
+        """Returns a metadata field as an array aligned with the rows, built on first use."""
+        column = self._columns.get(field)
+        if column is None:
+            column = np.array([meta.get(field) for meta in self.metadatas], dtype=object)
+            self._columns[field] = column
+        return column
+
+    def mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Evaluates a `where` filter ($eq/$ne/$in/$nin, $and/$or) into a boolean row mask."""
+        mask = np.ones(len(self.metadatas), dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    mask &= self.mask(clause)
+            elif key == '$or':
+                any_mask = np.zeros(len(self.metadatas), dtype=bool)
+                for clause in condition:
+                    any_mask |= self.mask(clause)
+                mask &= any_mask
+            else:
+                column = self.column(key)
+                if not isinstance(condition, dict):
+                    condition = {'$eq': condition}
+                for op, value in condition.items():
+                    if op == '$eq':
+                        mask &= column == value
+                    elif op == '$ne':
+                        mask &= column != value
+                    elif op == '$in':
+                        mask &= np.isin(column, list(value))
+                    elif op == '$nin':
+                        mask &= ~np.isin(column, list(value))
+                    else:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+class ChromaRetriever(Retriever):
+    """Retrieves through a Chroma collection (HNSW index)."""
+
+    def __init__(self, collection: "chromadb.Collection"):
+        self.collection = collection
+
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+              n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        kwargs: Dict[str, Any] = {'n_results': n_results, 'include': ['metadatas', 'distances']}
+        if query_embeddings is not None:
+            kwargs['query_embeddings'] = [list(map(float, e)) for e in query_embeddings]
+        else:
+            kwargs['query_texts'] = query_texts
+        if where:
+            kwargs['where'] = where
+        return self.collection.query(**kwargs)
+
+class NumpyRetriever(Retriever):
+    """
+    Exact in-process search over a contiguous, L2-normalized embedding matrix.
+
+    Each query is a single matrix product followed by a vectorized top-k
+    (argpartition), and metadata filters are applied as boolean masks.
+    """
+
+    def __init__(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict[str, Any]],
+                 embedding_function: "embedding_functions.SentenceTransformerEmbeddingFunction",
+                 normalized: bool = False, content_hashes: Optional[List[str]] = None):
+        matrix = np.asarray(embeddings)
+        if matrix.dtype != np.float32:
+            matrix = matrix.astype(np.float32)
+        if not normalized:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+        self.matrix = np.ascontiguousarray(matrix)
+        self.ids = ids
+        self.metadatas = metadatas
+        self.content_hashes = content_hashes
+        self.embedding_function = embedding_function
+        self.columns = MetadataColumns(metadatas)
+        logging.info(f"NumPy retriever ready with {len(ids)} vectors.")
+
+    def embed_queries(self, query_texts: List[str]) -> np.ndarray:
+        """Embeds and normalizes query texts as one batch."""
+        vectors = np.asarray(self.embedding_function(query_texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+              n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        if query_embeddings is not None:
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1, norms)
+        else:
+            queries = self.embed_queries(query_texts or [])
+
+        results: Dict[str, List[List[Any]]] = {'ids': [], 'metadatas': [], 'distances': []}
+        if len(queries) == 0:
+            return results
+
+        scores = queries @ self.matrix.T
+        candidates = len(self.ids)
+        if where:
+            mask = self.columns.mask(where)
+            scores[:, ~mask] = -np.inf
+            candidates = int(mask.sum())
+
+        k = min(n_results, candidates)
+        if k <= 0:
+            for _ in range(len(queries)):
+                results['ids'].append([])
+                results['metadatas'].append([])
+                results['distances'].append([])
+            return results
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for rows, row_scores in zip(top, top_scores):
+            results['ids'].append([self.ids[r] for r in rows])
+            results['metadatas'].append([self.metadatas[r] for r in rows])
+            results['distances'].append([float(1 - s) for s in row_scores])
+        return results
+
+class HybridRetriever(Retriever):
+    """
+    Fuses vector and BM25 lexical rankings with reciprocal rank fusion.
+
+    Both rankings are drawn from a candidate pool of `n_results * candidate_multiplier`
+    and honour the same `where` filter. The reported distance is 1 minus the fused
+    score normalized so that a document ranked first by both retrievers scores 1.
+    """
+
+    def __init__(self, vector: Retriever, lexical: BM25Index, ids: List[str], metadatas: List[Dict[str, Any]],
+                 rrf_k: int = 60, candidate_multiplier: int = 4):
+        self.vector = vector
+        self.lexical = lexical
+        self.ids = ids
+        self.metadatas = metadatas
+        # Share the vector retriever's columns when it has them, rather than building them twice
+        self.columns = getattr(vector, 'columns', None) or MetadataColumns(metadatas)
+        self.rrf_k = rrf_k
+        self.candidate_multiplier = candidate_multiplier
+        self._row_by_id = {id_: row for row, id_ in enumerate(ids)}
+
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+              n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        pool = n_results * self.candidate_multiplier
+        vector_results = self.vector.query(query_texts=query_texts, query_embeddings=query_embeddings,
+                                           n_results=pool, where=where)
+        if not query_texts:
+            # Lexical scoring needs the query text; precomputed embeddings alone fall back to vector search
+            return {key: [ranked[:n_results] for ranked in vector_results[key]] for key in ('ids', 'metadatas', 'distances')}
+
+        mask = self.columns.mask(where) if where else None
+        max_score = 2 / (self.rrf_k + 1)
+        results: Dict[str, List[List[Any]]] = {'ids': [], 'metadatas': [], 'distances': []}
+        for query_text, vector_ids in zip(query_texts, vector_results['ids']):
+            fused: Dict[int, float] = {}
+            for rank, id_ in enumerate(vector_ids):
+                row = self._row_by_id.get(id_)
+                if row is not None:
+                    fused[row] = fused.get(row, 0.0) + 1 / (self.rrf_k + rank + 1)
+            for rank, row in enumerate(self.lexical.top_k(query_text, pool, mask)):
+                fused[row] = fused.get(row, 0.0) + 1 / (self.rrf_k + rank + 1)
+
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:n_results]
+            results['ids'].append([self.ids[row] for row, _ in ranked])
+            results['metadatas'].append([self.metadatas[row] for row, _ in ranked])
+            results['distances'].append([1 - score / max_score for _, score in ranked])
+        return results
+
+def _load_collection_embeddings(collection: "chromadb.Collection", ids: List[str], page_size: int = 5000) -> np.ndarray:
+    """Reads the stored vectors for `ids` out of a Chroma collection, in `ids` order."""
+    vectors: Dict[str, Any] = {}
+    for i in range(0, len(ids), page_size):
+        page = collection.get(ids=ids[i:i+page_size], include=['embeddings'])
+        vectors.update(zip(page['ids'], page['embeddings']))
+    return np.asarray([vectors[id_] for id_ in ids], dtype=np.float32)
+
+def _reuse_embeddings(previous: NumpyRetriever, collection: "chromadb.Collection", ids: List[str],
+                      content_hashes: List[str]) -> np.ndarray:
+    """
+    Builds a normalized matrix for `ids`, copying unchanged rows from a previous
+    NumPy retriever and reading only new or edited rows from Chroma.
+    """
+    previous_rows = {(id_, content_hash): row
+                     for row, (id_, content_hash) in enumerate(zip(previous.ids, previous.content_hashes))}
+    rows = [previous_rows.get(key) for key in zip(ids, content_hashes)]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    matrix = np.empty((len(ids), previous.matrix.shape[1]), dtype=np.float32)
+    reused = [i for i, row in enumerate(rows) if row is not None]
+    if reused:
+        matrix[reused] = previous.matrix[[rows[i] for i in reused]]
+    if missing:
+        fetched = _load_collection_embeddings(collection, [ids[i] for i in missing])
+        norms = np.linalg.norm(fetched, axis=1, keepdims=True)
+        matrix[missing] = fetched / np.where(norms == 0, 1, norms)
+    logging.info(f"Reused {len(reused)} vectors from the previous NumPy retriever; read {len(missing)} from Chroma")
+    return matrix
+
+def build_retriever(backend: str, collection: "chromadb.Collection", metadatas: List[Dict[str, Any]], ids: List[str],
+                    embedding_function: "embedding_functions.SentenceTransformerEmbeddingFunction",
+                    content_hashes: Optional[List[str]] = None, artifact=None,
+                    previous: Optional[Retriever] = None) -> Retriever:
+    """
+    Creates the retriever selected by RETRIEVER_BACKEND.
+
+    The NumPy backend takes its matrix from the prebuilt artifact when it matches
+    the current data exactly. Otherwise, on a reload, it copies unchanged rows from
+    the `previous` retriever, and it falls back to the vectors already stored in Chroma.
+    """
+    if backend == 'chroma':
+        return ChromaRetriever(collection)
+    if backend != 'numpy':
+        raise ValueError(f"Unknown retriever backend: {backend}")
+
+    if artifact is not None and content_hashes is not None and artifact.ids == ids \
+            and artifact.content_hashes == content_hashes:
+        logging.info(f"Building NumPy retriever from artifact {artifact.version}")
+        return NumpyRetriever(ids, artifact.embeddings, metadatas, embedding_function,
+                              normalized=artifact.manifest.get('normalized', False), content_hashes=content_hashes)
+
+    if isinstance(previous, HybridRetriever):
+        previous = previous.vector
+    if isinstance(previous, NumpyRetriever) and previous.content_hashes is not None and content_hashes is not None \
+            and len(previous.ids):
+        return NumpyRetriever(ids, _reuse_embeddings(previous, collection, ids, content_hashes), metadatas,
+                              embedding_function, normalized=True, content_hashes=content_hashes)
+
+    logging.info("Building NumPy retriever from vectors stored in Chroma")
+    return NumpyRetriever(ids, _load_collection_embeddings(collection, ids), metadatas, embedding_function,
+                          content_hashes=content_hashes)
+
+def embedding_matrix(retriever: Retriever, collection: Optional["chromadb.Collection"], ids: List[str]) -> np.ndarray:
+    """Returns the L2-normalized embedding matrix behind a retriever, in `ids` order."""
+    if isinstance(retriever, HybridRetriever):
+        retriever = retriever.vector
+    if isinstance(retriever, NumpyRetriever) and retriever.ids == ids:
+        return retriever.matrix
+    matrix = _load_collection_embeddings(collection, ids)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
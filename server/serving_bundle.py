@@ -0,0 +1,232 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Union
+from lexical import BM25Index
+from location_catalog import EncodedPayload, CatalogIndexes, MappedLocations, location_bounds
+
+BUNDLE_FORMAT_VERSION = 4
+CURRENT_POINTER = "CURRENT"
+# Versions kept on disk; workers may still have the previous one mapped
+KEEP_VERSIONS = 2
+
+class ServingBundle:
+    """
+    Everything a worker needs to serve requests, precomputed by the index server.
+
+    Layout of a version directory:
+        embeddings.npy      L2-normalized (n, dim) float32 matrix, memory-mapped on load
+        ids.json, content_hashes.json, metadatas.json   per-row data, in matrix order
+        facets.json         FacetIndex gazetteer values
+        locations.json      the full /api/locations body (also gzip/brotli-compressed), memory-mapped on load
+        locations_bounds.npy    byte offsets of each location within locations.json
+        bm25.json, bm25_*.npy             BM25 terms and flat postings, memory-mapped on load
+        catalog.json, catalog_*.npy, catalog_search.txt
+                            LocationCatalog filter rows and `q` search text, memory-mapped on load
+        manifest.json       format version, catalog version, model name, ETag, shape, creation time
+
+    The matrix, the encoded payloads and the lexical and catalog indexes are mapped
+    read-only, so every worker on a host shares one copy of them in the page cache
+    and none rebuilds them. Locations are parsed row by row on access. The ids,
+    content hashes and metadata (used for filtering and in search results) are
+    still parsed into Python objects by each worker.
+    """
+
+    def __init__(self, path: str, manifest: Dict[str, Any], ids: List[str], content_hashes: List[str],
+                 metadatas: List[Dict[str, Any]], facet_values: Dict[str, List[str]], embeddings: np.ndarray,
+                 full_payload: EncodedPayload, lexical: BM25Index, catalog_indexes: CatalogIndexes):
+        self.path = path
+        self.manifest = manifest
+        self.ids = ids
+        self.content_hashes = content_hashes
+        self.metadatas = metadatas
+        self.facet_values = facet_values
+        self.embeddings = embeddings
+        self.full_payload = full_payload
+        self.lexical = lexical
+        self.catalog_indexes = catalog_indexes
+
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+
+    def load_locations(self) -> MappedLocations:
+        """The locations of the mapped /api/locations body, parsed lazily row by row."""
+        return MappedLocations(self.full_payload.body,
+                               np.load(os.path.join(self.path, 'locations_bounds.npy'), mmap_mode='r'))
+
+def current_version(bundle_dir: str) -> Optional[str]:
+    """The version CURRENT points at, or None if no bundle was written yet."""
+    try:
+        with open(os.path.join(bundle_dir, CURRENT_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _write_json(path: str, value: Any) -> None:
+    with open(path, 'w') as f:
+        json.dump(value, f, separators=(',', ':'), ensure_ascii=False)
+
+def _write_lexical(directory: str, lexical: BM25Index) -> None:
+    terms, offsets, docs, weights = lexical.postings()
+    _write_json(os.path.join(directory, 'bm25.json'), {'size': lexical.size, 'terms': terms})
+    np.save(os.path.join(directory, 'bm25_offsets.npy'), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(directory, 'bm25_docs.npy'), np.asarray(docs, dtype=np.int32))
+    np.save(os.path.join(directory, 'bm25_weights.npy'), np.asarray(weights, dtype=np.float32))
+
+def _load_lexical(directory: str) -> BM25Index:
+    with open(os.path.join(directory, 'bm25.json')) as f:
+        header = json.load(f)
+    return BM25Index.from_postings(header['size'], header['terms'],
+                                   *(np.load(os.path.join(directory, f'bm25_{name}.npy'), mmap_mode='r')
+                                     for name in ('offsets', 'docs', 'weights')))
+
+def _write_catalog_indexes(directory: str, indexes: CatalogIndexes) -> None:
+    """Stores each group's rows back to back in one array, with per-key offsets into it."""
+    header: Dict[str, Any] = {}
+    rows: List[np.ndarray] = []
+    position = 0
+    for name in CatalogIndexes.GROUPS:
+        keys = list(indexes.groups[name])
+        offsets = [position]
+        for key in keys:
+            rows.append(np.asarray(indexes.groups[name][key], dtype=np.int64))
+            position += len(rows[-1])
+            offsets.append(position)
+        header[name] = {'keys': keys, 'offsets': offsets}
+    _write_json(os.path.join(directory, 'catalog.json'), header)
+    np.save(os.path.join(directory, 'catalog_rows.npy'),
+            np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64))
+    np.save(os.path.join(directory, 'catalog_search_offsets.npy'), np.asarray(indexes.search_offsets, dtype=np.int64))
+    with open(os.path.join(directory, 'catalog_search.txt'), 'wb') as f:
+        f.write(indexes.search_text)
+
+def _load_catalog_indexes(directory: str) -> CatalogIndexes:
+    with open(os.path.join(directory, 'catalog.json')) as f:
+        header = json.load(f)
+    rows = np.load(os.path.join(directory, 'catalog_rows.npy'), mmap_mode='r')
+    # Slices of the mapped array are views, so the groups share the mapping
+    groups = {name: {key: rows[start:end] for key, start, end in
+                     zip(header[name]['keys'], header[name]['offsets'], header[name]['offsets'][1:])}
+              for name in CatalogIndexes.GROUPS}
+    return CatalogIndexes(groups, _map(os.path.join(directory, 'catalog_search.txt')),
+                          np.load(os.path.join(directory, 'catalog_search_offsets.npy'), mmap_mode='r'))
+
+def _prune(bundle_dir: str, keep: str) -> None:
+    """Removes all but the newest KEEP_VERSIONS version directories (always keeping `keep`)."""
+    versions = [entry for entry in os.scandir(bundle_dir)
+                if entry.is_dir() and '.tmp-' not in entry.name and entry.name != keep]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+def write_bundle(bundle_dir: str, ids: List[str], content_hashes: List[str], metadatas: List[Dict[str, Any]],
+                 facet_values: Dict[str, List[str]], embeddings: np.ndarray, catalog_version: str,
+                 locations: List[Dict[str, Any]], full_payload: EncodedPayload, lexical: BM25Index,
+                 catalog_indexes: CatalogIndexes, model_name: str) -> str:
+    """
+    Writes a new bundle version and points CURRENT at it.
+
+    Like write_artifact, the version directory is written under a temporary name and
+    renamed into place, so workers never observe a partially written bundle.
+    """
+    bounds = location_bounds(locations)
+    if bytes(full_payload.body[bounds[-1] - 1:bounds[-1]]) != b']':
+        raise ValueError("Full payload does not match the locations being bundled")
+    version = f"{catalog_version}-{int(time.time() * 1000)}"
+    version_dir = os.path.join(bundle_dir, version)
+    tmp_dir = f"{version_dir}.tmp-{os.getpid()}"
+    os.makedirs(bundle_dir, exist_ok=True)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    np.save(os.path.join(tmp_dir, 'embeddings.npy'), matrix)
+    _write_json(os.path.join(tmp_dir, 'ids.json'), ids)
+    _write_json(os.path.join(tmp_dir, 'content_hashes.json'), content_hashes)
+    _write_json(os.path.join(tmp_dir, 'metadatas.json'), metadatas)
+    _write_json(os.path.join(tmp_dir, 'facets.json'), facet_values)
+    _write_lexical(tmp_dir, lexical)
+    _write_catalog_indexes(tmp_dir, catalog_indexes)
+    np.save(os.path.join(tmp_dir, 'locations_bounds.npy'), bounds)
+    for name, body in (('locations.json', full_payload.body), ('locations.json.gz', full_payload.gzip),
+                       ('locations.json.br', full_payload.br)):
+        if body is not None:
+            with open(os.path.join(tmp_dir, name), 'wb') as f:
+                f.write(body)
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'version': version,
+        'catalog_version': catalog_version,
+        'model_name': model_name,
+        'etag': full_payload.etag,
+        'count': int(matrix.shape[0]),
+        'dimension': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_dir, version_dir)
+
+    pointer_tmp = os.path.join(bundle_dir, f"{CURRENT_POINTER}.tmp-{os.getpid()}")
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(bundle_dir, CURRENT_POINTER))
+    _prune(bundle_dir, version)
+    logging.info(f"Wrote serving bundle {version} ({manifest['count']} locations)")
+    return version_dir
+
+def _map(path: str) -> Union[mmap.mmap, bytes]:
+    """Maps a file read-only (empty files cannot be mapped and read as b'')."""
+    if os.path.getsize(path) == 0:
+        return b''
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _map_file(path: str) -> Optional[memoryview]:
+    """Maps a file read-only as a memoryview; None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    return memoryview(_map(path))
+
+def load_bundle(bundle_dir: str, model_name: Optional[str] = None) -> Optional[ServingBundle]:
+    """
+    Opens the CURRENT bundle version with the matrix and payloads memory-mapped.
+
+    Returns None if there is no bundle, it has an incompatible format version, or it
+    was built with a different embedding model.
+    """
+    version = current_version(bundle_dir)
+    if version is None:
+        return None
+    version_dir = os.path.join(bundle_dir, version)
+    try:
+        with open(os.path.join(version_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            logging.warning(f"Ignoring serving bundle {version}: unsupported format version.")
+            return None
+        if model_name and manifest.get('model_name') != model_name:
+            logging.warning(f"Ignoring serving bundle {version}: built with {manifest.get('model_name')}, "
+                            f"expected {model_name}.")
+            return None
+        data = {}
+        for name in ('ids', 'content_hashes', 'metadatas', 'facets'):
+            with open(os.path.join(version_dir, f'{name}.json')) as f:
+                data[name] = json.load(f)
+        embeddings = np.load(os.path.join(version_dir, 'embeddings.npy'), mmap_mode='r')
+        full_payload = EncodedPayload.precomputed(_map_file(os.path.join(version_dir, 'locations.json')),
+                                                  manifest['etag'],
+                                                  _map_file(os.path.join(version_dir, 'locations.json.gz')),
+                                                  _map_file(os.path.join(version_dir, 'locations.json.br')))
+        logging.info(f"Opened serving bundle {version} ({len(data['ids'])} locations)")
+        return ServingBundle(version_dir, manifest, data['ids'], data['content_hashes'], data['metadatas'],
+                             data['facets'], embeddings, full_payload, _load_lexical(version_dir),
+                             _load_catalog_indexes(version_dir))
+    except Exception as e:
+        logging.error(f"Error loading serving bundle from {version_dir}: {e}")
+        return None
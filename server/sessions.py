@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+from facets import FacetIndex
+from config import (SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS, SESSION_DB_PATH, PROMPT_RECENT_MESSAGES, SERVING_MODE,
+                    SERVING_BUNDLE_DIR)
+
+# Summary keys and the facet fields they are extracted from
+SUMMARY_FIELDS = {'area': 'location_area', 'category': 'category_type', 'price': 'price_range'}
+
+def update_summary(summary: Dict[str, List[str]], messages: List[Dict[str, str]],
+                   facets: Optional[FacetIndex]) -> Dict[str, List[str]]:
+    """
+    Folds the criteria mentioned in new user messages into a criteria summary.
+
+    Only the given messages are scanned, so the cost of a turn does not depend on
+    the length of the conversation. A later mention of an area, category, price
+    or audience replaces the earlier one ("actually, somewhere in Tampines").
+    """
+    updated = {key: list(values) for key, values in summary.items()}
+    if facets is None:
+        return updated
+    for message in messages:
+        if message.get('role') != 'user':
+            continue
+        filters = facets.extract_filters(message.get('content', ''))
+        for key, field in SUMMARY_FIELDS.items():
+            if filters.get(field):
+                updated[key] = filters[field]
+        audience = facets.extract_audience(message.get('content', ''))
+        if audience:
+            updated['audience'] = audience
+    return updated
+
+class Session:
+    """Server-side conversation state: the criteria summary and a window of recent messages."""
+
+    def __init__(self, session_id: str, summary: Optional[Dict[str, List[str]]] = None,
+                 recent_messages: Optional[List[Dict[str, str]]] = None, turns: int = 0,
+                 created_at: Optional[float] = None, updated_at: Optional[float] = None):
+        self.session_id = session_id
+        self.summary = summary or {}
+        self.recent_messages = recent_messages or []
+        self.turns = turns
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'session_id': self.session_id, 'summary': self.summary, 'recent_messages': self.recent_messages,
+                'turns': self.turns, 'created_at': self.created_at, 'updated_at': self.updated_at}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        return cls(data['session_id'], data.get('summary'), data.get('recent_messages'), data.get('turns', 0),
+                   data.get('created_at'), data.get('updated_at'))
+
+class SessionBackend:
+    """
+    Storage interface for sessions, which are passed as JSON-serializable dicts.
+
+    Implementations must be thread-safe and expire sessions themselves. The
+    in-memory backend keeps sessions per process; SqliteSessionBackend shares
+    them between the processes on a host, and other shared stores (e.g. Redis)
+    can implement the same three methods.
+    """
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class InMemorySessionBackend(SessionBackend):
+    """Per-process LRU of sessions; a session expires `ttl_seconds` after its last update."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'evictions': 0, 'expirations': 0}
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            data, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.counters['expirations'] += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return data
+
+    def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._sessions[session_id] = (data, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'active': len(self._sessions), **self.counters}
+
+class SqliteSessionBackend(SessionBackend):
+    """
+    Sessions in a SQLite file, shared by every server process on the host.
+
+    Like the in-memory backend, a session expires `ttl_seconds` after its last
+    update, and the least recently updated sessions are evicted beyond `max_entries`
+    (checked periodically rather than on every write). Counters are per process.
+    """
+
+    def __init__(self, db_path: str, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {'evictions': 0, 'expirations': 0}
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Other processes may hold the write lock briefly; wait for it rather than failing
+        self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._db.commit()
+        logging.info(f"Opened session store at {db_path}")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT data, updated_at FROM sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+            if row is None:
+                return None
+            data, updated_at = row
+            if time.time() - updated_at > self.ttl_seconds:
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+                self.counters['expirations'] += 1
+                return None
+            return json.loads(data)
+
+    def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                             (session_id, json.dumps(data, separators=(',', ':'), ensure_ascii=False), time.time()))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+            self._db.commit()
+
+    def _prune(self) -> None:
+        expired = self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        self.counters['expirations'] += expired.rowcount
+        evicted = self._db.execute(
+            "DELETE FROM sessions WHERE session_id NOT IN "
+            "(SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)", (self.max_entries,)
+        )
+        self.counters['evictions'] += evicted.rowcount
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = self._db.execute("SELECT COUNT(*) FROM sessions WHERE updated_at >= ?",
+                                      (time.time() - self.ttl_seconds,)).fetchone()[0]
+            return {'active': active, **self.counters}
+
+class SessionStore:
+    """
+    Creates and updates sessions on top of a SessionBackend.
+
+    Clients send only the new messages of each turn; the store folds them into
+    the session's criteria summary and keeps the last `recent_messages` messages
+    for prompting, so the state per session stays bounded however long the chat gets.
+    """
+
+    def __init__(self, backend: SessionBackend, recent_messages: int = PROMPT_RECENT_MESSAGES):
+        self.backend = backend
+        self.recent_messages = recent_messages
+        # Serializes read-modify-write of a session within this process. With a shared
+        # backend, turns of one session sent concurrently to different processes may
+        # overwrite each other; clients send a session's turns one at a time.
+        self._lock = threading.Lock()
+
+    def create(self) -> Session:
+        session = Session(uuid.uuid4().hex)
+        self.backend.set(session.session_id, session.to_dict())
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        data = self.backend.get(session_id)
+        return Session.from_dict(data) if data is not None else None
+
+    def append(self, session_id: str, messages: List[Dict[str, str]], facets: Optional[FacetIndex]) -> Session:
+        """Adds a turn's new messages to a session. Raises KeyError if the session does not exist or expired."""
+        with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                raise KeyError(session_id)
+            session.summary = update_summary(session.summary, messages, facets)
+            session.recent_messages = (session.recent_messages + messages)[-self.recent_messages:]
+            session.turns += 1
+            session.updated_at = time.time()
+            self.backend.set(session_id, session.to_dict())
+            return session
+
+    def record_reply(self, session_id: str, content: str) -> None:
+        """Appends the assistant's reply so the next turn only needs the user's new message."""
+        with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                logging.warning(f"Session {session_id} expired before its reply was recorded.")
+                return
+            session.recent_messages = (session.recent_messages +
+                                       [{'role': 'assistant', 'content': content}])[-self.recent_messages:]
+            session.updated_at = time.time()
+            self.backend.set(session_id, session.to_dict())
+
+    def delete(self, session_id: str) -> None:
+        self.backend.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.backend.stats()
+
+def _default_backend() -> SessionBackend:
+    """SQLite at SESSION_DB_PATH if set; in shared serving mode, where workers must share sessions, next to the bundle."""
+    db_path = SESSION_DB_PATH
+    if not db_path and SERVING_MODE == 'shared':
+        db_path = os.path.join(SERVING_BUNDLE_DIR, 'sessions.sqlite3')
+    if db_path:
+        return SqliteSessionBackend(db_path, SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS)
+    return InMemorySessionBackend(SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS)
+
+# Create a singleton instance
+session_store = SessionStore(_default_backend())
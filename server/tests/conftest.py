@@ -0,0 +1,47 @@
+import os
+import sys
+import pytest
+
+# The server modules are imported flat (`from config import ...`), as when running from server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_location(index, title, area, category, themes, price='$$', summary=''):
+    """A location in the shape DataLoader.get_formatted_locations returns."""
+    return {
+        'id': str(index), 'title': title, 'link': f'https://example.com/{index}', 'address': f'{index} {area} Road',
+        'images': [], 'image_variants': [], 'content': summary, 'content_shorter_version': summary,
+        'location_area': area, 'category_type': category, 'theme_highlights': themes, 'price_range': price,
+        'audience_suitability': ['Families'], 'operating_hours': '9am - 9pm', 'additional_attributes': [],
+    }
+
+@pytest.fixture
+def locations():
+    return [
+        make_location(0, 'Kopi Corner', 'Bedok', 'Cafe', ['Food', 'Hidden Gem'], '$', 'A quiet café for kopi'),
+        make_location(1, 'East Coast Park', 'Bedok', 'Park', ['Nature', 'Family Fun'], 'Free', 'Seaside park'),
+        make_location(2, 'Marina Rooftop', 'Marina Bay', 'Bar', ['Nightlife', 'Rooftop Views'], '$$$',
+                      'Cocktails with a skyline view'),
+        make_location(3, 'Tampines Hub Cafe', 'Tampines', 'Cafe', ['Food'], '$$', 'Busy cafe near the MRT'),
+        make_location(4, 'Heritage Gallery', 'Chinatown', 'Gallery', ['Heritage', 'Art'], 'Free', 'Local history'),
+    ]
+
+@pytest.fixture
+def standalone_env(tmp_path, monkeypatch):
+    """
+    Points ServerResources at a 40-row synthetic CSV and temporary Chroma, artifact and
+    image directories, with the benchmarks' hashing embedder instead of the model.
+    Returns the CSV path.
+    """
+    import config
+    import embedding
+    import resources
+    from benchmarks.micro import HashEmbeddingFunction
+    from benchmarks.synthetic_data import write_csv
+    monkeypatch.setattr(config, 'PERSIST_DIRECTORY', str(tmp_path / 'chroma'))
+    for name, value in (('INDEX_ARTIFACT_DIR', str(tmp_path / 'artifacts')),
+                        ('IMAGE_SOURCE_DIR', str(tmp_path / 'images')),
+                        ('IMAGE_VARIANTS_DIR', str(tmp_path / 'variants')), ('RETRIEVER_BACKEND', 'chroma'),
+                        ('HYBRID_RETRIEVAL', False), ('EMBEDDING_QUEUE_ENABLED', False)):
+        monkeypatch.setattr(resources, name, value)
+    monkeypatch.setattr(embedding, 'get_embedding_function', lambda: HashEmbeddingFunction(dimension=32))
+    return write_csv(str(tmp_path / 'locations.csv'), 40)
@@ -0,0 +1,101 @@
+import os
+import pandas as pd
+import pytest
+from data_loader import DataLoader
+
+ROWS = [
+    {'index': 1, 'title': 'Kopi Corner', 'link': 'https://example.com/1', 'address': '1 Bedok Road',
+     'image': 'kopi.jpg', 'content': 'A quiet café', 'content_shorter_version': 'Quiet café',
+     'location_area': 'Bedok', 'category_type': 'Cafe', 'theme_highlights': 'Food,Hidden Gem',
+     'audience_suitability': 'Families,Couples', 'price_range': '$', 'operating_hours': '9am - 9pm',
+     'additional_attributes': 'Wifi'},
+    {'index': 2, 'title': 'East Coast Park', 'link': None, 'address': None, 'image': None, 'content': None,
+     'content_shorter_version': None, 'location_area': 'Bedok', 'category_type': 'Park', 'theme_highlights': None,
+     'audience_suitability': 'Families', 'price_range': 'Free', 'operating_hours': None,
+     'additional_attributes': None},
+    {'index': 30, 'title': 'Marina Rooftop', 'link': 'https://example.com/30', 'address': '30 Marina Way',
+     'image': '', 'content': 'Cocktails', 'content_shorter_version': 'Skyline bar', 'location_area': 'Marina Bay',
+     'category_type': 'Bar', 'theme_highlights': 'Nightlife', 'audience_suitability': '', 'price_range': '$$$',
+     'operating_hours': '6pm - 2am', 'additional_attributes': 'Rooftop,Dress code'},
+]
+
+def baseline_formatted_locations(df, image_root):
+    """The row-wise get_formatted_locations the column-wise version replaced."""
+    locations = []
+    for _, row in df.iterrows():
+        location_id = str(row['index']).zfill(6)
+        image_dir = f"{image_root}/{location_id}"
+        images = []
+        if os.path.exists(image_dir):
+            images = [f"/images/{location_id}/{f}" for f in sorted(os.listdir(image_dir))
+                      if f.endswith(('.png', '.jpg', '.jpeg'))]
+        locations.append({
+            "id": str(row['index']),
+            "title": str(row['title']),
+            "link": str(row['link']) if 'link' in row else "",
+            "address": str(row['address']) if 'address' in row else "",
+            "images": images,
+            "content": str(row['content']) if 'content' in row else "",
+            "content_shorter_version": str(row['content_shorter_version']),
+            "location_area": str(row['location_area']),
+            "category_type": str(row['category_type']),
+            "theme_highlights": row['theme_highlights'].split(',') if row['theme_highlights'] else [],
+            "price_range": str(row['price_range']),
+            "audience_suitability": row['audience_suitability'].split(',') if row['audience_suitability'] else [],
+            "operating_hours": str(row['operating_hours']) if 'operating_hours' in row else "",
+            "additional_attributes": row['additional_attributes'].split(',') if row['additional_attributes'] else [],
+        })
+    return locations
+
+def baseline_documents(df):
+    """The row-wise prepare_documents the column-wise version replaced."""
+    documents, metadatas, ids = [], [], []
+    for _, row in df.iterrows():
+        documents.append(f"Title: {row['title']}\nArea: {row['location_area']}\nCategory: {row['category_type']}\n"
+                         f"Themes: {row['theme_highlights']}\nAudience: {row['audience_suitability']}\n"
+                         f"Price: {row['price_range']}\nSummary: {row['content_shorter_version']}\n"
+                         f"Attributes: {row['additional_attributes']}")
+        metadatas.append({
+            'index': str(row['index']), 'title': str(row['title']), 'link': str(row.get('link', '')),
+            'image': str(row.get('image', '')), 'address': str(row.get('address', '')),
+            'location_area': str(row['location_area']), 'category_type': str(row['category_type']),
+            'price_range': str(row['price_range']), 'operating_hours': str(row.get('operating_hours', 'N/A')),
+        })
+        ids.append(str(row['index']))
+    return documents, metadatas, ids
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+@pytest.fixture
+def image_root(tmp_path):
+    for name in ('b.png', 'a.jpg', 'notes.txt'):
+        touch(str(tmp_path / 'images' / '000001' / name))
+    touch(str(tmp_path / 'images' / '000030' / 'c.jpeg'))
+    return str(tmp_path / 'images')
+
+def load(tmp_path, image_root, rows=ROWS, drop=()):
+    csv_path = str(tmp_path / 'locations.csv')
+    pd.DataFrame(rows).drop(columns=list(drop)).to_csv(csv_path, index=False)
+    loader = DataLoader(image_root, str(tmp_path / 'variants'))
+    loader.load_data(csv_path)
+    return loader
+
+@pytest.mark.parametrize('drop', [(), ('link', 'address', 'content', 'image', 'operating_hours')])
+def test_outputs_match_the_row_wise_baseline(tmp_path, image_root, drop):
+    loader = load(tmp_path, image_root, drop=drop)
+
+    locations = loader.get_formatted_locations()
+
+    assert [location.pop('image_variants') for location in locations] == [[None, None], [], [None]]
+    assert locations == baseline_formatted_locations(loader.df, image_root)
+    assert loader.prepare_documents() == baseline_documents(loader.df)
+
+def test_image_extensions_are_matched_case_insensitively(tmp_path, image_root):
+    touch(os.path.join(image_root, '000002', 'PARK.JPG'))
+    touch(os.path.join(image_root, '000002', 'map.Png'))
+
+    locations = load(tmp_path, image_root).get_formatted_locations()
+
+    assert locations[1]['images'] == ['/images/000002/PARK.JPG', '/images/000002/map.Png']
@@ -0,0 +1,48 @@
+import threading
+import numpy as np
+import pytest
+from embedding_service import EmbeddingService
+
+class BlockingModel:
+    """Embeds each text as [len(text)] once released, recording every batch it is given."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, texts):
+        self.release.wait(5)
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+@pytest.fixture
+def model():
+    model = BlockingModel()
+    yield model
+    model.release.set()
+
+def test_concurrent_queries_share_a_batch(model):
+    service = EmbeddingService(model, max_batch_size=8, max_wait_ms=50)
+    service.start()
+    futures = [service.submit(text) for text in ('a', 'bb', 'bb')]
+    model.release.set()
+
+    assert [future.result(1).tolist() for future in futures] == [[1.0], [2.0], [2.0]]
+    service.stop()
+    assert model.batches == [['a', 'bb']]  # identical queries are embedded once
+    assert service.stats()['items'] == 3
+
+def test_embed_times_out_and_the_worker_skips_abandoned_requests(model):
+    service = EmbeddingService(model, max_batch_size=1, max_wait_ms=0, timeout=0.05)
+    service.start()
+    stuck = service.submit('first')  # occupies the worker until the model is released
+
+    with pytest.raises(TimeoutError):
+        service.embed(['late'])
+    model.release.set()
+    assert stuck.result(1).tolist() == [5.0]
+    np.testing.assert_array_equal(service.embed(['ok']), [[2.0]])
+    service.stop()
+
+    assert model.batches == [['first'], ['ok']]
+    assert service.stats()['timeouts'] == 1
@@ -0,0 +1,94 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import image_derivatives
+from image_derivatives import build_variants, build_all, ImageVariantIndex
+
+Image = pytest.importorskip('PIL.Image')
+
+WIDTHS = [16, 32, 64]
+
+def write_image(path, color, size=(40, 20)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', size, color).save(path)
+    return path
+
+def sha1_prefix(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:10]
+
+@pytest.fixture
+def built(monkeypatch):
+    """Runs build_all in threads so the build_variants calls can be recorded."""
+    calls = []
+    def recording_build_variants(source_path, relative_path, output_dir, widths):
+        calls.append(relative_path)
+        return build_variants(source_path, relative_path, output_dir, widths)
+    monkeypatch.setattr(image_derivatives, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(image_derivatives, 'build_variants', recording_build_variants)
+    return calls
+
+def test_variant_names_carry_the_source_content_hash(tmp_path):
+    source = write_image(str(tmp_path / 'images' / '001' / 'a.png'), 'red')
+    output = str(tmp_path / 'variants')
+
+    entry = build_variants(source, '001/a.png', output, WIDTHS)
+
+    content_hash = sha1_prefix(source)
+    assert entry['hash'] == content_hash and (entry['width'], entry['height']) == (40, 20)
+    # Widths above the source width are capped, never upscaled
+    assert [(v['width'], v['format'], v['url']) for v in entry['variants']] == [
+        (width, name, f'/image-variants/001/a-{content_hash}-{width}w.{extension}')
+        for width in (16, 32, 40) for name, extension in (('webp', 'webp'), ('jpeg', 'jpg'))]
+    for variant in entry['variants']:
+        with Image.open(os.path.join(output, variant['url'][len('/image-variants/'):])) as image:
+            assert image.width == variant['width']
+
+    write_image(source, 'blue')
+    assert build_variants(source, '001/a.png', output, WIDTHS)['hash'] != content_hash
+
+def test_unchanged_sources_are_not_reencoded(tmp_path, built):
+    source_dir, output = tmp_path / 'images', str(tmp_path / 'variants')
+    write_image(str(source_dir / '001' / 'a.png'), 'red')
+    write_image(str(source_dir / '002' / 'B.JPG'), 'green')
+
+    first = build_all(str(source_dir), output, WIDTHS, workers=2)
+    assert sorted(built) == ['001/a.png', '002/B.JPG']
+
+    built.clear()
+    assert build_all(str(source_dir), output, WIDTHS, workers=2) == first
+    assert built == []
+
+def test_changed_and_removed_sources_replace_their_variants(tmp_path, built):
+    source_dir, output = tmp_path / 'images', str(tmp_path / 'variants')
+    edited = write_image(str(source_dir / '001' / 'a.png'), 'red')
+    removed = write_image(str(source_dir / '002' / 'b.png'), 'green')
+    first = build_all(str(source_dir), output, WIDTHS, workers=2)
+
+    built.clear()
+    write_image(edited, 'blue', size=(30, 20))
+    os.remove(removed)
+    second = build_all(str(source_dir), output, WIDTHS, workers=2)
+
+    assert built == ['001/a.png'] and list(second['images']) == ['001/a.png']
+    on_disk = {f'/image-variants/{d}/{f}' for d in os.listdir(output) if d != 'manifest.json'
+               for f in os.listdir(os.path.join(output, d))}
+    assert on_disk == {variant['url'] for variant in second['images']['001/a.png']['variants']}
+    assert not on_disk & {variant['url'] for entry in first['images'].values() for variant in entry['variants']}
+
+def test_srcset_for_lists_variants_by_format(tmp_path, built):
+    source_dir, output = tmp_path / 'images', str(tmp_path / 'variants')
+    content_hash = sha1_prefix(write_image(str(source_dir / '001' / 'a.png'), 'red'))
+    index = ImageVariantIndex(output)
+    assert index.refresh() is False  # no manifest yet
+    build_all(str(source_dir), output, WIDTHS, workers=1)
+
+    assert index.refresh() is True and index.refresh() is False
+    url = lambda width, extension: f'/image-variants/001/a-{content_hash}-{width}w.{extension}'
+    assert index.srcset_for('/images/001/a.png') == {
+        'src': url(32, 'jpg'),
+        'webp_srcset': f"{url(16, 'webp')} 16w, {url(32, 'webp')} 32w, {url(40, 'webp')} 40w",
+        'jpeg_srcset': f"{url(16, 'jpg')} 16w, {url(32, 'jpg')} 32w, {url(40, 'jpg')} 40w",
+    }
+    assert index.srcset_for('/images/001/missing.png') is None
@@ -0,0 +1,106 @@
+import os
+import numpy as np
+import pytest
+import index_artifact
+from index_artifact import write_artifact, load_artifact, compute_data_hash, CURRENT_POINTER
+
+IDS = ['a', 'b', 'c']
+HASHES = ['h-a', 'h-b', 'h-c']
+
+def vectors(seed=0):
+    return np.random.default_rng(seed).normal(size=(3, 8)).astype(np.float32)
+
+def current(directory):
+    with open(os.path.join(directory, CURRENT_POINTER)) as f:
+        return f.read()
+
+def test_round_trip_maps_the_same_rows(tmp_path):
+    embeddings = vectors()
+
+    path = write_artifact(str(tmp_path), IDS, HASHES, embeddings, 'model-x')
+    artifact = load_artifact(str(tmp_path), 'model-x')
+
+    assert artifact.path == path and current(tmp_path) == artifact.version
+    assert artifact.ids == IDS and artifact.content_hashes == HASHES
+    assert artifact.manifest['data_hash'] == compute_data_hash(IDS, HASHES)
+    assert isinstance(artifact.embeddings, np.memmap)
+    expected = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.testing.assert_allclose(artifact.embeddings, expected, rtol=1e-6)
+    np.testing.assert_allclose(artifact.vector_for('b', 'h-b'), expected[1], rtol=1e-6)
+    assert artifact.vector_for('b', 'edited') is None and artifact.vector_for('z', 'h-b') is None
+
+def test_float16_artifact_keeps_vectors_within_precision(tmp_path):
+    embeddings = vectors()
+
+    write_artifact(str(tmp_path), IDS, HASHES, embeddings, 'model-x', dtype='float16')
+    artifact = load_artifact(str(tmp_path))
+
+    assert artifact.embeddings.dtype == np.float16 and artifact.version.endswith('-float16')
+    np.testing.assert_allclose(artifact.embeddings.astype(np.float32),
+                               embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True), atol=1e-3)
+
+def test_data_hash_ignores_row_order():
+    assert compute_data_hash(IDS, HASHES) == compute_data_hash(IDS[::-1], HASHES[::-1])
+    assert compute_data_hash(IDS, HASHES) != compute_data_hash(IDS, ['h-a', 'h-b', 'edited'])
+
+def test_current_switches_between_versions(tmp_path):
+    write_artifact(str(tmp_path), IDS, HASHES, vectors(), 'm')
+    first = load_artifact(str(tmp_path))
+    write_artifact(str(tmp_path), IDS, ['h-a', 'h-b', 'edited'], vectors(1), 'm')
+    second = load_artifact(str(tmp_path))
+
+    assert second.version != first.version and second.content_hashes[2] == 'edited'
+    # Rewriting existing content reuses its directory and only moves CURRENT back
+    write_artifact(str(tmp_path), IDS, HASHES, vectors(2), 'm')
+    assert load_artifact(str(tmp_path)).version == first.version
+    np.testing.assert_array_equal(load_artifact(str(tmp_path)).embeddings, first.embeddings)
+
+def test_partially_written_version_is_never_loaded(tmp_path, monkeypatch):
+    write_artifact(str(tmp_path), IDS, HASHES, vectors(), 'm')
+    previous = current(tmp_path)
+    rename = os.replace
+
+    def crash_on_publish(src, dst):
+        if '.tmp-' in os.path.basename(src) and os.path.isdir(src):
+            raise OSError("disk full")
+        return rename(src, dst)
+    monkeypatch.setattr(index_artifact.os, 'replace', crash_on_publish)
+
+    with pytest.raises(OSError):
+        write_artifact(str(tmp_path), IDS, ['h-a', 'h-b', 'edited'], vectors(1), 'm')
+
+    assert [entry for entry in os.listdir(tmp_path) if '.tmp-' in entry]  # the half-written directory is left
+    assert current(tmp_path) == previous
+    assert load_artifact(str(tmp_path)).content_hashes == HASHES
+
+def test_unusable_artifacts_are_ignored(tmp_path):
+    assert load_artifact(str(tmp_path)) is None
+    write_artifact(str(tmp_path), IDS, HASHES, vectors(), 'model-x')
+
+    assert load_artifact(str(tmp_path), 'model-y') is None
+    with open(os.path.join(tmp_path, CURRENT_POINTER), 'w') as f:
+        f.write('missing-version')
+    assert load_artifact(str(tmp_path)) is None
+
+def test_numpy_backend_starts_from_matching_artifact_without_syncing_chroma(standalone_env, monkeypatch):
+    import build_index
+    import embedding
+    import resources
+    from benchmarks.micro import HashEmbeddingFunction
+    from resources import ServerResources
+    monkeypatch.setattr(build_index, 'get_embedding_function', lambda: HashEmbeddingFunction(dimension=32))
+    assert build_index.build_index(standalone_env, resources.INDEX_ARTIFACT_DIR, 'float32', skip_chroma=True)
+    monkeypatch.setattr(resources, 'RETRIEVER_BACKEND', 'numpy')
+
+    def no_sync(*args, **kwargs):
+        raise AssertionError("Chroma was synced although the artifact matches the catalog")
+    monkeypatch.setattr(embedding, 'build_or_load_index', no_sync)
+
+    server = ServerResources(serving_mode='standalone')
+    server.load_catalog(standalone_env)
+    assert server.warm_up(), server.error
+
+    artifact = load_artifact(resources.INDEX_ARTIFACT_DIR)
+    assert server.snapshot.retriever.ids == artifact.ids
+    np.testing.assert_array_equal(server.snapshot.retriever.matrix, artifact.embeddings)
+    assert server.snapshot.retriever.query(query_texts=['garden cafe'], n_results=3)['ids'][0]
@@ -0,0 +1,104 @@
+import pytest
+
+chromadb = pytest.importorskip('chromadb')
+import config
+import embedding
+from benchmarks.micro import HashEmbeddingFunction
+
+class CountingEmbeddingFunction(HashEmbeddingFunction):
+    """The benchmark's hashing embedder, recording every text it embeds."""
+
+    def __init__(self):
+        super().__init__(dimension=32)
+        self.embedded = []
+
+    def __call__(self, input):
+        self.embedded.extend(input)
+        return super().__call__(input)
+
+def catalog(count=6):
+    documents = [f'place {i} with a quiet garden' for i in range(count)]
+    metadatas = [{'index': str(i), 'title': f'Place {i}', 'location_area': 'Bedok'} for i in range(count)]
+    return documents, metadatas, [str(i) for i in range(count)]
+
+def stored(collection):
+    page = collection.get(include=['metadatas', 'embeddings', 'documents'])
+    return {id_: (doc, meta['content_hash'], list(vector))
+            for id_, doc, meta, vector in zip(page['ids'], page['documents'], page['metadatas'], page['embeddings'])}
+
+@pytest.fixture
+def persist_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PERSIST_DIRECTORY', str(tmp_path / 'chroma'))
+    return tmp_path / 'chroma'
+
+def test_unchanged_catalog_upserts_nothing(persist_dir):
+    documents, metadatas, ids = catalog()
+    build = CountingEmbeddingFunction()
+    collection = embedding.build_or_load_index(documents, metadatas, ids, build)
+    assert sorted(build.embedded) == sorted(documents)
+    before = stored(collection)
+
+    resync = CountingEmbeddingFunction()
+    collection = embedding.build_or_load_index(documents, metadatas, ids, resync)
+
+    assert resync.embedded == []
+    assert stored(collection) == before
+
+def test_edited_row_is_reembedded_and_removed_row_deleted(persist_dir):
+    documents, metadatas, ids = catalog()
+    embedding.build_or_load_index(documents, metadatas, ids, CountingEmbeddingFunction())
+    documents[2] = 'place 2 now a rooftop bar'
+    del documents[4], metadatas[4], ids[4]
+
+    sync = CountingEmbeddingFunction()
+    collection = embedding.build_or_load_index(documents, metadatas, ids, sync)
+
+    assert sync.embedded == ['place 2 now a rooftop bar']
+    rows = stored(collection)
+    assert sorted(rows) == sorted(ids)
+    assert rows['2'][0] == 'place 2 now a rooftop bar'
+    assert rows['2'][1] == embedding.compute_content_hash(documents[2], metadatas[2])
+
+def test_metadata_change_alone_is_resynced(persist_dir):
+    documents, metadatas, ids = catalog()
+    embedding.build_or_load_index(documents, metadatas, ids, CountingEmbeddingFunction())
+    metadatas[1] = {**metadatas[1], 'location_area': 'Tampines'}
+
+    sync = CountingEmbeddingFunction()
+    collection = embedding.build_or_load_index(documents, metadatas, ids, sync)
+
+    assert sync.embedded == [documents[1]]
+    assert collection.get(ids=['1'])['metadatas'][0]['location_area'] == 'Tampines'
+
+def test_standby_collection_copies_vectors_from_source(persist_dir):
+    documents, metadatas, ids = catalog()
+    active = embedding.build_or_load_index(documents, metadatas, ids, CountingEmbeddingFunction())
+    documents[0] = 'place 0 is now a museum'
+    documents.append('place 6 a brand new cafe')
+    metadatas.append({'index': '6', 'title': 'Place 6', 'location_area': 'Bedok'})
+    ids.append('6')
+
+    sync = CountingEmbeddingFunction()
+    standby = embedding.build_or_load_index(documents, metadatas, ids, sync, collection_name='standby', source=active)
+
+    # Only rows whose content differs from the source are embedded; the rest reuse its vectors
+    assert sorted(sync.embedded) == ['place 0 is now a museum', 'place 6 a brand new cafe']
+    source_rows, standby_rows = stored(active), stored(standby)
+    assert sorted(standby_rows) == sorted(ids)
+    for id_ in ('1', '2', '3', '4', '5'):
+        assert standby_rows[id_] == source_rows[id_]
+    assert active.count() == 6  # the source is read, never written
+
+def test_copy_from_collection_returns_rows_it_could_not_copy(persist_dir):
+    documents, metadatas, ids = catalog(3)
+    source = embedding.build_or_load_index(documents, metadatas, ids, CountingEmbeddingFunction())
+    client = chromadb.PersistentClient(path=str(persist_dir))
+    target = client.get_or_create_collection('target', embedding_function=None)
+    hashed = [{**meta, 'content_hash': embedding.compute_content_hash(doc, meta)}
+              for doc, meta in zip(documents, metadatas)]
+    hashed[1]['content_hash'] = 'edited'
+
+    missing = embedding._copy_from_collection(target, source, documents, hashed, ids, [0, 1, 2], 2)
+
+    assert missing == [1]
+    assert sorted(target.get()['ids']) == ['0', '2']
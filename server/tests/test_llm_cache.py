@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import pytest
+import llm_cache as llm_cache_module
+import rag
+from llm_cache import LLMCache, make_cache_key
+from test_rag_prompts import RecordingLLMClient
+
+class Clock:
+    """Stands in for time.time in llm_cache so tests can expire entries."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache_module.time, 'time', clock)
+    return clock
+
+def key_for(*contents, model='gpt-4o-mini', version='v1'):
+    return make_cache_key([{'role': 'user', 'content': content} for content in contents], model, version)
+
+def test_key_ignores_case_whitespace_and_trailing_punctuation():
+    assert key_for('Cafe in  Bedok') == key_for('  cafe in bedok!') == key_for('CAFE IN BEDOK?') \
+        == key_for('cafe\tin\nbedok.')
+
+def test_key_depends_on_wording_role_model_and_prompt_version():
+    base = key_for('cafe in bedok')
+
+    assert key_for('cafe in tampines') != base
+    assert key_for('cafe in', 'bedok') != base
+    assert make_cache_key([{'role': 'assistant', 'content': 'cafe in bedok'}], 'gpt-4o-mini', 'v1') != base
+    assert key_for('cafe in bedok', model='gpt-4o') != base
+    assert key_for('cafe in bedok', version='v2') != base
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = LLMCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'  # 'b' is now the least recently used
+    cache.set('c', 'C')
+
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('A', None, 'C')
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire_after_ttl(clock):
+    cache = LLMCache(max_entries=10, ttl_seconds=60)
+    cache.set('a', 'A')
+    clock.now += 59
+    assert cache.get('a') == 'A'
+    clock.now += 2
+
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['expirations'], stats['misses'], stats['memory_entries']) == (1, 1, 1, 0)
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite3')
+    LLMCache(max_entries=10, ttl_seconds=60, db_path=path).set('a', 'A')
+
+    restarted = LLMCache(max_entries=10, ttl_seconds=60, db_path=path)
+    assert restarted.get('a') == 'A' and restarted.get('a') == 'A'
+    stats = restarted.stats()
+    assert (stats['disk_hits'], stats['memory_hits'], stats['disk_entries']) == (1, 1, 1)
+
+def test_expired_disk_entries_are_deleted_on_read(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite3')
+    LLMCache(max_entries=10, ttl_seconds=60, db_path=path).set('a', 'A')
+    clock.now += 61
+
+    restarted = LLMCache(max_entries=10, ttl_seconds=60, db_path=path)
+    assert restarted.get('a') is None
+    assert restarted.stats()['disk_entries'] == 0
+
+def test_disk_tier_is_pruned_every_100_writes(tmp_path, clock):
+    cache = LLMCache(max_entries=1000, ttl_seconds=60, db_path=str(tmp_path / 'cache.sqlite3'), disk_max_entries=10)
+    for i in range(99):
+        clock.now += 0.001
+        cache.set(f'k{i}', str(i))
+    assert cache.stats()['disk_entries'] == 99
+
+    clock.now += 0.001
+    cache.set('k99', '99')
+
+    # Only the newest disk_max_entries rows are kept
+    assert cache.stats()['disk_entries'] == 10
+    assert LLMCache(10, 60, db_path=str(tmp_path / 'cache.sqlite3')).get('k90') == '90'
+    assert LLMCache(10, 60, db_path=str(tmp_path / 'cache.sqlite3')).get('k89') is None
+
+def test_async_disk_access_runs_off_the_event_loop(tmp_path, clock):
+    cache = LLMCache(max_entries=10, ttl_seconds=60, db_path=str(tmp_path / 'cache.sqlite3'))
+    threads = []
+    read_disk = cache._get_disk
+    cache._get_disk = lambda key: threads.append(threading.current_thread()) or read_disk(key)
+
+    async def roundtrip():
+        await cache.aset('a', 'A')
+        cache._memory.clear()
+        return await cache.aget('a'), await cache.aget('a'), await cache.aget('missing')
+
+    assert asyncio.run(roundtrip()) == ('A', 'A', None)
+    # The first and last lookups reached SQLite, each on a worker thread; the second was a memory hit
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+@pytest.fixture
+def cached_llm(monkeypatch, clock):
+    client = RecordingLLMClient()
+    monkeypatch.setattr(rag, 'llm_cache', LLMCache(max_entries=10, ttl_seconds=60))
+    return client
+
+CONVERSATION = [{'role': 'user', 'content': 'A quiet cafe, please'}]
+
+def test_search_queries_are_cached(cached_llm):
+    first = asyncio.run(rag.generate_search_query(CONVERSATION, cached_llm))
+    second = asyncio.run(rag.generate_search_query([{'role': 'user', 'content': 'a quiet  cafe, please!'}], cached_llm))
+
+    assert first == second and len(cached_llm.prompts) == 1
+
+def test_clarifying_questions_bypass_the_cache_by_default(cached_llm, monkeypatch):
+    monkeypatch.setattr(rag, 'LLM_CACHE_CLARIFYING_QUESTIONS', False)
+    for _ in range(2):
+        asyncio.run(rag.generate_clarifying_question(CONVERSATION, cached_llm))
+
+    assert len(cached_llm.prompts) == 2
+    assert rag.llm_cache.stats()['memory_entries'] == 0
+
+def test_clarifying_questions_are_cached_when_enabled(cached_llm, monkeypatch):
+    monkeypatch.setattr(rag, 'LLM_CACHE_CLARIFYING_QUESTIONS', True)
+    questions = [asyncio.run(rag.generate_clarifying_question(CONVERSATION, cached_llm)) for _ in range(2)]
+
+    assert questions[0] == questions[1] and len(cached_llm.prompts) == 1
@@ -0,0 +1,144 @@
+import base64
+import gzip
+import json
+from types import SimpleNamespace
+import pytest
+from location_catalog import LocationCatalog, EncodedPayload, InvalidQueryError, brotli
+
+def page_of(payload):
+    return json.loads(payload.body)
+
+def ids_of(payload):
+    return [location['id'] for location in page_of(payload)['locations']]
+
+def test_full_payload_is_served_without_query(locations):
+    catalog = LocationCatalog(locations)
+
+    assert catalog.page() is catalog.full_payload
+    assert page_of(catalog.page()) == {'locations': locations, 'next_cursor': None, 'total': 5}
+
+def test_filters_follow_client_semantics(locations):
+    catalog = LocationCatalog(locations)
+
+    assert ids_of(catalog.page(category='CAF')) == ['0', '3']
+    assert ids_of(catalog.page(category='nature')) == ['1']  # matches a theme
+    assert ids_of(catalog.page(theme='food', area='bedok')) == ['0']
+    assert ids_of(catalog.page(q='café')) == ['0']
+    assert ids_of(catalog.page(q='SKYLINE')) == ['2']
+    assert ids_of(catalog.page(location_id='4')) == ['4']
+    assert ids_of(catalog.page(location_id='404')) == []
+
+def test_q_does_not_match_across_fields(locations):
+    catalog = LocationCatalog(locations)
+
+    assert ids_of(catalog.page(q='kopi corner')) == ['0']
+    assert ids_of(catalog.page(q='corner a quiet')) == []  # title 'Kopi Corner' + summary 'A quiet café for kopi'
+    assert ids_of(catalog.page(q='nightlife rooftop')) == []  # two themes
+    assert ids_of(catalog.page(q='nightlife\x1frooftop')) == []
+    assert ids_of(catalog.page(q='fun\nmarina')) == []  # end of one location, start of the next
+
+def test_cursor_pages_through_filtered_rows(locations):
+    catalog = LocationCatalog(locations)
+
+    first = page_of(catalog.page(category='cafe', limit=1))
+    second = page_of(catalog.page(category='cafe', limit=1, cursor=first['next_cursor']))
+
+    assert [loc['id'] for loc in first['locations']] == ['0'] and first['total'] == 2
+    assert [loc['id'] for loc in second['locations']] == ['3'] and second['next_cursor'] is None
+
+def test_cursor_pages_cover_catalog_once(locations):
+    catalog = LocationCatalog(locations)
+    seen, cursor = [], None
+    while True:
+        page = page_of(catalog.page(limit=2, cursor=cursor))
+        seen += [location['id'] for location in page['locations']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == ['0', '1', '2', '3', '4']
+
+@pytest.mark.parametrize('cursor', ['not base64!', base64.urlsafe_b64encode(b'no-separator').decode(),
+                                    base64.urlsafe_b64encode(b'v:not-a-row').decode()])
+def test_malformed_cursor_is_rejected(locations, cursor):
+    with pytest.raises(InvalidQueryError, match='Invalid cursor'):
+        LocationCatalog(locations).page(limit=2, cursor=cursor)
+
+def test_cursor_from_another_catalog_version_is_rejected(locations):
+    cursor = page_of(LocationCatalog(locations, version='v1').page(limit=2))['next_cursor']
+
+    with pytest.raises(InvalidQueryError, match='older version'):
+        LocationCatalog(locations, version='v2').page(limit=2, cursor=cursor)
+
+def test_field_selection_always_includes_id(locations):
+    catalog = LocationCatalog(locations)
+
+    page = page_of(catalog.page(fields='title, price_range', limit=1))
+
+    assert page['locations'] == [{'id': '0', 'title': 'Kopi Corner', 'price_range': '$'}]
+
+def test_unknown_field_is_rejected(locations):
+    with pytest.raises(InvalidQueryError, match='Unknown fields: secret'):
+        LocationCatalog(locations).page(fields='title,secret')
+
+def test_pages_are_cached_and_etags_follow_content(locations):
+    catalog = LocationCatalog(locations)
+
+    assert catalog.page(area='Bedok') is catalog.page(area='Bedok')
+    assert catalog.page(area='Bedok').etag == LocationCatalog(locations).page(area='Bedok').etag
+    assert catalog.page(area='Bedok').etag != catalog.page(area='Tampines').etag
+    edited = [dict(locations[0], title='Renamed')] + locations[1:]
+    assert LocationCatalog(edited).full_payload.etag != catalog.full_payload.etag
+
+def test_encoded_negotiates_smallest_accepted_encoding():
+    payload = EncodedPayload(json.dumps({'locations': ['x'] * 200}).encode('utf-8'))
+
+    assert payload.encoded('') == (payload.body, None)
+    assert payload.encoded('identity') == (payload.body, None)
+    assert payload.encoded('gzip;q=0') == (payload.body, None)
+    body, encoding = payload.encoded('gzip, deflate')
+    assert encoding == 'gzip' and gzip.decompress(body) == payload.body
+    if brotli is not None:
+        body, encoding = payload.encoded('gzip, deflate, br')
+        assert encoding == 'br' and brotli.decompress(body) == payload.body
+        assert payload.encoded('br;q=0, gzip')[1] == 'gzip'
+
+def test_encoded_falls_back_to_gzip_without_brotli():
+    payload = EncodedPayload.precomputed(b'{}', 'W/"x"', gzip.compress(b'{}'), None)
+
+    assert payload.encoded('br, gzip')[1] == 'gzip'
+    assert payload.encoded('br') == (b'{}', None)
+
+@pytest.fixture
+def client(locations, monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    # main mounts IMAGE_SOURCE_DIR (relative to the working directory) at import
+    (tmp_path / 'data' / 'images').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    import main
+    monkeypatch.setattr(main.resources, 'snapshot', SimpleNamespace(catalog=LocationCatalog(locations)))
+    # Without the context manager the lifespan (catalog load and warm-up) does not run
+    return TestClient(main.app)
+
+def test_endpoint_returns_304_for_matching_etag(client):
+    response = client.get('/api/locations', params={'area': 'Bedok'})
+    etag = response.headers['etag']
+
+    assert response.status_code == 200 and 'Accept-Encoding' in response.headers['vary']
+    assert client.get('/api/locations', params={'area': 'Bedok'},
+                      headers={'If-None-Match': f'W/"other", {etag}'}).status_code == 304
+    assert client.get('/api/locations', params={'area': 'Bedok'}, headers={'If-None-Match': '*'}).status_code == 304
+    assert client.get('/api/locations', params={'area': 'Tampines'},
+                      headers={'If-None-Match': etag}).status_code == 200
+
+def test_endpoint_serves_compressed_body(client):
+    response = client.get('/api/locations', params={'limit': 2}, headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert [location['id'] for location in response.json()['locations']] == ['0', '1']
+
+def test_endpoint_rejects_bad_cursor(client):
+    response = client.get('/api/locations', params={'limit': 2, 'cursor': 'garbage'})
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid cursor'
@@ -0,0 +1,19 @@
+from metrics import MetricsRegistry
+
+def test_stats_sources_export_counters_with_total_suffix():
+    registry = MetricsRegistry()
+    registry.add_gauge_source('app_cache', lambda: {'misses': 3, 'hit_rate': 0.25, 'enabled': True, 'path': '/tmp'},
+                              counters=('misses',))
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE app_cache_misses_total counter' in lines and 'app_cache_misses_total 3' in lines
+    assert '# TYPE app_cache_hit_rate gauge' in lines and 'app_cache_hit_rate 0.25' in lines
+    assert not any(line.startswith(('app_cache_misses ', 'app_cache_enabled', 'app_cache_path')) for line in lines)
+
+def test_failing_stats_source_is_skipped():
+    registry = MetricsRegistry()
+    registry.add_gauge_source('broken', lambda: 1 / 0)
+    registry.add_gauge_source('ok', lambda: {'value': 1})
+
+    assert 'ok_value 1' in registry.render().splitlines()
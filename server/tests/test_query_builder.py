@@ -0,0 +1,82 @@
+import pytest
+import rag
+from facets import FacetIndex
+from query_builder import build_local_query
+
+@pytest.fixture
+def facets():
+    return FacetIndex({
+        'location_area': ['Bedok', 'Marina Bay', 'Tampines'],
+        'category_type': ['Cafe', 'Park', 'Bar'],
+        'price_range': ['$', '$$', '$$$', 'Free'],
+        'audience': ['Families', 'Couples'],
+        'theme': ['Nature', 'Nightlife'],
+    })
+
+def first_message(content):
+    return [{'role': 'user', 'content': content}]
+
+def test_explicit_first_message_is_built_locally(facets):
+    local = build_local_query(first_message("I'm looking for a cheap cafe in Bedok for my kids"), facets)
+
+    assert local.confident and local.confidence == 1.0
+    assert local.query == 'cheap Cafe in Bedok for Families'
+    assert local.filters['location_area'] == ['Bedok'] and local.filters['category_type'] == ['Cafe']
+    assert local.audience == ['Families']
+
+def test_themes_and_multi_word_areas_are_recognized(facets):
+    local = build_local_query(first_message('Nightlife spots around Marina Bay'), facets)
+
+    assert local.confident
+    assert local.query == 'places in Marina Bay with Nightlife'
+    assert local.themes == ['Nightlife']
+
+def test_unrecognized_words_lower_confidence_and_are_kept(facets):
+    # Bedok and cafe are recognized; 'quiet' and 'kopi' are not: 2 of 4 meaningful words
+    local = build_local_query(first_message('quiet kopi cafe in Bedok'), facets)
+
+    assert local.confidence == pytest.approx(0.5)
+    assert local.reason == 'low_confidence' and not local.confident
+    assert local.query == 'Cafe in Bedok quiet kopi'
+
+def test_min_confidence_is_the_cut_off(facets):
+    conversation = first_message('quiet cafe in Bedok')  # 2 of 3 meaningful words recognized
+
+    assert build_local_query(conversation, facets, min_confidence=2 / 3).confident
+    assert not build_local_query(conversation, facets, min_confidence=0.67).confident
+
+@pytest.mark.parametrize('message', ['a cafe in Bedok but not too pricey', 'anything except a park in Tampines',
+                                     "a bar that isn't in Marina Bay", 'park without crowds'])
+def test_negations_and_contrasts_escalate(facets, message):
+    local = build_local_query(first_message(message), facets)
+
+    assert local.reason == 'ambiguous' and not local.confident
+
+def test_long_messages_escalate(facets):
+    message = 'cafe in Bedok ' * 7  # 21 words
+
+    assert build_local_query(first_message(message), facets).reason == 'too_long'
+    assert build_local_query(first_message(message), facets, max_words=21).confident
+
+def test_messages_without_area_category_or_theme_escalate(facets):
+    local = build_local_query(first_message('something cheap for my kids'), facets)
+
+    assert local.reason == 'no_facets' and not local.confident
+
+def test_later_turns_always_use_the_llm(facets):
+    conversation = first_message('a cafe in Bedok') + [
+        {'role': 'assistant', 'content': 'Any budget?'}, {'role': 'user', 'content': 'a cafe in Bedok'}]
+
+    assert build_local_query(conversation, facets).reason == 'multi_turn'
+    assert build_local_query([{'role': 'assistant', 'content': 'Hi!'}], facets).reason == 'multi_turn'
+
+def test_try_local_search_query_returns_query_and_where(facets, monkeypatch):
+    monkeypatch.setattr(rag, 'LOCAL_QUERY_ENABLED', True)
+
+    query, where = rag.try_local_search_query(first_message('a park in Tampines'), facets)
+
+    assert query == 'Park in Tampines'
+    assert where == {'$and': [{'location_area': {'$in': ['Tampines']}}, {'category_type': {'$in': ['Park']}}]}
+    assert rag.try_local_search_query(first_message('a park but in Tampines'), facets) is None
+    monkeypatch.setattr(rag, 'LOCAL_QUERY_ENABLED', False)
+    assert rag.try_local_search_query(first_message('a park in Tampines'), facets) is None
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import rag
+from retrievers import Retriever
+
+class ScriptedLLMClient:
+    """Answers like the LLM, except for prompts mentioning 'boom' (raises) or 'slow' (outlasts the timeouts)."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, messages, **kwargs):
+        prompt = messages[-1]['content']
+        if 'boom' in prompt:
+            raise RuntimeError("LLM unavailable")
+        if 'slow' in prompt:
+            await asyncio.sleep(1)
+        content = 'llm query' if 'Concise Search Query' in prompt else 'llm question?'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+class EchoRetriever(Retriever):
+    """Returns one location per query whose id and title are the query text, so results show which query ran."""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None):
+        if self.fail_on in query_texts:
+            raise RuntimeError("index unavailable")
+        return {'ids': [[text] for text in query_texts],
+                'metadatas': [[{'index': text, 'title': text}] for text in query_texts],
+                'distances': [[0.25] for _ in query_texts]}
+
+def embed(texts):
+    return np.ones((len(texts), 2), dtype=np.float32)
+
+@pytest.fixture(autouse=True)
+def llm(monkeypatch):
+    monkeypatch.setattr(rag, 'async_openai_client', ScriptedLLMClient())
+    monkeypatch.setattr(rag, 'llm_cache', None)
+    monkeypatch.setattr(rag, 'LLM_QUERY_TIMEOUT', 0.05)
+    monkeypatch.setattr(rag, 'LLM_CLARIFY_TIMEOUT', 0.05)
+
+def user(content):
+    return [{'role': 'user', 'content': content}]
+
+def run_batch(conversations, retriever=None):
+    return asyncio.run(rag.rag_pipeline_clarify_batch(conversations, retriever or EchoRetriever(), embed))
+
+def succeeded(result, query='llm query', question='llm question?'):
+    return result == {'retrieved_locations': [{'id': query, 'score': 0.75, 'title': query}],
+                      'clarifying_question': question}
+
+def test_failing_llm_call_only_changes_its_own_item():
+    results = run_batch([user('a cafe'), user('boom, a park'), user('a museum')])
+
+    assert succeeded(results[0]) and succeeded(results[2])
+    # Its search query falls back to the user's message and its question to the default
+    assert succeeded(results[1], query='boom, a park', question=rag.DEFAULT_CLARIFYING_QUESTION)
+
+def test_timed_out_llm_call_only_changes_its_own_item():
+    results = run_batch([user('slow: a cafe'), user('a park')])
+
+    assert succeeded(results[0], query='slow: a cafe', question=rag.DEFAULT_CLARIFYING_QUESTION)
+    assert succeeded(results[1])
+
+def test_empty_conversation_is_an_error_and_neighbours_succeed():
+    results = run_batch([user('a cafe'), [], user('a park')])
+
+    assert results[1] == {'error': 'No conversation provided'}
+    assert succeeded(results[0]) and succeeded(results[2])
+
+def test_retrieval_failure_is_reported_per_filter_group():
+    # Without facets every query shares one (empty) filter group, so they fail together
+    results = run_batch([user('a cafe'), user('boom')], EchoRetriever(fail_on='boom'))
+
+    assert results == [{'error': 'Retrieval failed: index unavailable'}] * 2
+
+class BlockingRetriever(Retriever):
+    """Blocks every query until released, recording the thread each one ran on."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = []
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait(5)
+        return EchoRetriever().query(query_texts, query_embeddings, n_results, where)
+
+def test_timed_out_retrievals_are_bounded_by_the_retrieval_pool(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retrieval')
+    monkeypatch.setattr(rag, '_retrieval_executor', executor)
+    monkeypatch.setattr(rag, 'RETRIEVAL_TIMEOUT', 0.05)
+    retriever = BlockingRetriever()
+
+    async def search_twice():
+        return await asyncio.gather(rag.search_locations(user('a cafe'), retriever),
+                                    rag.search_locations(user('a park'), retriever))
+
+    assert asyncio.run(search_twice()) == [[], []]
+    retriever.release.set()
+    executor.shutdown(wait=True)
+
+    # The first retrieval ran on and held the pool's only thread; the queued one was dropped on timeout
+    assert retriever.threads == ['retrieval_0']
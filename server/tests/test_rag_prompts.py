@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import rag
+from config import PROMPT_RECENT_MESSAGES
+from facets import FacetIndex
+from retrievers import Retriever
+
+class RecordingLLMClient:
+    """Stands in for AsyncOpenAI and records every prompt it is sent."""
+
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, messages, **kwargs):
+        self.prompts.append(messages[-1]['content'])
+        message = SimpleNamespace(content="Which area would suit you?")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+class EmptyRetriever(Retriever):
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None):
+        return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+
+@pytest.fixture
+def llm_client(monkeypatch):
+    client = RecordingLLMClient()
+    monkeypatch.setattr(rag, 'async_openai_client', client)
+    monkeypatch.setattr(rag, 'llm_cache', None)
+    return client
+
+@pytest.fixture
+def facets():
+    return FacetIndex({'location_area': ['Bedok', 'Tampines'], 'category_type': ['Cafe', 'Park']})
+
+def long_conversation():
+    """An early, non-facet constraint followed by more turns than a session prompt keeps."""
+    history = [{'role': 'user', 'content': 'We need step-free wheelchair access everywhere'},
+               {'role': 'assistant', 'content': 'Noted. What kind of place?'}]
+    for i in range(PROMPT_RECENT_MESSAGES):
+        history.append({'role': 'user', 'content': f'Something relaxing, idea {i}'})
+        history.append({'role': 'assistant', 'content': 'Indoors or outdoors?'})
+    history.append({'role': 'user', 'content': 'A cafe in Bedok would be good'})
+    return history
+
+def test_stateless_prompts_keep_early_constraints(llm_client, facets):
+    result = asyncio.run(rag.rag_pipeline_clarify(long_conversation(), EmptyRetriever(), facets))
+
+    assert result['clarifying_question'] == "Which area would suit you?"
+    assert len(llm_client.prompts) == 2  # search query + clarifying question
+    for prompt in llm_client.prompts:
+        assert 'wheelchair access' in prompt
+        assert 'Conversation History:' in prompt
+
+def test_stateless_stream_prompt_keeps_early_constraints(llm_client, facets, monkeypatch):
+    async def stream_question(conversation_history, llm_client_, summary=None):
+        llm_client.prompts.append(rag._clarifying_question_messages(conversation_history, summary)[-1]['content'])
+        yield "Which area would suit you?"
+    monkeypatch.setattr(rag, 'stream_clarifying_question', stream_question)
+
+    async def collect():
+        return [event async for event in rag.rag_pipeline_clarify_stream(long_conversation(), EmptyRetriever(),
+                                                                          facets)]
+    asyncio.run(collect())
+
+    assert llm_client.prompts and all('wheelchair access' in prompt for prompt in llm_client.prompts)
+
+def test_session_prompts_use_summary_and_recent_messages(llm_client, facets):
+    summary = {'area': ['Bedok'], 'category': ['Cafe']}
+    asyncio.run(rag.rag_pipeline_clarify(long_conversation(), EmptyRetriever(), facets, summary=summary))
+
+    for prompt in llm_client.prompts:
+        assert 'Known User Criteria:' in prompt
+        assert '"area":["Bedok"]' in prompt
+        assert 'wheelchair access' not in prompt
@@ -0,0 +1,103 @@
+import csv
+import os
+import threading
+import pytest
+
+chromadb = pytest.importorskip('chromadb')
+import config
+from benchmarks.synthetic_data import generate_rows
+from resources import ServerResources
+
+@pytest.fixture
+def server(standalone_env):
+    """A standalone ServerResources over the synthetic CSV, indexed in Chroma."""
+    server = ServerResources(serving_mode='standalone')
+    server.load_catalog(standalone_env)
+    assert server.warm_up()
+    return server
+
+def edit_csv(path, title_suffix=' (renovated)'):
+    rows = generate_rows(41)
+    rows[3]['title'] += title_suffix
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    # Make sure the file signature changes even on coarse mtime clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def search(snapshot, text='garden cafe'):
+    return snapshot.retriever.query(query_texts=[text], n_results=3)['ids'][0]
+
+def test_reload_of_unchanged_csv_is_a_no_op(server):
+    version = server.snapshot.version
+
+    result = server.reload()
+
+    assert result['status'] == 'unchanged' and result['version'] == version
+    assert server.collection.name == config.COLLECTION_NAME
+
+def test_reload_swaps_in_changed_csv(server):
+    previous = server.snapshot
+    edit_csv(previous.csv_path)
+
+    result = server.reload()
+
+    assert result['status'] == 'reloaded' and result['previous_version'] == previous.version
+    assert result['locations'] == 41 and result['changed_or_new'] == 2 and result['removed'] == 0
+    assert server.snapshot.version == result['version'] != previous.version
+    assert server.status() == {'status': 'ready', 'catalog_version': result['version']}
+    # The new snapshot searches the standby collection; the previous one's is untouched
+    assert server.collection.name == f"{config.COLLECTION_NAME}-standby"
+    assert server.collection.count() == 41
+    assert previous.retriever.collection.count() == 40
+    assert len(search(previous)) == 3 and len(search(server.snapshot)) == 3
+
+def test_consecutive_reloads_alternate_collections(server):
+    edit_csv(server.snapshot.csv_path, ' (renovated)')
+    server.reload()
+    edit_csv(server.snapshot.csv_path, ' (closed)')
+
+    result = server.reload()
+
+    assert result['status'] == 'reloaded' and result['changed_or_new'] == 1
+    assert server.collection.name == config.COLLECTION_NAME
+    assert server.collection.count() == 41
+
+def test_old_snapshot_serves_while_reload_runs_and_second_reload_is_busy(server, monkeypatch):
+    previous = server.snapshot
+    indexing, release = threading.Event(), threading.Event()
+    index_snapshot = server._index_snapshot
+
+    def slow_index_snapshot(snapshot, previous_snapshot):
+        indexing.set()
+        assert release.wait(10)
+        return index_snapshot(snapshot, previous_snapshot)
+    monkeypatch.setattr(server, '_index_snapshot', slow_index_snapshot)
+    edit_csv(previous.csv_path)
+
+    results = {}
+    reload_thread = threading.Thread(target=lambda: results.update(server.reload()))
+    reload_thread.start()
+    try:
+        assert indexing.wait(10)
+        assert server.reload() == {'status': 'busy'}
+        assert server.snapshot is previous and server.ready
+        assert len(search(server.snapshot)) == 3
+    finally:
+        release.set()
+        reload_thread.join(10)
+
+    assert results['status'] == 'reloaded'
+    assert server.snapshot is not previous and server.snapshot.version == results['version']
+
+def test_failed_reload_keeps_current_snapshot(server, monkeypatch):
+    previous = server.snapshot
+    edit_csv(previous.csv_path)
+    monkeypatch.setattr(server, '_index_snapshot', lambda snapshot, previous_snapshot: 1 / 0)
+
+    result = server.reload()
+
+    assert result['status'] == 'failed'
+    assert server.snapshot is previous and server.ready
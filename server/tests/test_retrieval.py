@@ -0,0 +1,227 @@
+import numpy as np
+import pytest
+import rag
+from facets import FacetIndex, price_tier
+from lexical import BM25Index
+from retrievers import Retriever, MetadataColumns, HybridRetriever, NumpyRetriever
+
+METADATAS = [
+    {'index': '0', 'location_area': 'Bedok', 'category_type': 'Cafe', 'price_range': '$'},
+    {'index': '1', 'location_area': 'Bedok', 'category_type': 'Park', 'price_range': 'Free'},
+    {'index': '2', 'location_area': 'Marina Bay', 'category_type': 'Bar', 'price_range': '$$$'},
+    {'index': '3', 'location_area': 'Tampines', 'category_type': 'Cafe', 'price_range': '$$'},
+    {'index': '4', 'location_area': 'Chinatown', 'category_type': 'Gallery', 'price_range': 'Free'},
+]
+
+WHERE_CLAUSES = [
+    {'location_area': 'Bedok'},
+    {'location_area': {'$eq': 'Tampines'}},
+    {'category_type': {'$ne': 'Cafe'}},
+    {'location_area': {'$in': ['Bedok', 'Tampines']}},
+    {'price_range': {'$nin': ['Free', '$$$']}},
+    {'$and': [{'location_area': {'$in': ['Bedok', 'Tampines']}}, {'category_type': {'$in': ['Cafe']}}]},
+    {'$or': [{'category_type': 'Bar'}, {'price_range': {'$in': ['$']}}]},
+    {'$and': [{'price_range': {'$in': ['Free']}},
+              {'$or': [{'location_area': 'Chinatown'}, {'category_type': 'Park'}]}]},
+    {'location_area': {'$in': ['Nowhere']}},
+]
+
+class RankedRetriever(Retriever):
+    """Returns a fixed vector ranking, honouring `where`, and records every call."""
+
+    def __init__(self, ranking, metadatas=METADATAS):
+        self.ranking = ranking
+        self.columns = MetadataColumns(metadatas)
+        self.calls = []
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None):
+        self.calls.append(where)
+        mask = self.columns.mask(where) if where else np.ones(len(self.columns.metadatas), dtype=bool)
+        rows = [row for row in self.ranking if mask[row]][:n_results]
+        return {'ids': [[str(row) for row in rows]], 'metadatas': [[self.columns.metadatas[row] for row in rows]],
+                'distances': [[0.1 * (rank + 1) for rank in range(len(rows))]]}
+
+def test_bm25_ranks_by_term_rarity_frequency_and_length():
+    index = BM25Index([
+        'quiet cafe with kopi',                                  # both query terms
+        'cafe cafe',                                             # common term only, twice
+        'cafe',                                                  # common term only
+        'cafe with a very long description of everything else',  # common term, long document
+        'rooftop bar',                                           # no query term
+    ])
+
+    assert index.top_k('quiet cafe', 5) == [0, 1, 2, 3]
+    assert index.scores('quiet cafe')[4] == 0
+    assert index.top_k('QUIET, cafe!', 2) == [0, 1]
+    assert index.top_k('museum', 5) == []
+
+def test_bm25_top_k_respects_mask():
+    index = BM25Index(['quiet cafe', 'cafe', 'park'])
+
+    assert index.top_k('cafe', 5, mask=np.array([False, True, True])) == [1]
+
+def test_bm25_from_postings_matches_built_index():
+    documents = ['quiet cafe with kopi', 'cafe cafe', 'rooftop bar']
+    built = BM25Index(documents)
+    restored = BM25Index.from_postings(built.size, *built.postings())
+
+    np.testing.assert_array_equal(restored.scores('quiet cafe bar'), built.scores('quiet cafe bar'))
+
+def test_hybrid_fuses_rankings_with_reciprocal_rank_fusion():
+    documents = ['harbour bar', 'garden cafe', 'garden garden', 'quiet gallery', 'seaside park']
+    vector = RankedRetriever([0, 1, 2, 3, 4])
+    hybrid = HybridRetriever(vector, BM25Index(documents), [str(i) for i in range(5)], METADATAS, rrf_k=60,
+                             candidate_multiplier=1)
+
+    results = hybrid.query(query_texts=['garden'], n_results=3)
+
+    # Vector ranks 0, 1, 2; lexical ranks 2, 1. Row 2 edges out row 1 and both beat row 0
+    rrf = lambda *ranks: sum(1 / (60 + rank) for rank in ranks)
+    assert rrf(3, 1) > rrf(2, 2) > rrf(1)
+    assert results['ids'] == [['2', '1', '0']]
+    max_score = 2 / 61
+    np.testing.assert_allclose(results['distances'][0], [1 - rrf(3, 1) / max_score, 1 - rrf(2, 2) / max_score,
+                                                         1 - rrf(1) / max_score])
+
+def test_hybrid_document_ranked_first_by_both_has_zero_distance():
+    documents = ['garden garden', 'garden cafe', 'harbour bar', 'quiet gallery', 'seaside park']
+    hybrid = HybridRetriever(RankedRetriever([0, 1, 2, 3, 4]), BM25Index(documents), [str(i) for i in range(5)],
+                             METADATAS, rrf_k=60, candidate_multiplier=2)
+
+    results = hybrid.query(query_texts=['garden'], n_results=2)
+
+    assert results['ids'] == [['0', '1']]
+    assert results['distances'][0][0] == pytest.approx(0.0)
+
+def test_hybrid_applies_where_to_both_rankings():
+    documents = ['garden cafe', 'garden park', 'harbour bar', 'garden cafe tampines', 'gallery']
+    hybrid = HybridRetriever(RankedRetriever([2, 1, 0, 3, 4]), BM25Index(documents), [str(i) for i in range(5)],
+                             METADATAS)
+
+    results = hybrid.query(query_texts=['garden'], n_results=5, where={'category_type': {'$in': ['Cafe']}})
+
+    assert sorted(results['ids'][0]) == ['0', '3']
+
+def test_hybrid_without_query_text_returns_vector_ranking():
+    hybrid = HybridRetriever(RankedRetriever([3, 1, 0]), BM25Index(['a'] * 5), [str(i) for i in range(5)],
+                             METADATAS)
+
+    results = hybrid.query(query_embeddings=[[1.0, 0.0]], n_results=2)
+
+    assert results['ids'] == [['3', '1']]
+
+def brute_force(embeddings, queries, n_results, mask):
+    """Ranks every unmasked row by cosine similarity, one row at a time."""
+    results = []
+    for query in queries:
+        scored = [(float(np.dot(query, row) / (np.linalg.norm(query) * np.linalg.norm(row))), i)
+                  for i, row in enumerate(embeddings) if mask[i]]
+        results.append(sorted(scored, reverse=True)[:n_results])
+    return results
+
+@pytest.fixture
+def numpy_retriever():
+    rng = np.random.default_rng(7)
+    embeddings = rng.normal(size=(len(METADATAS), 8))
+    retriever = NumpyRetriever([meta['index'] for meta in METADATAS], embeddings, METADATAS,
+                               embedding_function=lambda texts: rng.normal(size=(len(texts), 8)))
+    return retriever, embeddings, rng.normal(size=(3, 8))
+
+@pytest.mark.parametrize('n_results, where', [(1, None), (3, None), (10, None),
+                                              (2, {'location_area': 'Bedok'}),
+                                              (10, {'category_type': {'$ne': 'Cafe'}})])
+def test_numpy_retriever_matches_brute_force_cosine(numpy_retriever, n_results, where):
+    retriever, embeddings, queries = numpy_retriever
+    mask = MetadataColumns(METADATAS).mask(where) if where else np.ones(len(METADATAS), dtype=bool)
+
+    results = retriever.query(query_embeddings=queries, n_results=n_results, where=where)
+    expected = brute_force(embeddings, queries, n_results, mask)
+
+    assert results['ids'] == [[str(i) for _, i in ranked] for ranked in expected]
+    assert results['metadatas'] == [[METADATAS[i] for _, i in ranked] for ranked in expected]
+    for distances, ranked in zip(results['distances'], expected):
+        np.testing.assert_allclose(distances, [1 - score for score, _ in ranked], rtol=1e-5, atol=1e-6)
+
+def test_numpy_retriever_returns_empty_rows_for_empty_mask(numpy_retriever):
+    retriever, _, queries = numpy_retriever
+
+    results = retriever.query(query_embeddings=queries, n_results=3, where={'location_area': {'$in': ['Nowhere']}})
+
+    assert results == {'ids': [[], [], []], 'metadatas': [[], [], []], 'distances': [[], [], []]}
+
+def test_numpy_retriever_embeds_query_texts_as_one_batch():
+    batches = []
+    def embed(texts):
+        batches.append(list(texts))
+        return [[1.0, 0.0]] * len(texts)
+    retriever = NumpyRetriever(['a', 'b'], [[0.0, 2.0], [3.0, 0.0]], METADATAS[:2], embedding_function=embed)
+
+    results = retriever.query(query_texts=['cafe', 'park'], n_results=2)
+
+    assert batches == [['cafe', 'park']]
+    assert results['ids'] == [['b', 'a'], ['b', 'a']]
+    np.testing.assert_allclose(results['distances'], [[0.0, 1.0], [0.0, 1.0]], atol=1e-6)
+
+@pytest.mark.parametrize('where', WHERE_CLAUSES)
+def test_metadata_mask_matches_chroma_where(where):
+    chromadb = pytest.importorskip('chromadb')
+    collection = chromadb.EphemeralClient().get_or_create_collection(f'where-{abs(hash(str(where)))}',
+                                                                      embedding_function=None)
+    collection.upsert(ids=[meta['index'] for meta in METADATAS], metadatas=METADATAS,
+                      embeddings=[[1.0, float(i)] for i in range(len(METADATAS))])
+
+    expected = sorted(collection.get(where=where)['ids'])
+    mask = MetadataColumns(METADATAS).mask(where)
+
+    assert sorted(meta['index'] for meta, keep in zip(METADATAS, mask) if keep) == expected
+
+def test_metadata_mask_rejects_unknown_operator():
+    with pytest.raises(ValueError):
+        MetadataColumns(METADATAS).mask({'price_range': {'$gt': '$'}})
+
+def test_to_where_builds_chroma_clauses():
+    assert FacetIndex.to_where({}) is None
+    assert FacetIndex.to_where({'location_area': []}) is None
+    assert FacetIndex.to_where({'location_area': ['Bedok']}) == {'location_area': {'$in': ['Bedok']}}
+    assert FacetIndex.to_where({'location_area': ['Bedok', 'Tampines'], 'category_type': ['Cafe']}) == {
+        '$and': [{'location_area': {'$in': ['Bedok', 'Tampines']}}, {'category_type': {'$in': ['Cafe']}}]}
+
+def test_extracted_filters_select_matching_rows():
+    facets = FacetIndex({'location_area': ['Bedok', 'Tampines'], 'category_type': ['Cafe', 'Park'],
+                         'price_range': ['$', '$$', '$$$', 'Free']})
+    where = facets.to_where(facets.extract_filters('cheap cafes in Bedok'))
+
+    assert where == {'$and': [{'location_area': {'$in': ['Bedok']}}, {'category_type': {'$in': ['Cafe']}},
+                              {'price_range': {'$in': ['Free', '$']}}]}
+    assert MetadataColumns(METADATAS).mask(where).tolist() == [True, False, False, False, False]
+
+def test_hyphenated_free_is_not_a_price_filter():
+    facets = FacetIndex({'category_type': ['Cafe'], 'price_range': ['$', '$$', 'Free']})
+
+    assert facets.extract_filters('a gluten-free cafe') == {'category_type': ['Cafe']}
+    assert facets.extract_filters('sugar-free desserts, free-flow drinks') == {}
+    assert facets.extract_filters('free cafes')['price_range'] == ['Free']
+    assert facets.extract_filters('gluten-free but cheap')['price_range'] == ['Free', '$']
+    assert facets.extract_filters('a mid-range cafe')['price_range'] == ['$$']
+    assert facets.matched_spans('gluten-free cafe') == [(12, 16)]  # only 'cafe'
+
+def test_price_tier_ignores_hyphenated_free():
+    assert price_tier('Free') == 'free'
+    assert price_tier('Free entry') == 'free'
+    assert price_tier('Gluten-free menu, $$') == 'mid'
+
+def test_retrieve_locations_retries_without_filters_when_empty():
+    retriever = RankedRetriever([4, 3, 2, 1, 0])
+
+    results = rag.retrieve_locations('cafe', retriever, n_results=2, where={'location_area': {'$in': ['Nowhere']}})
+
+    assert retriever.calls == [{'location_area': {'$in': ['Nowhere']}}, None]
+    assert results['ids'] == [['4', '3']]
+
+def test_retrieve_locations_keeps_filtered_results():
+    retriever = RankedRetriever([4, 3, 2, 1, 0])
+
+    results = rag.retrieve_locations('cafe', retriever, n_results=2, where={'category_type': {'$in': ['Cafe']}})
+
+    assert retriever.calls == [{'category_type': {'$in': ['Cafe']}}]
+    assert results['ids'] == [['3', '0']]
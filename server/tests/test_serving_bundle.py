@@ -0,0 +1,42 @@
+import json
+import numpy as np
+from lexical import BM25Index
+from location_catalog import LocationCatalog, MappedLocations
+from serving_bundle import write_bundle, load_bundle
+
+def bundle_for(tmp_path, locations):
+    catalog = LocationCatalog(locations)
+    documents = [f"{loc['title']} {loc['content']}" for loc in locations]
+    metadatas = [{'index': loc['id'], 'title': loc['title'], 'location_area': loc['location_area']}
+                 for loc in locations]
+    matrix = np.eye(len(locations), 4, dtype=np.float32)
+    write_bundle(str(tmp_path), [loc['id'] for loc in locations], ['hash'] * len(locations), metadatas,
+                 {'location_area': ['Bedok']}, matrix, catalog.version, locations, catalog.full_payload,
+                 BM25Index(documents), catalog.indexes, 'test-model')
+    return catalog, BM25Index(documents), load_bundle(str(tmp_path), 'test-model')
+
+def test_bundle_round_trip_serves_identical_pages(tmp_path, locations):
+    catalog, _, bundle = bundle_for(tmp_path, locations)
+    mapped = LocationCatalog(bundle.load_locations(), version=bundle.manifest['catalog_version'],
+                             full_payload=bundle.full_payload, indexes=bundle.catalog_indexes)
+
+    assert isinstance(mapped.locations, MappedLocations)
+    assert list(mapped.locations) == locations
+    for query in ({}, {'category': 'cafe'}, {'q': 'café'}, {'area': 'Bedok', 'limit': 1},
+                  {'theme': 'food', 'fields': 'title'}, {'q': 'nothing like this'}):
+        assert bytes(mapped.page(**query).body) == bytes(catalog.page(**query).body), query
+    first = json.loads(bytes(mapped.page(limit=2).body))
+    assert bytes(mapped.page(limit=2, cursor=first['next_cursor']).body) == \
+        bytes(catalog.page(limit=2, cursor=first['next_cursor']).body)
+
+def test_bundle_round_trip_keeps_bm25_scores(tmp_path, locations):
+    _, lexical, bundle = bundle_for(tmp_path, locations)
+
+    assert isinstance(bundle.lexical._docs, np.memmap)
+    for query in ('cafe', 'park seaside', 'kopi corner', 'unknown'):
+        np.testing.assert_allclose(bundle.lexical.scores(query), lexical.scores(query))
+
+def test_load_bundle_rejects_other_models(tmp_path, locations):
+    bundle_for(tmp_path, locations)
+
+    assert load_bundle(str(tmp_path), 'another-model') is None
@@ -0,0 +1,48 @@
+import time
+from facets import FacetIndex
+from sessions import SessionStore, SqliteSessionBackend, InMemorySessionBackend
+
+FACETS = FacetIndex({'location_area': ['Bedok', 'Tampines'], 'category_type': ['Cafe', 'Park']})
+
+def test_sqlite_sessions_are_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    # Two stores on one file stand in for two workers
+    first = SessionStore(SqliteSessionBackend(path, 100, 60), recent_messages=4)
+    second = SessionStore(SqliteSessionBackend(path, 100, 60), recent_messages=4)
+
+    session = first.create()
+    second.append(session.session_id, [{'role': 'user', 'content': 'a cafe in Bedok'}], FACETS)
+    first.record_reply(session.session_id, 'Indoors or outdoors?')
+    updated = second.append(session.session_id, [{'role': 'user', 'content': 'actually Tampines'}], FACETS)
+
+    assert updated.turns == 2
+    assert updated.summary == {'area': ['Tampines'], 'category': ['Cafe']}
+    assert [m['role'] for m in first.get(session.session_id).recent_messages] == ['user', 'assistant', 'user']
+    second.delete(session.session_id)
+    assert first.get(session.session_id) is None
+
+def test_sqlite_sessions_expire(tmp_path):
+    backend = SqliteSessionBackend(str(tmp_path / 'sessions.sqlite3'), 100, 0.01)
+    store = SessionStore(backend)
+    session = store.create()
+    time.sleep(0.02)
+
+    assert store.get(session.session_id) is None
+    assert backend.stats()['expirations'] == 1
+
+def test_sqlite_sessions_evict_least_recently_updated(tmp_path):
+    backend = SqliteSessionBackend(str(tmp_path / 'sessions.sqlite3'), 10, 60)
+    ids = [f's{i}' for i in range(100)]
+    for session_id in ids:
+        backend.set(session_id, {'session_id': session_id})
+
+    assert backend.stats()['active'] == 10
+    assert backend.get(ids[0]) is None and backend.get(ids[-1]) is not None
+
+def test_in_memory_sessions_evict_beyond_max_entries():
+    backend = InMemorySessionBackend(2, 60)
+    for session_id in ('a', 'b', 'c'):
+        backend.set(session_id, {'session_id': session_id})
+
+    assert backend.get('a') is None
+    assert backend.stats() == {'active': 2, 'evictions': 1, 'expirations': 0}